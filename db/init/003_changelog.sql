@@ -0,0 +1,158 @@
+/*
+ ----------------------------------------------------------------------------
+ File name: db/init/003_changelog.sql
+ Bookstore Demo DB - Change log (incremental change feed for catalog sync)
+
+ Requires:
+ - MariaDB 10.2.1+ OR MySQL 8.0.13+
+
+ -----------------------------------------------------------------------------
+ Updates:
+         261019: Tables:     1 (changelog)
+                 Triggers:   9
+                 Procedures: 0
+                 Views:      0
+ ----------------------------------------------------------------------------
+ Last update: 261019
+ ----------------------------------------------------------------------------
+
+Every INSERT / UPDATE / DELETE on categories, items and categoryitems appends
+one row to `changelog` (via triggers, so writes from any code path are logged).
+The API serves it as GET /api/changes?since=<cursor>, where the cursor is the
+last changelogId the consumer has seen.
+
+Note: foreign key cascades do NOT fire triggers in MariaDB/InnoDB. The
+categoryitems rows removed by ON DELETE CASCADE are therefore logged by the
+BEFORE DELETE triggers of categories and items.
+
+Existing databases (init scripts run only when the mariadb_data volume is empty):
+docker compose exec -T mariadb sh -c 'mariadb -u root -p"$MARIADB_ROOT_PASSWORD"' < db/init/003_changelog.sql
+
+*/
+
+USE bookstore1;
+
+-- --------------------------------------------------------
+-- Table: changelog
+-- --------------------------------------------------------
+CREATE TABLE IF NOT EXISTS changelog (
+  changelogId           BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  changelogEntity       ENUM('category', 'item', 'categoryitem') NOT NULL,
+  changelogEntityId     INT UNSIGNED NOT NULL,
+  changelogOperation    ENUM('insert', 'update', 'delete') NOT NULL,
+  -- categoryitem rows: both sides of the relation (a deleted relation can't be looked up later)
+  changelogCategoryId   INT UNSIGNED NULL,
+  changelogItemId       INT UNSIGNED NULL,
+  changelogCrTimestamp  TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+  PRIMARY KEY (changelogId),
+  KEY ix_changelog_timestamp (changelogCrTimestamp)
+) ENGINE=InnoDB;
+
+
+DELIMITER $$
+
+-- --------------------------------------------------------
+-- Triggers: categories
+-- --------------------------------------------------------
+DROP TRIGGER IF EXISTS trg_categories_ai $$
+CREATE TRIGGER trg_categories_ai AFTER INSERT ON categories FOR EACH ROW
+BEGIN
+  INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogCategoryId)
+  VALUES ('category', NEW.categoryId, 'insert', NEW.categoryId);
+END $$
+
+DROP TRIGGER IF EXISTS trg_categories_au $$
+CREATE TRIGGER trg_categories_au AFTER UPDATE ON categories FOR EACH ROW
+BEGIN
+  INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogCategoryId)
+  VALUES ('category', NEW.categoryId, 'update', NEW.categoryId);
+END $$
+
+DROP TRIGGER IF EXISTS trg_categories_bd $$
+CREATE TRIGGER trg_categories_bd BEFORE DELETE ON categories FOR EACH ROW
+BEGIN
+  -- relations removed by ON DELETE CASCADE
+  INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogCategoryId, changelogItemId)
+  SELECT 'categoryitem', categoryitemId, 'delete', categoryitemCategoryId, categoryitemItemId
+  FROM categoryitems
+  WHERE categoryitemCategoryId = OLD.categoryId;
+
+  INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogCategoryId)
+  VALUES ('category', OLD.categoryId, 'delete', OLD.categoryId);
+END $$
+
+-- --------------------------------------------------------
+-- Triggers: items
+-- --------------------------------------------------------
+DROP TRIGGER IF EXISTS trg_items_ai $$
+CREATE TRIGGER trg_items_ai AFTER INSERT ON items FOR EACH ROW
+BEGIN
+  INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogItemId)
+  VALUES ('item', NEW.itemId, 'insert', NEW.itemId);
+END $$
+
+DROP TRIGGER IF EXISTS trg_items_au $$
+CREATE TRIGGER trg_items_au AFTER UPDATE ON items FOR EACH ROW
+BEGIN
+  INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogItemId)
+  VALUES ('item', NEW.itemId, 'update', NEW.itemId);
+END $$
+
+DROP TRIGGER IF EXISTS trg_items_bd $$
+CREATE TRIGGER trg_items_bd BEFORE DELETE ON items FOR EACH ROW
+BEGIN
+  -- relations removed by ON DELETE CASCADE
+  INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogCategoryId, changelogItemId)
+  SELECT 'categoryitem', categoryitemId, 'delete', categoryitemCategoryId, categoryitemItemId
+  FROM categoryitems
+  WHERE categoryitemItemId = OLD.itemId;
+
+  INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogItemId)
+  VALUES ('item', OLD.itemId, 'delete', OLD.itemId);
+END $$
+
+-- --------------------------------------------------------
+-- Triggers: categoryitems
+-- --------------------------------------------------------
+DROP TRIGGER IF EXISTS trg_categoryitems_ai $$
+CREATE TRIGGER trg_categoryitems_ai AFTER INSERT ON categoryitems FOR EACH ROW
+BEGIN
+  INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogCategoryId, changelogItemId)
+  VALUES ('categoryitem', NEW.categoryitemId, 'insert', NEW.categoryitemCategoryId, NEW.categoryitemItemId);
+END $$
+
+DROP TRIGGER IF EXISTS trg_categoryitems_au $$
+CREATE TRIGGER trg_categoryitems_au AFTER UPDATE ON categoryitems FOR EACH ROW
+BEGIN
+  INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogCategoryId, changelogItemId)
+  VALUES ('categoryitem', NEW.categoryitemId, 'update', NEW.categoryitemCategoryId, NEW.categoryitemItemId);
+END $$
+
+DROP TRIGGER IF EXISTS trg_categoryitems_ad $$
+CREATE TRIGGER trg_categoryitems_ad AFTER DELETE ON categoryitems FOR EACH ROW
+BEGIN
+  INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogCategoryId, changelogItemId)
+  VALUES ('categoryitem', OLD.categoryitemId, 'delete', OLD.categoryitemCategoryId, OLD.categoryitemItemId);
+END $$
+
+DELIMITER ;
+
+
+-- --------------------------------------------------------
+-- Baseline: rows that existed before the triggers were created
+-- (so a consumer starting at since=0 sees the whole catalog once)
+-- --------------------------------------------------------
+INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogCategoryId)
+SELECT 'category', categoryId, 'insert', categoryId
+FROM categories
+WHERE NOT EXISTS (SELECT 1 FROM changelog WHERE changelogEntity = 'category');
+
+INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogItemId)
+SELECT 'item', itemId, 'insert', itemId
+FROM items
+WHERE NOT EXISTS (SELECT 1 FROM changelog WHERE changelogEntity = 'item');
+
+INSERT INTO changelog (changelogEntity, changelogEntityId, changelogOperation, changelogCategoryId, changelogItemId)
+SELECT 'categoryitem', categoryitemId, 'insert', categoryitemCategoryId, categoryitemItemId
+FROM categoryitems
+WHERE NOT EXISTS (SELECT 1 FROM changelog WHERE changelogEntity = 'categoryitem');
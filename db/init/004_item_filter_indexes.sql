@@ -0,0 +1,53 @@
+/*
+ ----------------------------------------------------------------------------
+ File name: db/init/004_item_filter_indexes.sql
+ Bookstore Demo DB - Indexes supporting the filters/sort of GET /api/items
+
+ Requires:
+ - MariaDB 10.1.4+ (CREATE INDEX IF NOT EXISTS)
+
+ -----------------------------------------------------------------------------
+ Updates:
+         261019: Indexes:    7 (items)
+ ----------------------------------------------------------------------------
+ Last update: 261019
+ ----------------------------------------------------------------------------
+
+GET /api/items filters by itemStatusId (equality), price / model year (ranges)
+and categoryId, and sorts by name / price / year / created (ASC or DESC,
+with itemId as tie breaker).
+
+- (itemStatusId, <sort column>): status equality + ORDER BY read in index
+  order (no filesort); a range on the same column uses the index too.
+- (<sort column>) alone: the same without a status filter
+  (ix_items_name already exists in 001_schema.sql).
+- InnoDB appends the primary key (itemId) to every secondary index, so the
+  "ORDER BY <col>, itemId" tie breaker is index order as well.
+- categoryId filters go through uq_categoryitems_pair (categoryId, itemId).
+  They are NOT covered for the sort: the category is in categoryitems and the
+  sort column in items, and no index spans two tables. The optimizer either
+  reads the category's itemIds and sorts the joined rows (filesort; cheap for
+  a small category), or scans items in sort order and probes the pair index
+  (no filesort, but reads items outside the category). Fixing that would need
+  the sort columns denormalized into categoryitems; not done, the categories
+  are small compared with the catalog.
+
+A range on one column combined with a sort on ANOTHER column can't be served
+by a single B-tree in both ways: the optimizer then uses the more selective
+index and sorts the (already filtered) rows.
+
+Existing databases (init scripts run only when the mariadb_data volume is empty):
+docker compose exec -T mariadb sh -c 'mariadb -u root -p"$MARIADB_ROOT_PASSWORD"' < db/init/004_item_filter_indexes.sql
+
+*/
+
+USE bookstore1;
+
+CREATE INDEX IF NOT EXISTS ix_items_status_name    ON items (itemStatusId, itemName);
+CREATE INDEX IF NOT EXISTS ix_items_status_price   ON items (itemStatusId, itemListPrice);
+CREATE INDEX IF NOT EXISTS ix_items_status_year    ON items (itemStatusId, itemModelYear);
+CREATE INDEX IF NOT EXISTS ix_items_status_created ON items (itemStatusId, itemCrTimestamp);
+
+CREATE INDEX IF NOT EXISTS ix_items_price          ON items (itemListPrice);
+CREATE INDEX IF NOT EXISTS ix_items_year           ON items (itemModelYear);
+CREATE INDEX IF NOT EXISTS ix_items_created        ON items (itemCrTimestamp);
@@ -0,0 +1,56 @@
+/*
+ ----------------------------------------------------------------------------
+ File name: db/init/005_idempotency_keys.sql
+ Bookstore Demo DB - Idempotency keys (stored responses of retried POSTs)
+
+ Requires:
+ - MariaDB 10.2.1+ OR MySQL 8.0.13+
+
+ -----------------------------------------------------------------------------
+ Updates:
+         261019: Tables:     1 (idempotencykeys)
+                 Triggers:   0
+                 Procedures: 0
+                 Views:      0
+ ----------------------------------------------------------------------------
+ Last update: 261019
+ ----------------------------------------------------------------------------
+
+POST /api/items and POST /api/import/book accept an Idempotency-Key header
+(see app/core/idempotency.py). The first request with a key claims a row here,
+runs, and stores its response; a retry with the same key gets the stored
+response back instead of running again.
+
+- In progress:  idempotencykeyResponseStatus IS NULL, owned by the request holding
+                idempotencykeyLockToken until idempotencykeyLockedUntil (after that,
+                e.g. when the worker died, a retry takes it over)
+- Completed:    status, content type and body of the response
+- Expired rows (idempotencykeyExpiresAt, IDEMPOTENCY_TTL_SECONDS) are ignored and
+  deleted by the app in small batches (ix_idempotencykeys_expires)
+
+Keys are compared case-sensitively (ascii_bin), unlike the utf8mb4_unicode_ci default.
+
+Existing databases (init scripts run only when the mariadb_data volume is empty):
+docker compose exec -T mariadb sh -c 'mariadb -u root -p"$MARIADB_ROOT_PASSWORD"' < db/init/005_idempotency_keys.sql
+
+*/
+
+USE bookstore1;
+
+-- --------------------------------------------------------
+-- Table: idempotencykeys
+-- --------------------------------------------------------
+CREATE TABLE IF NOT EXISTS idempotencykeys (
+  idempotencykeyKey             VARCHAR(255) CHARACTER SET ascii COLLATE ascii_bin NOT NULL,
+  -- SHA-256 of method, path, query string and body: a key reused for another request is rejected
+  idempotencykeyRequestHash     CHAR(64) CHARACTER SET ascii NOT NULL,
+  idempotencykeyLockToken       CHAR(32) CHARACTER SET ascii NULL,
+  idempotencykeyLockedUntil     TIMESTAMP(6) NULL,
+  idempotencykeyResponseStatus  SMALLINT UNSIGNED NULL,
+  idempotencykeyResponseType    VARCHAR(100) NULL,
+  idempotencykeyResponseBody    MEDIUMBLOB NULL,
+  idempotencykeyCrTimestamp     TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+  idempotencykeyExpiresAt       TIMESTAMP(6) NOT NULL,
+  PRIMARY KEY (idempotencykeyKey),
+  KEY ix_idempotencykeys_expires (idempotencykeyExpiresAt)
+) ENGINE=InnoDB;
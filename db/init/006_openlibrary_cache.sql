@@ -0,0 +1,52 @@
+/*
+ ----------------------------------------------------------------------------
+ File name: db/init/006_openlibrary_cache.sql
+ Bookstore Demo DB - Open Library search cache (shared by all app workers)
+
+ Requires:
+ - MariaDB 10.2.7+ OR MySQL 8.0.13+ (JSON)
+
+ -----------------------------------------------------------------------------
+ Updates:
+         261019: Tables:     1 (openlibrarycache)
+                 Triggers:   0
+                 Procedures: 0
+                 Views:      0
+ ----------------------------------------------------------------------------
+ Last update: 261019
+ ----------------------------------------------------------------------------
+
+fetch_one_book() (POST /api/import/book) looks a search up here before calling
+Open Library, keyed by the normalized query (whitespace collapsed, lower case).
+See app/services/db/openlibrary_cache.py.
+
+- openlibrarycacheBook: the book dict as JSON, or NULL for "no book found"
+  (negative entry, shorter TTL: OPENLIBRARY_CACHE_NEGATIVE_TTL_SECONDS)
+- fresh until openlibrarycacheFreshUntil; after that, served for up to
+  OPENLIBRARY_CACHE_STALE_SECONDS more while one worker refreshes it in the
+  background (openlibrarycacheRefreshUntil = that worker's lease)
+- rows past openlibrarycacheStaleUntil are ignored and deleted by the app in
+  small batches (ix_openlibrarycache_stale)
+
+Existing databases (init scripts run only when the mariadb_data volume is empty):
+docker compose exec -T mariadb sh -c 'mariadb -u root -p"$MARIADB_ROOT_PASSWORD"' < db/init/006_openlibrary_cache.sql
+
+*/
+
+USE bookstore1;
+
+-- --------------------------------------------------------
+-- Table: openlibrarycache
+-- --------------------------------------------------------
+CREATE TABLE IF NOT EXISTS openlibrarycache (
+  -- SHA-256 of the normalized query (queries can be longer than an index allows)
+  openlibrarycacheKey           CHAR(64) CHARACTER SET ascii NOT NULL,
+  openlibrarycacheQuery         VARCHAR(1000) NOT NULL,
+  openlibrarycacheBook          JSON NULL,
+  openlibrarycacheFetchedAt     TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+  openlibrarycacheFreshUntil    TIMESTAMP(6) NOT NULL,
+  openlibrarycacheStaleUntil    TIMESTAMP(6) NOT NULL,
+  openlibrarycacheRefreshUntil  TIMESTAMP(6) NULL,
+  PRIMARY KEY (openlibrarycacheKey),
+  KEY ix_openlibrarycache_stale (openlibrarycacheStaleUntil)
+) ENGINE=InnoDB;
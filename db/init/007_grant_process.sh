@@ -0,0 +1,24 @@
+#!/bin/bash
+# ----------------------------------------------------------------------------
+# File name: db/init/007_grant_process.sh
+# Bookstore Demo DB - PROCESS privilege for the app user (change feed)
+#
+# Updates:
+#         261019: Grants:     1 (PROCESS to $MARIADB_USER)
+# ----------------------------------------------------------------------------
+# Last update: 261019
+# ----------------------------------------------------------------------------
+#
+# GET /api/changes holds back the changelog rows that a still-open transaction
+# could precede with a lower changelogId (see app/services/db/changes.py). The
+# open transactions are read from information_schema.innodb_trx, which needs
+# the (global) PROCESS privilege.
+#
+# A shell script, because the user name comes from the environment (MARIADB_USER).
+# Sourced by the mariadb image's entrypoint (not executable), so docker_process_sql
+# is available.
+#
+# Existing databases (init scripts run only when the mariadb_data volume is empty):
+# docker compose exec mariadb sh -c 'mariadb -u root -p"$MARIADB_ROOT_PASSWORD" -e "GRANT PROCESS ON *.* TO \"$MARIADB_USER\"@\"%\""'
+
+docker_process_sql --database=mysql <<<"GRANT PROCESS ON *.* TO '${MARIADB_USER}'@'%';"
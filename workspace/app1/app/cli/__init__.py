@@ -0,0 +1,3 @@
+# app/cli/__init__.py
+#
+# Command line tools (run from workspace/app1, e.g. python -m app.cli.ingest_dump --help)
@@ -0,0 +1,121 @@
+# app/cli/ingest_dump.py
+#
+# Offline bulk ingestion of books from a local Open Library dump file into `items`.
+#
+#   dump file (optionally .gz) -> generator parser -> mapping (as fetch_one_book) -> batches -> batched upserts
+#
+# - Memory is bounded by --batch-size (the dump is streamed, never loaded)
+# - After every committed batch, the last ingested line number is saved to a checkpoint file;
+#   running the same command again resumes from there (--restart ignores the checkpoint)
+# - Reports progress (records/sec) every --progress-every seconds
+#
+# Usage (inside the app1 container):
+#   cd /workspace/app1
+#   python -m app.cli.ingest_dump /shared/ol_dump_editions_latest.txt.gz --batch-size 1000
+#
+# 261019: Initial version
+
+
+import argparse
+import json
+import os
+import time
+from collections.abc import Iterator
+from itertools import islice
+from typing import Any
+
+from app.services.db.items_sql import upsert_items_from_books
+from app.services.external.openlibrary_dump import iter_dump_books
+
+
+def _batches(books: Iterator[tuple[int, dict[str, Any]]], size: int) -> Iterator[list[tuple[int, dict[str, Any]]]]:
+    while batch := list(islice(books, size)):
+        yield batch
+
+
+def _load_checkpoint(path: str, dump_path: str) -> dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if checkpoint.get("dump") != os.path.abspath(dump_path):
+        raise SystemExit(f"Checkpoint {path} belongs to another dump ({checkpoint.get('dump')}); use --restart")
+    return checkpoint
+
+
+def _save_checkpoint(path: str, checkpoint: dict[str, Any]) -> None:
+    # write + rename: a crash never leaves a half written checkpoint
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def ingest(dump_path: str, checkpoint_path: str, batch_size: int, limit: int | None, progress_every: float, restart: bool) -> dict[str, Any]:
+    checkpoint = {} if restart else _load_checkpoint(checkpoint_path, dump_path)
+    checkpoint.setdefault("dump", os.path.abspath(dump_path))
+    checkpoint.setdefault("line", 0)
+    checkpoint.setdefault("records", 0)
+    checkpoint.setdefault("inserted", 0)
+    checkpoint.setdefault("existing", 0)
+
+    if checkpoint["line"]:
+        print(f"[ingest_dump] resuming after line {checkpoint['line']}")
+
+    books = iter_dump_books(dump_path, start_line=checkpoint["line"])
+    if limit is not None:
+        books = islice(books, limit)
+
+    started = last_report = time.monotonic()
+    records = 0
+    for batch in _batches(books, batch_size):
+        inserted, existing = upsert_items_from_books([book for _, book in batch])
+
+        records += len(batch)
+        checkpoint["line"] = batch[-1][0]
+        checkpoint["records"] += len(batch)
+        checkpoint["inserted"] += inserted
+        checkpoint["existing"] += existing
+        _save_checkpoint(checkpoint_path, checkpoint)
+
+        now = time.monotonic()
+        if now - last_report >= progress_every:
+            last_report = now
+            print(
+                f"[ingest_dump] line={checkpoint['line']} records={checkpoint['records']} "
+                f"inserted={checkpoint['inserted']} existing={checkpoint['existing']} "
+                f"rate={records / (now - started):.0f} records/sec"
+            )
+
+    elapsed = time.monotonic() - started
+    print(
+        f"[ingest_dump] done: {records} records in {elapsed:.1f}s "
+        f"({records / elapsed if elapsed else 0:.0f} records/sec), "
+        f"total inserted={checkpoint['inserted']} existing={checkpoint['existing']}"
+    )
+    return checkpoint
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Ingest books from a local Open Library dump (JSONL/TSV, optionally gzipped)")
+    parser.add_argument("dump", help="path of the dump file")
+    parser.add_argument("--batch-size", type=int, default=1000, help="records per batched upsert (default: 1000)")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many records")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (default: <dump>.checkpoint.json)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and start from the beginning")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="seconds between progress reports (default: 5)")
+    args = parser.parse_args(argv)
+
+    ingest(
+        dump_path=args.dump,
+        checkpoint_path=args.checkpoint or f"{args.dump}.checkpoint.json",
+        batch_size=args.batch_size,
+        limit=args.limit,
+        progress_every=args.progress_every,
+        restart=args.restart,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,518 @@
+# app/cli/loadtest.py
+#
+# End-to-end load test of app1 as deployed: gunicorn + UvicornWorker with --workers (WEB_CONCURRENCY) workers,
+# against the MariaDB configured by DB_* and an in-process fake Open Library server (OPENLIBRARY_URL).
+#
+# - Open-loop load: requests are sent at a fixed arrival rate (--rate, constant or poisson spacing) whether or
+#   not earlier ones have completed, and latency is measured from the scheduled send time, so a saturated
+#   server shows up as latency instead of silently lowering the load (no coordinated omission)
+# - Configurable mix of catalog reads, writes (POST /items) and imports (POST /import/book): --mix read=80,write=15,import=5
+# - Reports throughput and p50/p95/p99 latency (all responses) per route; --output saves the report together with the
+#   configuration (workers, worker class, rate, mix, --env overrides, git commit), --compare prints saved runs side by side
+# - The first --warmup seconds are sent but not measured
+#
+# Usage (inside the app1 container, MariaDB up and seeded):
+#   cd /workspace/app1
+#   python -m app.cli.loadtest --workers 2 --rate 200 --duration 30 --output /shared/lt-w2.json
+#   python -m app.cli.loadtest --workers 4 --rate 200 --duration 30 --output /shared/lt-w4.json
+#   python -m app.cli.loadtest --compare /shared/lt-w2.json /shared/lt-w4.json
+#   python -m app.cli.loadtest --url http://localhost:8000 ...    <-- an app already running (nothing started)
+#
+# Settings of the app under test are passed with --env, e.g. --env SINGLEFLIGHT_ENABLED=0 --env OPENLIBRARY_CACHE_ENABLED=0;
+# to compare sync and async route implementations, run the same command on both versions with different --label.
+# Items created by the run are named "loadtest ..." and deleted at the end (--keep-items to keep them).
+#
+# 261019: Initial version
+# 261019: Import queries carry a per-run id (run_id in the report): the search cache (openlibrarycache, shared and
+#         kept for days) never serves a run what an earlier run imported, so every run starts with a cold cache
+# 261019: Percentiles cover EVERY response (fast failures and timeouts included, not only 2xx); the latency of the
+#         errors is reported separately (error_p99_ms) and runs with errors are flagged in the report
+
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+APP_DIR = Path(__file__).resolve().parents[2]   # workspace/app1
+KINDS = ("read", "write", "import")
+STARTUP_TIMEOUT = 30.0
+REQUEST_TIMEOUT = 60.0                           # as gunicorn's --timeout
+
+# (route, method, url, json body)
+Request = tuple[str, str, str, Any]
+
+
+# -------------------------
+# Fake Open Library
+# -------------------------
+
+def start_fake_openlibrary(latency_ms: float) -> ThreadingHTTPServer:
+    """
+    Search endpoint answering every query with one book ("loadtest <q>") after `latency_ms`.
+    Runs in a daemon thread; stop it with .shutdown().
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlsplit(self.path).query).get("q", [""])[0]
+            time.sleep(latency_ms / 1000)
+            body = json.dumps({"docs": [{"title": f"loadtest {query}"[:100], "first_publish_year": 2000}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# -------------------------
+# The app under test
+# -------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(workers: int, worker_class: str, env: dict[str, str]) -> tuple[subprocess.Popen, str]:
+    """
+    Starts gunicorn (as in docker-compose.yml) on a free local port; returns the process and its base URL
+    once /health answers.
+    """
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn", "app.main:app",
+            "-k", worker_class,
+            "-b", f"127.0.0.1:{port}",
+            "--workers", str(workers),
+            "--timeout", "60",
+        ],
+        cwd=APP_DIR,
+        env={**os.environ, "WEB_CONCURRENCY": str(workers), **env},
+    )
+    url = f"http://127.0.0.1:{port}"
+    started = time.monotonic()
+    while time.monotonic() - started < STARTUP_TIMEOUT:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"gunicorn did not answer /health within {STARTUP_TIMEOUT:.0f}s")
+
+
+def stop_app(process: subprocess.Popen) -> None:
+    process.terminate()   # SIGTERM: gunicorn's graceful shutdown
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# -------------------------
+# Workload
+# -------------------------
+
+def parse_mix(value: str) -> dict[str, float]:
+    """
+    "read=80,write=15,import=5" -> weights per kind (kinds left out get 0).
+    """
+    mix = dict.fromkeys(KINDS, 0.0)
+    try:
+        for part in value.split(","):
+            kind, weight = part.split("=")
+            kind = kind.strip()
+            if kind not in mix:
+                raise ValueError(kind)
+            mix[kind] = float(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected e.g. read=80,write=15,import=5 (kinds: {', '.join(KINDS)})")
+    if sum(mix.values()) <= 0 or min(mix.values()) < 0:
+        raise argparse.ArgumentTypeError("weights must be >= 0, at least one > 0")
+    return mix
+
+
+def make_workload(
+    mix: dict[str, float],
+    item_ids: list[int],
+    category_ids: list[int],
+    import_queries: int,
+    rng: random.Random,
+    run_id: str = "",
+) -> Callable[[], Request]:
+    """
+    Returns a function drawing the next request of the mix.
+    Imports draw from `import_queries` distinct queries, so repeated ones exercise coalescing / the search cache;
+    the queries start with `run_id`, so they are new to the cache (and to items) on every run.
+    """
+    reads: list[Callable[[], Request]] = [
+        lambda: ("GET /api/items/{item_id}", "GET", f"/api/items/{rng.choice(item_ids)}", None),
+        lambda: (
+            "GET /api/items?ids=",
+            "GET",
+            "/api/items?ids=" + ",".join(map(str, rng.sample(item_ids, min(10, len(item_ids))))),
+            None,
+        ),
+        lambda: (
+            "GET /api/items?categoryId=&embed=categories",
+            "GET",
+            f"/api/items?categoryId={rng.choice(category_ids)}&sort=-price&embed=categories",
+            None,
+        ),
+        lambda: ("GET /api/categories?embed=items", "GET", "/api/categories?embed=items&fields=categoryName,itemName", None),
+    ]
+    kinds = [kind for kind in KINDS if mix[kind] > 0]
+    weights = [mix[kind] for kind in kinds]
+
+    def next_request() -> Request:
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "read":
+            return rng.choice(reads)()
+        if kind == "write":
+            body = {"itemName": f"loadtest {uuid.uuid4().hex[:16]}", "itemListPrice": "9.99", "itemModelYear": 2024}
+            return "POST /api/items", "POST", "/api/items", body
+        return "POST /api/import/book", "POST", f"/api/import/book?q={run_id}query{rng.randrange(import_queries)}", None
+
+    return next_request
+
+
+# -------------------------
+# Load generator + report
+# -------------------------
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}    # route -> seconds (every response, errors included)
+        self.error_latencies: dict[str, list[float]] = {}  # route -> seconds (non-2xx responses and exceptions)
+        self.statuses: dict[str, dict[str, int]] = {}  # route -> status (or exception name) -> count
+        self.first_send: float | None = None
+        self.last_done: float | None = None
+        self.created_item_ids: set[int] = set()
+        self.max_send_lag = 0.0                        # > a few ms: the load generator itself was saturated
+
+    def record(self, route: str, status: str, latency: float, done: float) -> None:
+        statuses = self.statuses.setdefault(route, {})
+        statuses[status] = statuses.get(status, 0) + 1
+        self.latencies.setdefault(route, []).append(latency)
+        errors = self.error_latencies.setdefault(route, [])
+        if not status.startswith("2"):
+            errors.append(latency)
+        self.last_done = done if self.last_done is None else max(self.last_done, done)
+
+
+def _created_item_id(route: str, response: httpx.Response) -> int | None:
+    # (only the POST responses are parsed: parsing every GET would load the client, not the server)
+    if route == "POST /api/items" and response.status_code == 201:
+        return response.json().get("itemId")
+    if route == "POST /api/import/book" and response.status_code == 200:
+        return (response.json().get("stored_item") or {}).get("itemId")
+    return None
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    next_request: Callable[[], Request],
+    rate: float,
+    duration: float,
+    warmup: float = 0.0,
+    arrival: str = "constant",
+    rng: random.Random | None = None,
+) -> Recorder:
+    """
+    Sends requests at `rate` per second for warmup + duration seconds (open loop), then waits for the last ones.
+    """
+    rng = rng or random.Random()
+    recorder = Recorder()
+    loop = asyncio.get_running_loop()
+    start = loop.time() + 0.05
+    pending: set[asyncio.Task] = set()
+
+    async def send(request: Request, scheduled: float, measured: bool) -> None:
+        route, method, url, body = request
+        try:
+            r = await client.request(method, url, json=body)
+            status = str(r.status_code)
+            item_id = _created_item_id(route, r)
+            if item_id is not None:
+                recorder.created_item_ids.add(item_id)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        done = loop.time()
+        if measured:
+            recorder.record(route, status, done - scheduled, done)
+
+    offset = 0.0
+    while offset < warmup + duration:
+        scheduled = start + offset
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        measured = offset >= warmup
+        if measured:
+            recorder.max_send_lag = max(recorder.max_send_lag, loop.time() - scheduled)
+        if measured and recorder.first_send is None:
+            recorder.first_send = scheduled
+        task = asyncio.create_task(send(next_request(), scheduled, measured))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        offset += rng.expovariate(rate) if arrival == "poisson" else 1 / rate
+
+    await asyncio.gather(*pending)
+    return recorder
+
+
+def percentile(sorted_values: list[float], p: float) -> float | None:
+    # nearest rank
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def _stats(latencies: list[float], error_latencies: list[float], statuses: dict[str, int], elapsed: float) -> dict[str, Any]:
+    # percentiles over all responses: a failure that returns fast must not make the route look faster
+    latencies = sorted(latencies)
+    error_latencies = sorted(error_latencies)
+    requests = sum(statuses.values())
+    ok = requests - len(error_latencies)
+    return {
+        "requests": requests,
+        "ok": ok,
+        "errors": len(error_latencies),
+        "error_rate": round(len(error_latencies) / requests, 4) if requests else 0.0,
+        "statuses": dict(sorted(statuses.items())),
+        "throughput": round(ok / elapsed, 2) if elapsed > 0 else None,   # 2xx per second
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "max_ms": _ms(latencies[-1] if latencies else None),
+        "error_p99_ms": _ms(percentile(error_latencies, 99)),
+    }
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def build_report(recorder: Recorder, config: dict[str, Any]) -> dict[str, Any]:
+    # throughput over the measured window: from its first send to the last completion (includes draining a backlog)
+    elapsed = (recorder.last_done or 0.0) - (recorder.first_send or 0.0)
+    total_statuses: dict[str, int] = {}
+    for statuses in recorder.statuses.values():
+        for status, count in statuses.items():
+            total_statuses[status] = total_statuses.get(status, 0) + count
+    total = _stats(
+        [v for values in recorder.latencies.values() for v in values],
+        [v for values in recorder.error_latencies.values() for v in values],
+        total_statuses,
+        elapsed,
+    )
+    return {
+        "config": config,
+        "routes": {
+            route: _stats(recorder.latencies[route], recorder.error_latencies[route], recorder.statuses[route], elapsed)
+            for route in sorted(recorder.statuses)
+        },
+        "total": total,
+        "max_send_lag_ms": _ms(recorder.max_send_lag),
+        "has_errors": total["errors"] > 0,   # the latencies are not those of a healthy service
+    }
+
+
+def _fmt(value: Any) -> str:
+    return "-" if value is None else str(value)
+
+
+def print_report(report: dict[str, Any]) -> None:
+    config = report["config"]
+    print(
+        f"\n{config.get('label') or ''}  workers={config.get('workers')}  rate={config['rate']}/s ({config['arrival']})"
+        f"  duration={config['duration']}s  mix={config['mix']}  env={config.get('env') or {}}"
+    )
+    header = f"{'route':<42} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for route, s in [*report["routes"].items(), ("TOTAL", report["total"])]:
+        print(
+            f"{route:<42} {s['requests']:>8} {s['errors']:>6} {_fmt(s['throughput']):>8} {_fmt(s['p50_ms']):>8}"
+            f" {_fmt(s['p95_ms']):>8} {_fmt(s['p99_ms']):>8} {_fmt(s['max_ms']):>8}"
+        )
+        if s["errors"]:
+            print(f"{'':<42} statuses: {s['statuses']}  error p99 ms: {_fmt(s['error_p99_ms'])}")
+    if report["has_errors"]:
+        total = report["total"]
+        print(f"WARNING: {total['errors']} requests ({total['error_rate']:.2%}) failed: latencies include them, see the statuses")
+    if report["max_send_lag_ms"] > 10:
+        print(f"WARNING: requests were sent up to {report['max_send_lag_ms']} ms late: the load generator is saturated, lower --rate")
+
+
+def print_comparison(reports: list[dict[str, Any]], names: list[str]) -> None:
+    """
+    req/s and p99 per route, one column per run.
+    """
+    labels = [r["config"].get("label") or name for r, name in zip(reports, names)]
+    for i, (label, r) in enumerate(zip(labels, reports)):
+        config = r["config"]
+        print(f"[{i}] {label}: workers={config.get('workers')} rate={config['rate']}/s mix={config.get('mix')} env={config.get('env') or {}}")
+    header = f"{'route':<42}" + "".join(f" {f'[{i}] req/s':>12} {f'[{i}] p99 ms':>12}" for i in range(len(reports)))
+    print(header)
+    print("-" * len(header))
+    routes = sorted({route for r in reports for route in r["routes"]}) + ["TOTAL"]
+    for route in routes:
+        row = f"{route:<42}"
+        for r in reports:
+            s = r["total"] if route == "TOTAL" else r["routes"].get(route)
+            row += f" {_fmt(s and s['throughput']):>12} {_fmt(s and s['p99_ms']):>12}"
+        print(row)
+
+
+# -------------------------
+# Main
+# -------------------------
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_env(values: list[str]) -> dict[str, str]:
+    env = {}
+    for value in values:
+        key, sep, val = value.partition("=")
+        if not sep or not key:
+            raise SystemExit(f"--env expects KEY=VALUE, got {value!r}")
+        env[key] = val
+    return env
+
+
+async def _discover_ids(client: httpx.AsyncClient) -> tuple[list[int], list[int]]:
+    items = (await client.get("/api/items", params={"fields": "itemId"})).raise_for_status().json()
+    categories = (await client.get("/api/categories", params={"fields": "categoryId"})).raise_for_status().json()
+    if not items or not categories:
+        raise SystemExit("The database has no items / categories: load db/init/002_seed.sql first")
+    return [i["itemId"] for i in items], [c["categoryId"] for c in categories]
+
+
+async def _delete_items(client: httpx.AsyncClient, item_ids: set[int]) -> None:
+    semaphore = asyncio.Semaphore(20)
+
+    async def delete(item_id: int) -> None:
+        async with semaphore:
+            await client.delete(f"/api/items/{item_id}")
+
+    await asyncio.gather(*(delete(i) for i in item_ids))
+
+
+async def _run(args: argparse.Namespace, url: str, config: dict[str, Any]) -> dict[str, Any]:
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=url, timeout=REQUEST_TIMEOUT, limits=limits) as client:
+        item_ids, category_ids = await _discover_ids(client)
+        next_request = make_workload(args.mix, item_ids, category_ids, args.import_queries, rng, f"{config['run_id']}-")
+        recorder = await run_load(client, next_request, args.rate, args.duration, args.warmup, args.arrival, rng)
+        if not args.keep_items:
+            await _delete_items(client, recorder.created_item_ids)
+    return build_report(recorder, config)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end load test of app1 (gunicorn + UvicornWorker)")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT", help="Print saved reports (--output) side by side and exit")
+    parser.add_argument("--url", help="Test an already running app instead of starting gunicorn")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--worker-class", default="uvicorn.workers.UvicornWorker")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Setting of the app under test (repeatable)")
+    parser.add_argument("--rate", type=float, default=100.0, help="Requests per second (all routes)")
+    parser.add_argument("--arrival", choices=("constant", "poisson"), default="constant")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of load before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("read=80,write=15,import=5"))
+    parser.add_argument("--import-queries", type=int, default=50, help="Distinct import queries")
+    parser.add_argument("--openlibrary-latency-ms", type=float, default=100.0, help="Latency of the fake Open Library")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--label", default="", help="Name of this configuration in reports")
+    parser.add_argument("--output", help="Save the report (JSON)")
+    parser.add_argument("--keep-items", action="store_true", help="Keep the items created by the run")
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, encoding="utf-8") as f:
+                reports.append(json.load(f))
+        print_comparison(reports, [Path(p).stem for p in args.compare])
+        return
+
+    env = _parse_env(args.env)
+    config = {
+        "label": args.label,
+        "run_id": uuid.uuid4().hex[:8],
+        "url": args.url,
+        "workers": None if args.url else args.workers,
+        "worker_class": None if args.url else args.worker_class,
+        "env": env,
+        "rate": args.rate,
+        "arrival": args.arrival,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "mix": args.mix,
+        "import_queries": args.import_queries,
+        "openlibrary_latency_ms": args.openlibrary_latency_ms,
+        "git_commit": _git_commit(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    if args.url:
+        report = asyncio.run(_run(args, args.url, config))   # imports go to the app's own OPENLIBRARY_URL
+    else:
+        fake_openlibrary = start_fake_openlibrary(args.openlibrary_latency_ms)
+        openlibrary_url = f"http://127.0.0.1:{fake_openlibrary.server_port}/search.json"
+        process = None
+        try:
+            process, url = start_app(args.workers, args.worker_class, {"OPENLIBRARY_URL": openlibrary_url, **env})
+            report = asyncio.run(_run(args, url, config))
+        finally:
+            if process is not None:
+                stop_app(process)
+            fake_openlibrary.shutdown()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,5 +18,48 @@ class Settings(BaseModel):
     db_password: str = os.getenv("DB_PASSWORD", "password")
     db_name: str = os.getenv("DB_NAME", "bookstore1")
 
+    # Request coalescing (single-flight) for hot identical reads and imports
+    singleflight_enabled: bool = os.getenv("SINGLEFLIGHT_ENABLED", "1") == "1"
+
+    # Change feed (GET /changes): changes younger than this are held back until concurrent commits have settled
+    changes_settle_ms: int = int(os.getenv("CHANGES_SETTLE_MS", "2000"))
+
+    # Open Library (external API): base URL, retries, circuit breaker
+    openlibrary_url: str = os.getenv("OPENLIBRARY_URL", "https://openlibrary.org/search.json")
+    openlibrary_max_attempts: int = int(os.getenv("OPENLIBRARY_MAX_ATTEMPTS", "4"))
+    openlibrary_retry_ratio: float = float(os.getenv("OPENLIBRARY_RETRY_RATIO", "0.2"))  # retries per call (budget)
+    openlibrary_cb_failure_rate: float = float(os.getenv("OPENLIBRARY_CB_FAILURE_RATE", "0.5"))
+    openlibrary_cb_minimum_calls: int = int(os.getenv("OPENLIBRARY_CB_MINIMUM_CALLS", "10"))
+    openlibrary_cb_window_size: int = int(os.getenv("OPENLIBRARY_CB_WINDOW_SIZE", "20"))
+    openlibrary_cb_open_seconds: float = float(os.getenv("OPENLIBRARY_CB_OPEN_SECONDS", "30"))
+
+    # Open Library search cache (table openlibrarycache): found / "no book found" TTLs, and how long an
+    # expired entry is still served while it is refreshed in the background
+    openlibrary_cache_enabled: bool = os.getenv("OPENLIBRARY_CACHE_ENABLED", "1") == "1"
+    openlibrary_cache_ttl_seconds: int = int(os.getenv("OPENLIBRARY_CACHE_TTL_SECONDS", "604800"))
+    openlibrary_cache_negative_ttl_seconds: int = int(os.getenv("OPENLIBRARY_CACHE_NEGATIVE_TTL_SECONDS", "3600"))
+    openlibrary_cache_stale_seconds: int = int(os.getenv("OPENLIBRARY_CACHE_STALE_SECONDS", "86400"))
+
+    # Internal endpoints + on-demand profiling (both disabled while INTERNAL_TOKEN is empty)
+    internal_token: str = os.getenv("INTERNAL_TOKEN", "")
+    profile_dir: str = os.getenv("PROFILE_DIR", "/tmp/app1-profiles")  # shared by all workers
+    profile_keep: int = int(os.getenv("PROFILE_KEEP", "50"))
+    profile_interval_ms: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+    # Tracing: TRACING_EXPORTER=none|file; "{pid}" in TRACING_FILE is replaced by the worker pid
+    tracing_exporter: str = os.getenv("TRACING_EXPORTER", "none")
+    tracing_file: str = os.getenv("TRACING_FILE", "/tmp/app1-traces/traces-{pid}.jsonl")
+    tracing_sample_ratio: float = float(os.getenv("TRACING_SAMPLE_RATIO", "0.1"))  # share of new traces recorded
+
+    # Request deadlines (ms): default, and cap for the X-Request-Timeout-Ms header (below gunicorn's --timeout 60)
+    request_timeout_ms: int = int(os.getenv("REQUEST_TIMEOUT_MS", "30000"))
+    request_timeout_max_ms: int = int(os.getenv("REQUEST_TIMEOUT_MAX_MS", "55000"))
+
+    # Idempotency-Key (POST /items, /import/book): stored responses kept this long; a claim whose worker
+    # died is taken over after the lease (= gunicorn's --timeout); expired rows deleted this often per worker
+    idempotency_ttl_seconds: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    idempotency_lease_ms: int = int(os.getenv("IDEMPOTENCY_LEASE_MS", "60000"))
+    idempotency_cleanup_seconds: float = float(os.getenv("IDEMPOTENCY_CLEANUP_SECONDS", "300"))
+
 
 settings = Settings()
@@ -8,11 +8,104 @@
 #   - Switched to autocommit=False for better transaction management in POST/PUT/PATCH/DELETE routes.
 # 260216:
 #   - Added automatic commit/rollback logic to ensure INSERT persistence
+# 261019:
+#   - Cursors are TracingCursor: each SQL statement runs inside a tracing span (see core/tracing.py)
+# 261019:
+#   - Statements run with the remaining request deadline as max_statement_time (see core/deadline.py),
+#     and are killed (KILL QUERY) when the client disconnects
+# 261019:
+#   - Rows are compact Row objects (core/rows.py) instead of DictCursor dicts
+# 261019:
+#   - No span (and no statement text / attributes) for statements of traces that are not recorded
 
 from contextlib import contextmanager
 import pymysql
-from pymysql.cursors import DictCursor
+from pymysql.cursors import Cursor
 from .config import settings
+from .rows import RowCursor
+from .deadline import DeadlineExceeded, RequestCancelled, current_deadline
+from .tracing import start_span, will_record
+
+# Statements that accept a SET STATEMENT ... FOR prefix (not SET, COMMIT, KILL, SHOW, ...)
+_DEADLINE_VERBS = {"SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH"}
+
+ER_QUERY_INTERRUPTED = 1317   # KILL QUERY
+ER_STATEMENT_TIMEOUT = 1969   # max_statement_time exceeded
+
+
+class TracingCursor(RowCursor):
+    """
+    RowCursor that wraps each statement in a client span.
+    The statement is recorded with its %s placeholders (never with the bound values).
+    Within a request, each statement is bounded by the request deadline.
+    """
+
+    def execute(self, query, args=None):
+        if not will_record():
+            return self._execute(query, args)
+        with start_span(f"SQL {_verb(query)}", kind="client", **{"db.system": "mariadb", "db.statement": _text(query)[:2000]}) as span:
+            result = self._execute(query, args)
+            span.set_attribute("db.rowcount", self.rowcount)
+            return result
+
+    def _execute(self, query, args):
+        deadline = current_deadline()
+        if deadline is None or _verb(query) not in _DEADLINE_VERBS:
+            return super().execute(query, args)
+        return self._execute_with_deadline(deadline, query, args)
+
+    def _execute_with_deadline(self, deadline, query, args):
+        remaining = deadline.check()
+        prefix = f"SET STATEMENT max_statement_time={max(remaining, 0.001):.3f} FOR "
+        # executemany() passes the multi-row INSERT as bytes
+        query = prefix.encode() + query if isinstance(query, (bytes, bytearray)) else prefix + query
+        thread_id = self.connection.thread_id()
+        try:
+            with deadline.cancellable(lambda: kill_query(thread_id)):
+                return super().execute(query, args)
+        except pymysql.err.MySQLError as e:
+            if e.args and e.args[0] in (ER_QUERY_INTERRUPTED, ER_STATEMENT_TIMEOUT):
+                if deadline.cancelled:
+                    raise RequestCancelled("Client disconnected") from e
+                raise DeadlineExceeded("Request deadline exceeded") from e
+            raise
+
+    def executemany(self, query, args):
+        if not will_record():
+            return super().executemany(query, args)
+        with start_span(f"SQL {_verb(query)}", kind="client", **{"db.system": "mariadb", "db.statement": query.strip()[:2000]}) as span:
+            # pymysql turns multi-row INSERTs into one statement, other statements into one execute() each
+            # (either way they go through execute(), so they are bounded by the request deadline too)
+            result = super().executemany(query, args)
+            span.set_attribute("db.rowcount", self.rowcount)
+            return result
+
+
+def _text(query) -> str:
+    return query.decode(errors="replace") if isinstance(query, (bytes, bytearray)) else query
+
+
+def _verb(query) -> str:
+    query = _text(query[:20]).strip()
+    return query.split(None, 1)[0].upper() if query else "?"
+
+
+def kill_query(thread_id: int) -> None:
+    """
+    Aborts the statement running on connection `thread_id` (the connection itself stays usable).
+    Uses its own connection and a plain cursor (no deadline: the current request may be the one cancelled).
+    """
+    try:
+        conn = _connect()
+    except pymysql.err.MySQLError:
+        return
+    try:
+        with conn.cursor(Cursor) as cur:
+            cur.execute("KILL QUERY %s", (thread_id,))
+    except pymysql.err.MySQLError:
+        pass   # e.g. the statement / connection has already finished
+    finally:
+        conn.close()
 
 
 def _connect():
@@ -23,7 +116,7 @@ def _connect():
         password=settings.db_password,
         database=settings.db_name,
         charset="utf8mb4",
-        cursorclass=DictCursor,   # rows as dicts
+        cursorclass=TracingCursor,   # rows as Row objects (RowCursor) + a tracing span per statement
         # autocommit=True,          # for GET-only it's fine; later we can manage transactions
         autocommit=False,  # IMPORTANT for POST/PUT/PATCH/DELETE
     )
@@ -0,0 +1,253 @@
+# app/core/deadline.py
+# (per-request deadlines)
+#
+# Every HTTP request gets a deadline:
+#   - X-Request-Timeout-Ms header (capped at REQUEST_TIMEOUT_MAX_MS), else
+#   - the default of the route (dependency route_deadline(ms), see the routers), else
+#   - REQUEST_TIMEOUT_MS
+# measured from the moment the request reached the app.
+#
+# The deadline is propagated to the work done for the request:
+#   - each SQL statement runs with SET STATEMENT max_statement_time=<remaining> FOR ... (TracingCursor in database.py)
+#   - Open Library calls use the remaining time as httpx timeout and do not retry past it (external_books.py)
+# Once it has passed, DeadlineExceeded is raised (-> 504, see main.py).
+#
+# When the client disconnects before the response is sent, the request is cancelled: the statements
+# running for it are killed (KILL QUERY) and no further statement is started (RequestCancelled).
+#
+# Work shared by several requests (single-flight, see core/singleflight.py) runs under a SharedDeadline:
+# it lasts as long as the latest deadline of the requests waiting for it, and is cancelled (KILL QUERY)
+# only once all of them have given up; each request waits for it no longer than its own deadline.
+# Work that outlives the request on purpose (e.g. storing a result already paid for) runs in
+# shared_context(): under a deadline of REQUEST_TIMEOUT_MAX_MS that no client can cancel.
+#
+# 261019: Initial version
+# 261019: shared_context() (coalesced work must not inherit the deadline / disconnect of the first caller)
+# 261019: SharedDeadline: coalesced work is bounded by its waiters' deadlines (not REQUEST_TIMEOUT_MAX_MS)
+#         and cancelled once every waiter has left
+
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+
+TIMEOUT_HEADER = b"x-request-timeout-ms"
+
+
+class DeadlineExceeded(Exception):
+    """
+    The deadline of the current request has passed (-> 504).
+    """
+
+
+class RequestCancelled(DeadlineExceeded):
+    """
+    The client of the current request has disconnected.
+    """
+
+
+class Deadline:
+    def __init__(self, timeout_ms: float, source: str):
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + timeout_ms / 1000
+        self.source = source                  # "header" | "route" | "default" | "shared"
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._cancel_actions: dict[int, Callable[[], None]] = {}
+
+    def remaining(self) -> float:
+        """
+        Seconds left (<= 0 once expired).
+        """
+        return self.expires_at - time.monotonic()
+
+    def check(self) -> float:
+        """
+        Returns the seconds left; raises RequestCancelled / DeadlineExceeded when there are none.
+        """
+        if self.cancelled:
+            raise RequestCancelled("Client disconnected")
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        return remaining
+
+    def apply_route_default(self, timeout_ms: float) -> None:
+        # an explicit client timeout wins over the route default
+        if self.source != "header":
+            self.expires_at = self.started_at + timeout_ms / 1000
+            self.source = "route"
+
+    @contextmanager
+    def cancellable(self, action: Callable[[], None]) -> Iterator[None]:
+        """
+        Registers `action` (e.g. KILL QUERY of a running statement) to be called if the request is cancelled.
+        """
+        key = id(action)
+        with self._lock:
+            self._cancel_actions[key] = action
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._cancel_actions.pop(key, None)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        with self._lock:
+            actions = list(self._cancel_actions.values())
+        for action in actions:
+            action()
+
+
+class SharedDeadline(Deadline):
+    """
+    Deadline of work done on behalf of several requests: it expires with the latest deadline of its
+    waiters (join()), and is cancelled by the caller of leave() that was the last one waiting.
+    """
+
+    def __init__(self, first: Deadline):
+        super().__init__(settings.request_timeout_max_ms, "shared")
+        self.expires_at = first.expires_at
+        self._waiters = 1
+
+    def join(self, deadline: Deadline | None) -> None:
+        # a request without a deadline may wait as long as any request could
+        expires_at = deadline.expires_at if deadline is not None else self.started_at + settings.request_timeout_max_ms / 1000
+        with self._lock:
+            self._waiters += 1
+            self.expires_at = max(self.expires_at, expires_at)
+
+    def leave(self) -> bool:
+        """
+        A waiter gave up (its deadline passed / its client disconnected). True when it was the last one:
+        nobody needs the result any more, the caller cancels the work.
+        """
+        with self._lock:
+            self._waiters -= 1
+            return self._waiters == 0
+
+
+_current: ContextVar[Deadline | None] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Deadline | None:
+    return _current.get()
+
+
+def remaining_seconds(cap: float | None = None) -> float | None:
+    """
+    Seconds left for the current request (at most `cap`); raises once the deadline has passed.
+    Outside of a request: `cap`.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return cap
+    remaining = deadline.check()
+    return remaining if cap is None else min(cap, remaining)
+
+
+def shared_context(deadline: Deadline | None = None) -> contextvars.Context:
+    """
+    A copy of the current context for work that is not bound to the current request: the request deadline
+    is replaced by `deadline` (e.g. a SharedDeadline), by default a fresh one of REQUEST_TIMEOUT_MAX_MS
+    (the longest any request may ask for), which no client disconnect cancels.
+    Outside of a request and without `deadline`: a plain copy (no deadline).
+    """
+    ctx = contextvars.copy_context()
+    if deadline is None and _current.get() is not None:
+        deadline = Deadline(settings.request_timeout_max_ms, "shared")
+    if deadline is not None:
+        ctx.run(_current.set, deadline)
+    return ctx
+
+
+def route_deadline(timeout_ms: int):
+    """
+    FastAPI dependency factory: default deadline of a route, e.g.
+        @router.get("/items", dependencies=[Depends(route_deadline(10_000))])
+    """
+    async def dependency() -> None:
+        # async: runs on the event loop, before the (sync) handler is sent to the threadpool
+        deadline = _current.get()
+        if deadline is not None:
+            deadline.apply_route_default(timeout_ms)
+    return dependency
+
+
+def request_timeout_ms(scope: dict[str, Any]) -> float:
+    """
+    Timeout of a request (header, else REQUEST_TIMEOUT_MS), for middlewares running outside DeadlineMiddleware.
+    Route defaults are not known there.
+    """
+    return _timeout_from_header(scope) or settings.request_timeout_ms
+
+
+def _timeout_from_header(scope: dict[str, Any]) -> float | None:
+    for key, value in scope["headers"]:
+        if key == TIMEOUT_HEADER:
+            try:
+                timeout_ms = float(value)
+            except ValueError:
+                return None
+            return min(timeout_ms, settings.request_timeout_max_ms) if timeout_ms > 0 else None
+    return None
+
+
+class DeadlineMiddleware:
+    """
+    Pure ASGI middleware: sets the deadline of the request and watches for a client disconnect.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timeout_ms = _timeout_from_header(scope)
+        deadline = Deadline(timeout_ms or settings.request_timeout_ms, "header" if timeout_ms else "default")
+        token = _current.set(deadline)
+
+        # The request messages are read by a watcher task, so a disconnect is noticed even while
+        # the app is busy (and never reads the body, e.g. GET); the app reads them from a queue.
+        messages: asyncio.Queue = asyncio.Queue()
+        response_sent = False
+
+        async def watch():
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    if not response_sent:
+                        await run_in_threadpool(deadline.cancel)   # KILL QUERY is blocking I/O
+                    return
+
+        async def receive_queued():
+            message = await messages.get()
+            if message["type"] == "http.disconnect":
+                messages.put_nowait(message)   # every later receive() sees it too
+            return message
+
+        async def send_tracked(message):
+            nonlocal response_sent
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_sent = True
+            await send(message)
+
+        watcher = asyncio.create_task(watch())
+        try:
+            await self.app(scope, receive_queued, send_tracked)
+        finally:
+            watcher.cancel()
+            _current.reset(token)
@@ -0,0 +1,341 @@
+# app/core/idempotency.py
+# (Idempotency-Key for retried POSTs)
+#
+# Clients on flaky networks retry POSTs they never got an answer to. With an Idempotency-Key header,
+# a retry does not run the request again (no duplicate item, no second Open Library fetch + upsert):
+#   - the first request with a key claims a row in `idempotencykeys` (db/init/005_idempotency_keys.sql),
+#     runs, and stores its response (status, content type, body)
+#   - a retry with the same key gets the stored response back (header Idempotent-Replayed: true)
+#   - a duplicate arriving while the first one is still running waits for it (polls the row, any worker),
+#     at most until its own deadline (-> 409 with Retry-After) and only while its client is connected
+#   - the same key with a different request (method, path, query, body) -> 422
+#
+# When the key cannot be claimed (database error), the request is not run: 503 with Retry-After.
+# Only responses that a retry would reproduce are stored: 5xx, 408, 429 and 499 (client gone) release
+# the key instead, so the next retry runs again. So does a request that raised.
+# A claim is leased (IDEMPOTENCY_LEASE_MS): if its worker dies, a retry takes the key over after that.
+# Rows expire after IDEMPOTENCY_TTL_SECONDS; each worker deletes expired rows every IDEMPOTENCY_CLEANUP_SECONDS.
+#
+# Requests without the header are not affected.
+#
+# 261019: Initial version (POST /items, POST /import/book)
+# 261019: The wait for an in-progress duplicate is bounded by the request deadline (this middleware runs outside
+#         DeadlineMiddleware, so the timeout is read from the request: core/deadline.request_timeout_ms) and by a disconnect
+# 261019: A database error while claiming the key -> 503 with Retry-After (was a 500); a response without a status
+#         is never stored
+
+
+import asyncio
+import hashlib
+import secrets
+import time
+from collections.abc import Iterable
+from typing import Any
+
+import pymysql
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+
+from .config import settings
+from .database import get_conn
+from .deadline import request_timeout_ms
+from .rows import Row
+
+KEY_HEADER = b"idempotency-key"
+KEY_MAX_LENGTH = 255                   # idempotencykeys.idempotencykeyKey is VARCHAR(255) ascii
+REPLAYED_HEADER = "Idempotent-Replayed"
+IN_PROGRESS_RETRY_AFTER = 1            # seconds (Retry-After of the 409 for a duplicate still in progress)
+UNAVAILABLE_RETRY_AFTER = 1            # seconds (Retry-After of the 503 when the key cannot be claimed)
+
+_NOT_STORED = {408, 429, 499}          # (besides 5xx) a retry may well get another answer
+_POLL_MIN_SECONDS = 0.02
+_POLL_MAX_SECONDS = 0.5
+_CLEANUP_BATCH = 1000
+
+_RECORD_COLUMNS = """
+    idempotencykeyRequestHash,
+    idempotencykeyResponseStatus,
+    idempotencykeyResponseType,
+    idempotencykeyResponseBody
+"""
+
+
+class IdempotencyStore:
+    """
+    The idempotencykeys table. Pure SQL, one short transaction per call, all times from the DB clock
+    (shared by the workers). Blocking: called through the threadpool.
+    """
+
+    def claim(self, key: str, request_hash: str, token: str) -> tuple[bool, Row | None]:
+        """
+        (True, None) when the caller now owns the key (new, expired, or abandoned by its owner),
+        else (False, the existing record) - the record is None if it vanished meanwhile (released).
+        """
+        lease_us = settings.idempotency_lease_ms * 1000
+        ttl_s = settings.idempotency_ttl_seconds
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO idempotencykeys (
+                      idempotencykeyKey, idempotencykeyRequestHash, idempotencykeyLockToken,
+                      idempotencykeyLockedUntil, idempotencykeyExpiresAt
+                    )
+                    VALUES (%s, %s, %s, NOW(6) + INTERVAL %s MICROSECOND, NOW(6) + INTERVAL %s SECOND)
+                    ON DUPLICATE KEY UPDATE idempotencykeyKey = idempotencykeyKey
+                    """,
+                    (key, request_hash, token, lease_us, ttl_s),
+                )
+                if cur.rowcount == 1:
+                    return True, None
+
+                # take over an expired row, or an in-progress one whose lease has run out (same request only)
+                cur.execute(
+                    """
+                    UPDATE idempotencykeys
+                    SET idempotencykeyRequestHash = %s,
+                        idempotencykeyLockToken = %s,
+                        idempotencykeyLockedUntil = NOW(6) + INTERVAL %s MICROSECOND,
+                        idempotencykeyResponseStatus = NULL,
+                        idempotencykeyResponseType = NULL,
+                        idempotencykeyResponseBody = NULL,
+                        idempotencykeyCrTimestamp = NOW(6),
+                        idempotencykeyExpiresAt = NOW(6) + INTERVAL %s SECOND
+                    WHERE idempotencykeyKey = %s
+                      AND (idempotencykeyExpiresAt < NOW(6)
+                           OR (idempotencykeyResponseStatus IS NULL
+                               AND idempotencykeyLockedUntil < NOW(6)
+                               AND idempotencykeyRequestHash = %s))
+                    """,
+                    (request_hash, token, lease_us, ttl_s, key, request_hash),
+                )
+                if cur.rowcount == 1:
+                    return True, None
+
+                cur.execute(f"SELECT {_RECORD_COLUMNS} FROM idempotencykeys WHERE idempotencykeyKey = %s", (key,))
+                return False, cur.fetchone()
+
+    def complete(self, key: str, token: str, status: int, content_type: str | None, body: bytes) -> None:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE idempotencykeys
+                    SET idempotencykeyResponseStatus = %s,
+                        idempotencykeyResponseType = %s,
+                        idempotencykeyResponseBody = %s,
+                        idempotencykeyLockToken = NULL,
+                        idempotencykeyLockedUntil = NULL
+                    WHERE idempotencykeyKey = %s AND idempotencykeyLockToken = %s
+                    """,
+                    (status, content_type, body, key, token),
+                )
+
+    def release(self, key: str, token: str) -> None:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM idempotencykeys WHERE idempotencykeyKey = %s AND idempotencykeyLockToken = %s",
+                    (key, token),
+                )
+
+    def delete_expired(self, limit: int = _CLEANUP_BATCH) -> int:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM idempotencykeys WHERE idempotencykeyExpiresAt < NOW(6) LIMIT %s", (limit,))
+                return cur.rowcount
+
+
+class _CapturedResponse:
+    __slots__ = ("status", "content_type", "chunks", "complete")
+
+    def __init__(self):
+        self.status: int | None = None
+        self.content_type: str | None = None
+        self.chunks: list[bytes] = []
+        self.complete = False
+
+    def storable(self) -> bool:
+        return self.complete and self.status is not None and self.status < 500 and self.status not in _NOT_STORED
+
+
+class _StopWaiting(Exception):
+    """
+    A duplicate stopped waiting for the request in progress: deadline reached, or client gone (`disconnected`).
+    """
+
+    def __init__(self, disconnected: bool):
+        self.disconnected = disconnected
+
+
+def _header(scope: dict[str, Any], name: bytes) -> bytes | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+def _valid_key(key: bytes) -> bool:
+    return 0 < len(key) <= KEY_MAX_LENGTH and all(0x21 <= b <= 0x7E for b in key)
+
+
+def _request_hash(scope: dict[str, Any], body: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+async def _read_body(receive) -> bytes | None:
+    """
+    The whole request body (None if the client disconnected first).
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """
+    Pure ASGI middleware: Idempotency-Key handling for the POST endpoints in `paths`.
+    """
+
+    def __init__(self, app, paths: Iterable[str], store: IdempotencyStore | None = None):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.store = store or IdempotencyStore()
+        self._next_cleanup = 0.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        raw_key = _header(scope, KEY_HEADER)
+        if raw_key is None:
+            return await self.app(scope, receive, send)
+        if not _valid_key(raw_key):
+            response = JSONResponse({"detail": "Idempotency-Key must be 1-255 visible ASCII characters"}, status_code=400)
+            return await response(scope, receive, send)
+
+        wait_until = time.monotonic() + request_timeout_ms(scope) / 1000
+        body = await _read_body(receive)
+        if body is None:
+            return
+        key = raw_key.decode("ascii")
+        request_hash = _request_hash(scope, body)
+        token = secrets.token_hex(16)
+
+        try:
+            record = await self._claim_or_wait(key, request_hash, token, receive, wait_until)
+        except _StopWaiting as e:
+            if e.disconnected:
+                return
+            response = JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still in progress"},
+                status_code=409,
+                headers={"Retry-After": str(IN_PROGRESS_RETRY_AFTER)},
+            )
+            return await response(scope, receive, send)
+        except pymysql.err.MySQLError:
+            # running it unclaimed could duplicate the request the client is retrying
+            response = JSONResponse(
+                {"detail": "Idempotency-Key cannot be checked right now"},
+                status_code=503,
+                headers={"Retry-After": str(UNAVAILABLE_RETRY_AFTER)},
+            )
+            return await response(scope, receive, send)
+        if record is not None:
+            if record.idempotencykeyRequestHash != request_hash:
+                response = JSONResponse({"detail": "Idempotency-Key was already used for a different request"}, status_code=422)
+            else:
+                response = Response(
+                    record.idempotencykeyResponseBody,
+                    status_code=record.idempotencykeyResponseStatus,
+                    headers={REPLAYED_HEADER: "true"},
+                    media_type=record.idempotencykeyResponseType,
+                )
+            return await response(scope, receive, send)
+
+        await self._run(scope, receive, send, body, key, token)
+        await self._cleanup()
+
+    async def _claim_or_wait(self, key: str, request_hash: str, token: str, receive, wait_until: float) -> Row | None:
+        """
+        None once this request owns the key, else the completed (or conflicting) record.
+        Raises _StopWaiting when the request in progress is not done by `wait_until`, or the client disconnects.
+        """
+        delay = _POLL_MIN_SECONDS
+        disconnect = None   # the body has been read: the next message can only be http.disconnect
+        try:
+            while True:
+                claimed, record = await run_in_threadpool(self.store.claim, key, request_hash, token)
+                if claimed:
+                    return None
+                if record is None:
+                    continue   # released by its owner meanwhile: claim again
+                if record.idempotencykeyRequestHash != request_hash or record.idempotencykeyResponseStatus is not None:
+                    return record
+
+                # in progress (maybe in another worker)
+                remaining = wait_until - time.monotonic()
+                if remaining <= 0:
+                    raise _StopWaiting(disconnected=False)
+                disconnect = disconnect or asyncio.ensure_future(receive())
+                await asyncio.wait({disconnect}, timeout=min(delay, remaining))
+                if disconnect.done():
+                    raise _StopWaiting(disconnected=True)
+                delay = min(delay * 2, _POLL_MAX_SECONDS)
+        finally:
+            if disconnect is not None and not disconnect.done():
+                disconnect.cancel()
+
+    async def _run(self, scope, receive, send, body: bytes, key: str, token: str) -> None:
+        captured = _CapturedResponse()
+        body_read = False
+
+        async def receive_body():
+            # the body was read up front (for the request hash): hand it over, then the live messages
+            nonlocal body_read
+            if not body_read:
+                body_read = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def send_capturing(message):
+            if message["type"] == "http.response.start":
+                captured.status = message["status"]
+                content_type = _header(message, b"content-type")
+                captured.content_type = content_type.decode("latin-1") if content_type is not None else None
+            elif message["type"] == "http.response.body":
+                captured.chunks.append(message.get("body", b""))
+                captured.complete = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_capturing)
+        finally:
+            try:
+                status = captured.status
+                if status is not None and captured.storable():
+                    await run_in_threadpool(
+                        self.store.complete, key, token, status, captured.content_type, b"".join(captured.chunks)
+                    )
+                else:
+                    await run_in_threadpool(self.store.release, key, token)
+            except pymysql.err.MySQLError:
+                pass   # the claim stays in progress: a retry takes it over once its lease has run out
+
+    async def _cleanup(self) -> None:
+        now = time.monotonic()
+        if now < self._next_cleanup:
+            return
+        self._next_cleanup = now + settings.idempotency_cleanup_seconds
+        try:
+            await run_in_threadpool(self.store.delete_expired)
+        except pymysql.err.MySQLError:
+            pass   # next time
@@ -0,0 +1,259 @@
+# app/core/profiling.py
+# (on-demand per-request profiling)
+#
+# A request sent with the headers
+#     X-Profile-Request: 1
+#     X-Internal-Token: <INTERNAL_TOKEN>
+# is profiled by a sampling profiler, and its id is returned in the X-Profile-Id response header.
+# The profile is stored in PROFILE_DIR (shared by all gunicorn workers) and can be downloaded from
+# GET /api/internal/profiles/{id}?format=speedscope|collapsed (see routers/internal/profiles.py).
+#
+# Why sampling (and not cProfile): sync route handlers, their dependencies and the Pydantic response
+# validation run in threadpool threads, which a per-thread deterministic profiler would not see.
+# The sampler periodically captures the stacks of ALL threads (sys._current_frames) while the request
+# is in flight and keeps the ones running request handling code (the app, FastAPI/Starlette, Pydantic,
+# PyMySQL, httpx); idle threads are dropped.
+# Samples are wall-clock; the CPU time of the process during the request is recorded next to them.
+# Other requests served concurrently by the same worker can show up in the samples: the number of
+# requests in flight is recorded in the profile (concurrentRequests).
+#
+# Zero overhead when not triggered: the middleware is only installed when INTERNAL_TOKEN is set,
+# and then it only checks one request header.
+#
+# 261019: Initial version
+# 261019: Stopping the sampler (thread join) and saving the profile (file I/O, pruning) run in the threadpool,
+#         not on the event loop
+# 261019: The app's frames are recognized by the package directory, not by any "/app/" in the path
+
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from types import FrameType
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+import app
+
+from .config import settings
+from .route_info import route_template
+from .security import is_internal_token
+
+TRIGGER_HEADER = b"x-profile-request"
+TOKEN_HEADER = b"x-internal-token"
+
+# Stacks are kept when one of their frames comes from one of these (request handling code).
+# The app by its own directory: "/app/" alone is the root of the container, i.e. every frame there.
+_PROFILED_PATHS = (os.path.dirname(os.path.abspath(app.__file__)) + os.sep,) + tuple(
+    os.sep + p + os.sep
+    for p in ("fastapi", "starlette", "pydantic", "pydantic_core", "pymysql", "httpx", "httpcore")
+)
+
+_busy = threading.Lock()   # one profile at a time per worker
+_in_flight = 0
+
+
+class Sampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._done.wait(self.interval):
+            for ident, top in sys._current_frames().items():
+                if ident == own:
+                    continue
+                frame: FrameType | None = top
+                stack = []
+                relevant = False
+                while frame is not None:
+                    code = frame.f_code
+                    relevant = relevant or any(p in code.co_filename for p in _PROFILED_PATHS)
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if relevant:
+                    if ident not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    stack.append(names.get(ident, str(ident)))
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+def _header(scope: dict[str, Any], name: bytes) -> str | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware (no per-request objects unless the request is profiled).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        _in_flight += 1
+        try:
+            if (
+                _header(scope, TRIGGER_HEADER) != "1"
+                or not is_internal_token(_header(scope, TOKEN_HEADER))
+                or not _busy.acquire(blocking=False)
+            ):
+                return await self.app(scope, receive, send)
+            try:
+                await self._profile(scope, receive, send)
+            finally:
+                _busy.release()
+        finally:
+            _in_flight -= 1
+
+    async def _profile(self, scope, receive, send):
+        profile_id = uuid.uuid4().hex
+        status = {"code": 0}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        concurrent = _in_flight
+        sampler = Sampler(settings.profile_interval_ms / 1000)
+        started_at = time.time()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            await run_in_threadpool(sampler.stop)
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+            await run_in_threadpool(save_profile, {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route_template(scope),
+                "status": status["code"],
+                "startedAt": started_at,
+                "wallMs": round(wall * 1000, 3),
+                "cpuMs": round(cpu * 1000, 3),
+                "intervalMs": settings.profile_interval_ms,
+                "concurrentRequests": concurrent,
+                "samples": dict(sampler.samples),
+            })
+
+
+# -------------------------
+# Storage
+# -------------------------
+
+def _path(profile_id: str) -> str:
+    return os.path.join(settings.profile_dir, f"{profile_id}.json")
+
+
+def save_profile(profile: dict[str, Any]) -> None:
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    tmp = _path(profile["id"]) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(profile, f)
+    os.replace(tmp, _path(profile["id"]))
+
+    # keep only the newest PROFILE_KEEP profiles
+    stored = [os.path.join(settings.profile_dir, n) for n in os.listdir(settings.profile_dir) if n.endswith(".json")]
+    stored.sort(key=os.path.getmtime, reverse=True)
+    for old in stored[settings.profile_keep:]:
+        try:
+            os.remove(old)
+        except FileNotFoundError:
+            pass
+
+
+def load_profile(profile_id: str) -> dict[str, Any] | None:
+    if not profile_id.isalnum():
+        return None
+    try:
+        with open(_path(profile_id), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def list_profiles() -> list[dict[str, Any]]:
+    """
+    Stored profiles (metadata only), newest first.
+    """
+    if not os.path.isdir(settings.profile_dir):
+        return []
+    profiles = []
+    for name in os.listdir(settings.profile_dir):
+        if not name.endswith(".json"):
+            continue
+        profile = load_profile(name[:-5])
+        if profile:
+            profile.pop("samples", None)
+            profiles.append(profile)
+    return sorted(profiles, key=lambda p: p["startedAt"], reverse=True)
+
+
+# -------------------------
+# Export formats
+# -------------------------
+
+def to_collapsed(profile: dict[str, Any]) -> str:
+    """
+    "frame;frame;frame count" lines (input of flamegraph.pl, also importable in speedscope)
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in profile["samples"].items())
+
+
+def to_speedscope(profile: dict[str, Any]) -> dict[str, Any]:
+    """
+    speedscope file format (https://www.speedscope.app/file-format-schema.json), one sampled profile
+    """
+    frames: list[dict[str, str]] = []
+    index: dict[str, int] = {}
+    samples, weights = [], []
+    for stack, count in profile["samples"].items():
+        ids = []
+        for name in stack.split(";"):
+            if name not in index:
+                index[name] = len(frames)
+                frames.append({"name": name})
+            ids.append(index[name])
+        samples.append(ids)
+        weights.append(count * profile["intervalMs"])
+
+    name = f"{profile['method']} {profile['path']}"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "app1 profiling",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
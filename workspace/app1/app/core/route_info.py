@@ -0,0 +1,31 @@
+# app/core/route_info.py
+#
+# Route template of the current request (e.g. "/api/items/{item_id}"), for ASGI middlewares.
+# Low cardinality (unlike the concrete path), so usable as a span name, a profile label or a lookup key.
+#
+# Depending on the FastAPI version, scope["route"].path may or may not include the prefix of
+# include_router(..., prefix=...), so the prefix is recovered from the concrete path.
+#
+# 261019: Initial version
+
+
+from typing import Any
+
+
+def route_template(scope: dict[str, Any]) -> str | None:
+    """
+    Full route template of a request that has been routed; None before routing / when unmatched.
+    """
+    route = scope.get("route")
+    path = scope.get("path", "")
+    template = getattr(route, "path", None)
+    regex = getattr(route, "path_regex", None)
+    if template is None or regex is None:
+        return None
+    if regex.match(path):
+        return template
+    # find the prefix the route was mounted under
+    for i, char in enumerate(path):
+        if char == "/" and i and regex.match(path[i:]):
+            return path[:i] + template
+    return template
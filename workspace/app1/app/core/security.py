@@ -0,0 +1,30 @@
+# app/core/security.py
+# (FastAPI dependencies for access control)
+#
+# Internal endpoints (routers/internal) require the X-Internal-Token header to match INTERNAL_TOKEN.
+# When INTERNAL_TOKEN is not set, internal endpoints are disabled (404).
+#
+# 261019: Initial version
+
+
+import secrets
+
+from fastapi import Header, HTTPException
+
+from .config import settings
+
+INTERNAL_TOKEN_HEADER = "X-Internal-Token"
+
+
+def is_internal_token(token: str | None) -> bool:
+    return bool(settings.internal_token) and token is not None and secrets.compare_digest(token, settings.internal_token)
+
+
+def require_internal_token(x_internal_token: str | None = Header(default=None)):
+    """
+    FastAPI dependency: guards the internal routers.
+    """
+    if not settings.internal_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_internal_token(x_internal_token):
+        raise HTTPException(status_code=403, detail="Invalid internal token")
@@ -0,0 +1,230 @@
+# app/core/singleflight.py
+# (request coalescing)
+#
+# Collapses concurrent identical calls into a single in-flight execution.
+# The first caller for a key (the "leader") runs the work; every caller that
+# arrives with the same key while it is still running (a "follower") waits
+# and receives the leader's result (or exception) instead of doing the work again.
+#
+#   - SingleFlight:       for sync code (CatalogService reads run in FastAPI's threadpool)
+#   - AsyncSingleFlight:  for async code (fetch_one_book runs on the event loop)
+#
+# Nothing is cached: once the leader finishes, the key is forgotten and the next
+# call executes again. Groups are registered by name so their counters can be
+# reported by the internal metrics endpoint.
+#
+# The shared work is not bound to the leader's request alone: it runs under a deadline.SharedDeadline,
+# i.e. the leader's deadline, extended to the deadline of each follower that joins (statements started
+# after that get the longer max_statement_time). Every caller, leader included, gives up at its OWN
+# deadline (DeadlineExceeded / RequestCancelled) without affecting the others; once all of them have
+# given up, the work is cancelled (KILL QUERY of its running statement, or cancel of the async task).
+# In SingleFlight the work runs on the leader's thread (and connection), so the leader waits for it
+# and only then raises if its own deadline has passed; it stops counting as a waiter when its client
+# disconnects.
+#
+# 261019: Initial version (request coalescing for CatalogService reads and Open Library imports)
+# 261019: Shared work runs under its own deadline; each caller is bounded by its own deadline
+# 261019: Shared work runs under the latest deadline of its callers (not REQUEST_TIMEOUT_MAX_MS) and is
+#         cancelled once every caller has left
+
+
+import asyncio
+import threading
+from collections.abc import Callable, Coroutine, Hashable
+from typing import Any
+
+from .deadline import (
+    Deadline,
+    DeadlineExceeded,
+    SharedDeadline,
+    current_deadline,
+    shared_context,
+)
+
+# How often a waiting SingleFlight follower checks its own deadline / disconnect (seconds)
+_WAIT_SLICE = 0.05
+
+_groups: dict[str, "SingleFlight | AsyncSingleFlight"] = {}
+
+
+class _Stats:
+    def __init__(self):
+        self.executions = 0   # calls that actually ran the work (leaders)
+        self.coalesced = 0    # calls that joined an in-flight execution (followers)
+        self.errors = 0       # leader executions that raised
+
+    def as_dict(self, in_flight: int) -> dict[str, int]:
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "inFlight": in_flight,
+        }
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "deadline")
+
+    def __init__(self, deadline: SharedDeadline | None) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.deadline = deadline   # None: the leader has no deadline (outside of a request)
+
+
+class SingleFlight:
+    """
+    Thread-safe request coalescing for blocking callables.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._stats = _Stats()
+        _groups[name] = self
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        deadline = current_deadline()
+        with self._lock:
+            existing = self._calls.get(key)
+            leader = existing is None
+            if existing is None:
+                call = self._calls[key] = _Call(SharedDeadline(deadline) if deadline is not None else None)
+                self._stats.executions += 1
+            else:
+                call = existing
+                if call.deadline is not None:
+                    call.deadline.join(deadline)
+                self._stats.coalesced += 1
+
+        if not leader:
+            _wait(call)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        shared = call.deadline
+        try:
+            if deadline is None or shared is None:
+                call.result = shared_context().run(fn)   # outside of a request: no deadline
+            else:
+                # a disconnect of the leader's client: it no longer waits (the work goes on for the followers)
+                with deadline.cancellable(lambda: _leave(shared)):
+                    call.result = shared_context(shared).run(fn)
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        if deadline is not None:
+            deadline.check()   # the followers got the result; this request is over its own deadline
+        return call.result
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return self._stats.as_dict(len(self._calls))
+
+
+class AsyncSingleFlight:
+    """
+    Request coalescing for coroutines running on one event loop.
+
+    The leader's work runs in its own task, so a cancelled caller (e.g. a client
+    that disconnected) does not cancel the execution the other waiters depend on.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: dict[Hashable, tuple[asyncio.Task, SharedDeadline | None]] = {}
+        self._stats = _Stats()
+        _groups[name] = self
+
+    async def do(self, key: Hashable, fn: Callable[[], Coroutine[Any, Any, Any]]) -> Any:
+        deadline = current_deadline()
+        existing = self._tasks.get(key)
+        if existing is None:
+            shared = SharedDeadline(deadline) if deadline is not None else None
+            task = asyncio.get_running_loop().create_task(fn(), context=shared_context(shared))
+            self._tasks[key] = (task, shared)
+            self._stats.executions += 1
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            task, shared = existing
+            if shared is not None:
+                shared.join(deadline)
+            self._stats.coalesced += 1
+        return await _await(task, shared)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if key in self._tasks and self._tasks[key][0] is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            self._stats.errors += 1
+
+    def stats(self) -> dict[str, int]:
+        return self._stats.as_dict(len(self._tasks))
+
+
+def _leave(shared: SharedDeadline) -> None:
+    # a caller of a SingleFlight gave up: the last one cancels the work (KILL QUERY of its statement)
+    if shared.leave():
+        shared.cancel()
+
+
+def _wait(call: _Call) -> None:
+    # follower of a SingleFlight: wait for the leader, but not past this request's deadline
+    deadline = current_deadline()
+    if deadline is None:
+        call.done.wait()
+        return
+    try:
+        while not call.done.wait(min(_WAIT_SLICE, max(deadline.remaining(), 0.0))):
+            deadline.check()   # raises DeadlineExceeded / RequestCancelled
+    except DeadlineExceeded:
+        if call.deadline is not None:
+            _leave(call.deadline)
+        raise
+
+
+async def _await(task: asyncio.Task, shared: SharedDeadline | None) -> Any:
+    # any caller of an AsyncSingleFlight: wait for the shared task, but not past this request's deadline
+    deadline = current_deadline()
+    try:
+        if deadline is None:
+            return await asyncio.shield(task)
+        return await _await_until(task, deadline)
+    except (DeadlineExceeded, asyncio.CancelledError):
+        if shared is not None and shared.leave():
+            task.cancel()   # nobody waits for the result any more
+        raise
+
+
+async def _await_until(task: asyncio.Task, deadline: Deadline) -> Any:
+    loop = asyncio.get_running_loop()
+    waiter = asyncio.ensure_future(asyncio.wait_for(asyncio.shield(task), deadline.check()))
+
+    def wake_up() -> None:
+        # a disconnect (Deadline.cancel, called from a worker thread) wakes the waiter up
+        loop.call_soon_threadsafe(waiter.cancel)
+
+    with deadline.cancellable(wake_up):
+        try:
+            return await waiter
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Request deadline exceeded") from None
+        except asyncio.CancelledError:
+            if waiter.cancelled() and deadline.cancelled:
+                deadline.check()   # RequestCancelled
+            raise
+
+
+def coalescing_stats() -> dict[str, dict[str, int]]:
+    """
+    Per-group counters for this worker process.
+    """
+    return {name: group.stats() for name, group in _groups.items()}
@@ -0,0 +1,313 @@
+# app/core/tracing.py
+# (span-based tracing, W3C trace-context)
+#
+# Minimal tracer (no external dependency):
+#   - Span: name, kind, start/end, attributes, events; the current span lives in a ContextVar,
+#     so it follows the request into the threadpool (sync routes) and across awaits
+#   - W3C trace-context: incoming `traceparent` headers are continued (TracingMiddleware),
+#     outgoing requests get one via inject()
+#   - head-based sampling: the root span decides (TRACING_SAMPLE_RATIO), child spans and remote
+#     parents inherit the decision; non-sampled spans are not recorded nor exported
+#   - pluggable exporter: set_exporter(); JsonFileExporter writes one JSON object per span and line
+#
+# Instrumented: every request (TracingMiddleware), CatalogService methods (@instrument_class),
+# each SQL statement (TracingCursor in database.py) and the Open Library httpx calls.
+#
+# Tracing is off unless TRACING_EXPORTER=file; then start_span() returns a shared no-op span.
+#
+# 261019: Initial version
+# 261019: will_record(): hot paths (SQL statements) skip the span and its attributes when it would not be recorded
+
+
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, TextIO
+
+from .config import settings
+from .route_info import route_template
+
+TRACEPARENT_HEADER = "traceparent"
+
+
+class Span:
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "sampled",
+                 "start_ns", "end_ns", "attributes", "events", "status")
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: str | None, sampled: bool):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: dict[str, Any] = {}
+        self.events: list[dict[str, Any]] = []
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        if self.sampled:
+            self.events.append({"name": name, "timeUnixNano": time.time_ns(), "attributes": attributes})
+
+    def record_exception(self, e: BaseException) -> None:
+        self.status = "error"
+        self.add_event("exception", type=type(e).__name__, message=str(e))
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class _NoopSpan:
+    # returned while tracing is disabled (shared, stateless)
+    sampled = False
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        pass
+
+    def record_exception(self, e: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+# -------------------------
+# Exporters
+# -------------------------
+
+class NoopExporter:
+    def export(self, span: Span) -> None:
+        pass
+
+
+class JsonFileExporter:
+    """
+    Appends one JSON object per finished span to a local file ("{pid}" in the path = worker pid).
+    """
+
+    def __init__(self, path: str):
+        self.path = path.replace("{pid}", str(os.getpid()))
+        self._lock = threading.Lock()
+        self._file: TextIO | None = None   # opened on the first span
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            file = self._file
+            if file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                file = self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            file.write(line)
+
+
+_exporter: NoopExporter | JsonFileExporter | Any = NoopExporter()
+_enabled = False
+
+
+def set_exporter(exporter: Any | None) -> None:
+    """
+    Installs an exporter (any object with export(span)); None disables tracing.
+    """
+    global _exporter, _enabled
+    _exporter = exporter or NoopExporter()
+    _enabled = exporter is not None
+
+
+def configure_from_settings() -> None:
+    if settings.tracing_exporter == "file":
+        set_exporter(JsonFileExporter(settings.tracing_file))
+    else:
+        set_exporter(None)
+
+
+# -------------------------
+# Spans
+# -------------------------
+
+_current: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Span | _NoopSpan:
+    return _current.get() or NOOP_SPAN
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str, bool] | None:
+    """
+    "00-<trace-id>-<parent-id>-<flags>" -> (trace_id, parent_id, sampled); None if invalid
+    """
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    version, trace_id, parent_id, flags = parts[:4]
+    try:
+        int(version, 16), int(trace_id, 16), int(parent_id, 16)
+        sampled = bool(int(flags, 16) & 0x01)
+    except ValueError:
+        return None
+    if version == "ff" or trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id.lower(), parent_id.lower(), sampled
+
+
+def will_record() -> bool:
+    """
+    False when a span started now would not be recorded (tracing off, or the current trace is not sampled):
+    callers can then skip start_span() and the cost of building its attributes.
+    A new root span (no current span) may still be sampled, so that case counts as recording.
+    """
+    if not _enabled:
+        return False
+    parent = _current.get()
+    return parent is None or parent.sampled
+
+
+@contextmanager
+def start_span(name: str, kind: str = "internal", traceparent: str | None = None, **attributes: Any) -> Iterator[Span | _NoopSpan]:
+    """
+    Starts a child of the current span (or of `traceparent`, or a new trace) and makes it current.
+    """
+    if not _enabled:
+        yield NOOP_SPAN
+        return
+
+    parent = _current.get()
+    remote = parse_traceparent(traceparent) if parent is None else None
+    if parent is not None:
+        span = Span(name, kind, parent.trace_id, parent.span_id, parent.sampled)
+    elif remote is not None:
+        span = Span(name, kind, remote[0], remote[1], remote[2])
+    else:
+        span = Span(name, kind, f"{random.getrandbits(128):032x}", None, random.random() < settings.tracing_sample_ratio)
+
+    for key, value in attributes.items():
+        span.set_attribute(key, value)
+
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current.reset(token)
+        span.end_ns = time.time_ns()
+        if span.sampled:
+            _exporter.export(span)
+
+
+def inject(headers: dict[str, str]) -> dict[str, str]:
+    """
+    Adds the `traceparent` of the current span to outgoing request headers.
+    """
+    span = _current.get()
+    if span is not None:
+        headers[TRACEPARENT_HEADER] = span.traceparent
+    return headers
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorator: runs the (sync or async) function inside a span.
+    """
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with start_span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_class(cls):
+    """
+    Class decorator: wraps every public staticmethod of a service class in a span named "<Class>.<method>".
+    """
+    for attr, value in list(vars(cls).items()):
+        if isinstance(value, staticmethod) and not attr.startswith("_"):
+            setattr(cls, attr, staticmethod(traced(f"{cls.__name__}.{attr}")(value.__func__)))
+    return cls
+
+
+# -------------------------
+# ASGI middleware
+# -------------------------
+
+class TracingMiddleware:
+    """
+    One server span per HTTP request, continuing an incoming W3C `traceparent`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled:
+            return await self.app(scope, receive, send)
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        with start_span(f"{scope['method']} {scope['path']}", kind="server", traceparent=traceparent) as span:
+            span.set_attribute("http.method", scope["method"])
+            span.set_attribute("http.target", scope["path"])
+
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = route_template(scope)
+                if route is not None:
+                    # low-cardinality name: the route template, not the concrete path
+                    span.name = f"{scope['method']} {route}"
+                    span.set_attribute("http.route", route)
@@ -5,9 +5,16 @@
 
 
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.core.config import settings
-from app.routers.public import health_router, catalog_router, import_books_router
+from app.core.deadline import DeadlineExceeded, DeadlineMiddleware, RequestCancelled
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.security import require_internal_token
+from app.core.tracing import TracingMiddleware, configure_from_settings
+from app.routers.public import health_router, catalog_router, import_books_router, changes_router
+from app.routers.internal import metrics_router, profiles_router
 
 
 app = FastAPI(title=settings.app_name)
@@ -21,3 +28,40 @@ app.include_router(catalog_router, prefix=settings.api_prefix)
 
 # 260216: Added import_books_router for POST /api/import/book endpoint to fetch book data from Open Library and store it in the database.
 app.include_router(import_books_router, prefix=settings.api_prefix)
+
+# 261019: Added changes_router for GET /api/changes (incremental change feed for catalog sync)
+app.include_router(changes_router, prefix=settings.api_prefix)
+
+# 261019: Added internal metrics_router (e.g. GET /api/internal/metrics/coalescing)
+# 261019: Internal routers require the X-Internal-Token header (INTERNAL_TOKEN); added profiles_router
+app.include_router(metrics_router, prefix=settings.api_prefix, dependencies=[Depends(require_internal_token)])
+app.include_router(profiles_router, prefix=settings.api_prefix, dependencies=[Depends(require_internal_token)])
+
+# 261019: Per-request deadlines (X-Request-Timeout-Ms header / route default / REQUEST_TIMEOUT_MS),
+#         propagated to SQL statements and Open Library calls; KILL QUERY when the client disconnects
+app.add_middleware(DeadlineMiddleware)
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    # 499 (client closed request, as in nginx) only shows up in logs/traces: the client is gone
+    status_code = 499 if isinstance(exc, RequestCancelled) else 504
+    return JSONResponse(status_code=status_code, content={"detail": str(exc)})
+
+
+# 261019: Idempotency-Key for the POSTs clients retry (stored responses in `idempotencykeys`).
+#         Outside DeadlineMiddleware: waiting for a duplicate is not part of the request's work, and the
+#         response is still stored when the client has gone (that client is the one that will retry).
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=[f"{settings.api_prefix}/items", f"{settings.api_prefix}/import/book"],
+)
+
+
+# 261019: On-demand per-request profiling (X-Profile-Request: 1); not installed at all without INTERNAL_TOKEN
+if settings.internal_token:
+    app.add_middleware(ProfilingMiddleware)
+
+# 261019: Span-based tracing (W3C traceparent); exporter chosen by TRACING_EXPORTER (default: none = off)
+configure_from_settings()
+app.add_middleware(TracingMiddleware)
@@ -1,4 +1,6 @@
 # app/routers/internal__init__.py
 
+from .metrics import router as metrics_router
+from .profiles import router as profiles_router
 
-__all__ = []
+__all__ = ["metrics_router", "profiles_router"]
@@ -0,0 +1,28 @@
+# app/routers/internal/metrics.py
+# Internal endpoint(s) reporting runtime counters of this worker process
+#
+# 261019: Added GET /internal/metrics/coalescing (single-flight counters per group)
+#         Note: counters are per worker (gunicorn runs WEB_CONCURRENCY workers)
+# 261019: Added GET /internal/metrics/openlibrary (circuit breaker state + retry budget)
+
+
+
+from fastapi import APIRouter
+
+from app.core.singleflight import coalescing_stats
+from app.services.external.external_books import breaker, retry_budget
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+
+@router.get("/metrics/coalescing")
+def get_coalescing_metrics():
+    return coalescing_stats()
+
+
+@router.get("/metrics/openlibrary")
+def get_openlibrary_metrics():
+    return {
+        "circuitBreaker": breaker.stats(),
+        "retryBudget": retry_budget.stats(),
+    }
@@ -0,0 +1,40 @@
+# app/routers/internal/profiles.py
+# Internal endpoints to list / download the request profiles captured by the profiling middleware
+# (see app/core/profiling.py)
+#
+# 261019: Initial version
+#   GET /internal/profiles                                  -> stored profiles (newest first)
+#   GET /internal/profiles/{id}?format=speedscope|collapsed -> download (speedscope JSON or flamegraph.pl input)
+
+
+
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.core.profiling import list_profiles, load_profile, to_collapsed, to_speedscope
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+
+@router.get("/profiles")
+def get_profiles():
+    return list_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, format: Literal["speedscope", "collapsed"] = "speedscope"):
+    profile = load_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "collapsed":
+        return PlainTextResponse(
+            to_collapsed(profile),
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.collapsed.txt"'},
+        )
+    return JSONResponse(
+        to_speedscope(profile),
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'},
+    )
@@ -3,5 +3,6 @@
 from .health import router as health_router
 from .catalog import router as catalog_router
 from .import_books import router as import_books_router
+from .changes import router as changes_router
 
-__all__ = ["health_router", "catalog_router", "import_books_router"]
+__all__ = ["health_router", "catalog_router", "import_books_router", "changes_router"]
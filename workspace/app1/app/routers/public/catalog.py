@@ -6,49 +6,186 @@
 # Converts missing rows to HTTP 404
 #
 # 260215: Added write endpoints (POST-PUT-PATCH-DELETE) for both Categories and Items, with proper error handling for 404 and 409 cases.
-
-
-
-from fastapi import APIRouter, Depends, HTTPException, status
+# 261019: GET endpoints accept ?fields=... (sparse fieldsets), e.g. /items?fields=itemName,itemListPrice
+#         - comma separated column names, validated against a whitelist (422 on unknown names)
+#         - the primary key is always returned
+#         - endpoints embedding a relation also accept the relation's columns (names are prefixed, so never ambiguous)
+# 261019: GET /categories and GET /items accept ?ids=1,2,3 (batch GET, one IN (...) query)
+#         List endpoints accept ?embed=items / ?embed=categories: relations of the whole page are loaded
+#         with ONE batched query (instead of one request per row from the client)
+# 261019: GET /items accepts filters (priceMin/priceMax, yearMin/yearMax, itemStatusId, categoryId)
+#         and sort (name|price|year|created, "-" prefix = descending), validated by ItemFilter
+# 261019: List endpoints have a shorter default deadline (LIST_DEADLINE_MS, see core/deadline.py)
+# 261019: GET endpoints return the service's Row objects as RowJSONResponse (serialized directly, see core/rows.py);
+#         response_model still documents them, write endpoints still go through their response_model
+# 261019: Invalid ?fields= and filters are reported in FastAPI's validation error format (loc = ("query", <name>))
+
+
+
+from decimal import Decimal
+from typing import Any, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 import pymysql
 from pymysql.err import IntegrityError
 
 
 from app.core.database import get_db
+from app.core.deadline import route_deadline
+from app.core.rows import RowJSONResponse, with_fields
 from app.schemas import (
     CategoryRead,
-    CategoryReadWithItems,
+    CategoryReadPartialWithItems,
     CategoryCreate,
     CategoryPut,
     CategoryPatch,
     ItemRead,
-    ItemReadWithCategories,
+    ItemReadPartialWithCategories,
+    ItemFilter,
+    ItemSort,
     ItemCreate,
     ItemPut,
     ItemPatch,
 )
-from app.services.db.catalog import CatalogService
+from app.services.db.catalog import CatalogService, CATEGORY_COLUMNS, ITEM_COLUMNS
 
 router = APIRouter(tags=["catalog"])
 
+LIST_DEADLINE_MS = 10_000  # a list query still running after 10s is not worth finishing
+
+
+def _query_error(name: str, msg: str, value: Any) -> RequestValidationError:
+    # 422 in FastAPI's own format ({"detail": [{"type", "loc", "msg", "input"}]}), like the validation of the parameters
+    return RequestValidationError([{"type": "value_error", "loc": ("query", name), "msg": msg, "input": value}])
+
 
 # -------------------------
-# READ Categories (GET)
+# Sparse fieldsets (?fields=)
+# -------------------------
+
+def _fields_param(*allowed: tuple[str, ...]):
+    """
+    Builds a dependency that parses ?fields=a,b,c against the allowed column names.
+    Returns None when the parameter is absent (= all columns).
+    """
+    whitelist = frozenset(col for cols in allowed for col in cols)
+
+    def fields_dependency(
+        fields: str | None = Query(default=None, description="Comma separated list of fields to return"),
+    ) -> frozenset[str] | None:
+        if fields is None:
+            return None
+        requested = frozenset(f.strip() for f in fields.split(",") if f.strip())
+        unknown = requested - whitelist
+        if unknown:
+            raise _query_error("fields", f"Unknown field(s): {', '.join(sorted(unknown))}", fields)
+        return requested
+
+    return fields_dependency
+
+
+def _only(fields: frozenset[str] | None, columns: tuple[str, ...]) -> frozenset[str] | None:
+    # The part of a (mixed) fieldset that belongs to one table
+    return None if fields is None else fields.intersection(columns)
+
+
+def _check_embedded_fields(fields: frozenset[str] | None, columns: tuple[str, ...], embedded: bool) -> None:
+    # Relation columns make sense only when the relation is embedded
+    if not embedded and _only(fields, columns):
+        raise _query_error("fields", "Relation fields require the matching embed parameter", ",".join(sorted(fields or ())))
+
+
+category_with_items_fields = _fields_param(CATEGORY_COLUMNS, ITEM_COLUMNS)
+item_with_categories_fields = _fields_param(ITEM_COLUMNS, CATEGORY_COLUMNS)
+
+
+# -------------------------
+# Batch GET (?ids=)
 # -------------------------
 
-@router.get("/categories", response_model=list[CategoryRead])
-def get_categories(conn: pymysql.Connection = Depends(get_db)):
-    return CatalogService.list_categories(conn)
+MAX_IDS = 100
 
 
-@router.get("/categories/{category_id}", response_model=CategoryReadWithItems)
-def get_category(category_id: int, conn: pymysql.Connection = Depends(get_db)):
-    cat = CatalogService.get_category(conn, category_id)
+def ids_param(
+    ids: str | None = Query(default=None, description=f"Comma separated list of ids (max {MAX_IDS})"),
+) -> tuple[int, ...] | None:
+    if ids is None:
+        return None
+    try:
+        parsed = tuple(sorted({int(i) for i in ids.split(",") if i.strip()}))
+    except ValueError:
+        raise _query_error("ids", "ids must be a comma separated list of integers", ids)
+    if len(parsed) > MAX_IDS:
+        raise _query_error("ids", f"Too many ids (max {MAX_IDS})", ids)
+    return parsed
+
+
+# -------------------------
+# Item filters + sort
+# -------------------------
+
+def item_filter_param(
+    priceMin: Decimal | None = None,
+    priceMax: Decimal | None = None,
+    yearMin: int | None = None,
+    yearMax: int | None = None,
+    itemStatusId: int | None = None,
+    categoryId: int | None = None,
+    sort: ItemSort = "name",
+) -> ItemFilter:
+    try:
+        return ItemFilter(
+            priceMin=priceMin,
+            priceMax=priceMax,
+            yearMin=yearMin,
+            yearMax=yearMax,
+            itemStatusId=itemStatusId,
+            categoryId=categoryId,
+            sort=sort,
+        )
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("query", *error["loc"])} for error in e.errors(include_url=False, include_context=False)
+        ])
+
+
+# -------------------------
+# READ Categories (GET)
+# -------------------------
+
+@router.get(
+    "/categories",
+    response_model=list[CategoryReadPartialWithItems],
+    response_model_exclude_unset=True,
+    dependencies=[Depends(route_deadline(LIST_DEADLINE_MS))],
+)
+def get_categories(
+    ids: tuple[int, ...] | None = Depends(ids_param),
+    embed: Literal["items"] | None = None,
+    fields: frozenset[str] | None = Depends(category_with_items_fields),
+    conn: pymysql.Connection = Depends(get_db),
+):
+    _check_embedded_fields(fields, ITEM_COLUMNS, embed == "items")
+    cats = CatalogService.list_categories(conn, _only(fields, CATEGORY_COLUMNS), ids)
+    if embed == "items":
+        cats = CatalogService.embed_items(conn, cats, _only(fields, ITEM_COLUMNS))
+    return RowJSONResponse(cats)
+
+
+@router.get("/categories/{category_id}", response_model=CategoryReadPartialWithItems, response_model_exclude_unset=True)
+def get_category(
+    category_id: int,
+    fields: frozenset[str] | None = Depends(category_with_items_fields),
+    conn: pymysql.Connection = Depends(get_db),
+):
+    cat = CatalogService.get_category(conn, category_id, _only(fields, CATEGORY_COLUMNS))
     if not cat:
         raise HTTPException(status_code=404, detail="Category not found")
 
-    cat["items"] = CatalogService.list_items_for_category(conn, category_id) or []
-    return cat
+    items = CatalogService.list_items_for_category(conn, category_id, _only(fields, ITEM_COLUMNS)) or []
+    return RowJSONResponse(with_fields(cat, items=items))
 
 
 # ------------------------------------------
@@ -104,19 +241,38 @@ def delete_category(category_id: int, conn: pymysql.Connection = Depends(get_db)
 # READ Items (GET)
 # -------------------------
 
-@router.get("/items", response_model=list[ItemRead])
-def get_items(conn: pymysql.Connection = Depends(get_db)):
-    return CatalogService.list_items(conn)
-
-
-@router.get("/items/{item_id}", response_model=ItemReadWithCategories)
-def get_item(item_id: int, conn: pymysql.Connection = Depends(get_db)):
-    item = CatalogService.get_item(conn, item_id)
+@router.get(
+    "/items",
+    response_model=list[ItemReadPartialWithCategories],
+    response_model_exclude_unset=True,
+    dependencies=[Depends(route_deadline(LIST_DEADLINE_MS))],
+)
+def get_items(
+    ids: tuple[int, ...] | None = Depends(ids_param),
+    filters: ItemFilter = Depends(item_filter_param),
+    embed: Literal["categories"] | None = None,
+    fields: frozenset[str] | None = Depends(item_with_categories_fields),
+    conn: pymysql.Connection = Depends(get_db),
+):
+    _check_embedded_fields(fields, CATEGORY_COLUMNS, embed == "categories")
+    items = CatalogService.list_items(conn, _only(fields, ITEM_COLUMNS), ids, filters)
+    if embed == "categories":
+        items = CatalogService.embed_categories(conn, items, _only(fields, CATEGORY_COLUMNS))
+    return RowJSONResponse(items)
+
+
+@router.get("/items/{item_id}", response_model=ItemReadPartialWithCategories, response_model_exclude_unset=True)
+def get_item(
+    item_id: int,
+    fields: frozenset[str] | None = Depends(item_with_categories_fields),
+    conn: pymysql.Connection = Depends(get_db),
+):
+    item = CatalogService.get_item(conn, item_id, _only(fields, ITEM_COLUMNS))
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
 
-    item["categories"] = CatalogService.list_categories_for_item(conn, item_id) or []
-    return item
+    categories = CatalogService.list_categories_for_item(conn, item_id, _only(fields, CATEGORY_COLUMNS)) or []
+    return RowJSONResponse(with_fields(item, categories=categories))
 
 
 # --------------------------------------
@@ -171,17 +327,43 @@ def delete_item(item_id: int, conn: pymysql.Connection = Depends(get_db)):
 # -----------------------------------------
 
 
-@router.get("/categories/{category_id}/items", response_model=list[ItemRead])
-def get_items_for_category(category_id: int, conn: pymysql.Connection = Depends(get_db)):
-    items = CatalogService.list_items_for_category(conn, category_id)
+@router.get(
+    "/categories/{category_id}/items",
+    response_model=list[ItemReadPartialWithCategories],
+    response_model_exclude_unset=True,
+    dependencies=[Depends(route_deadline(LIST_DEADLINE_MS))],
+)
+def get_items_for_category(
+    category_id: int,
+    embed: Literal["categories"] | None = None,
+    fields: frozenset[str] | None = Depends(item_with_categories_fields),
+    conn: pymysql.Connection = Depends(get_db),
+):
+    _check_embedded_fields(fields, CATEGORY_COLUMNS, embed == "categories")
+    items = CatalogService.list_items_for_category(conn, category_id, _only(fields, ITEM_COLUMNS))
     if items is None:
         raise HTTPException(status_code=404, detail="Category not found")
-    return items
+    if embed == "categories":
+        items = CatalogService.embed_categories(conn, items, _only(fields, CATEGORY_COLUMNS))
+    return RowJSONResponse(items)
 
 
-@router.get("/items/{item_id}/categories", response_model=list[CategoryRead])
-def get_categories_for_item(item_id: int, conn: pymysql.Connection = Depends(get_db)):
-    cats = CatalogService.list_categories_for_item(conn, item_id)
+@router.get(
+    "/items/{item_id}/categories",
+    response_model=list[CategoryReadPartialWithItems],
+    response_model_exclude_unset=True,
+    dependencies=[Depends(route_deadline(LIST_DEADLINE_MS))],
+)
+def get_categories_for_item(
+    item_id: int,
+    embed: Literal["items"] | None = None,
+    fields: frozenset[str] | None = Depends(category_with_items_fields),
+    conn: pymysql.Connection = Depends(get_db),
+):
+    _check_embedded_fields(fields, ITEM_COLUMNS, embed == "items")
+    cats = CatalogService.list_categories_for_item(conn, item_id, _only(fields, CATEGORY_COLUMNS))
     if cats is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    return cats
+    if embed == "items":
+        cats = CatalogService.embed_items(conn, cats, _only(fields, ITEM_COLUMNS))
+    return RowJSONResponse(cats)
@@ -0,0 +1,41 @@
+# app/routers/changes.py
+# (GET endpoint; incremental change feed)
+#
+# Defines endpoints
+# Calls service layer
+#
+# 261019: Initial version. Consumers keep the last nextCursor and poll GET /changes?since=<cursor>,
+#         so sync traffic scales with the change rate instead of the catalog size.
+# 261019: Default deadline of 10s (see core/deadline.py)
+# 261019: Rows are serialized directly (RowJSONResponse, see core/rows.py)
+
+
+
+from fastapi import APIRouter, Depends, Query
+import pymysql
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.deadline import route_deadline
+from app.core.rows import RowJSONResponse
+from app.schemas import ChangeFeedRead
+from app.services.db.changes import ChangeFeedService
+
+router = APIRouter(tags=["changes"])
+
+
+@router.get("/changes", response_model=ChangeFeedRead, dependencies=[Depends(route_deadline(10_000))])
+def get_changes(
+    since: int = Query(default=0, ge=0, description="Cursor: the nextCursor of the previous page (0 = from the beginning)"),
+    limit: int = Query(default=500, ge=1, le=5000),
+    conn: pymysql.Connection = Depends(get_db),
+):
+    # one extra row tells whether there is a next page
+    rows = ChangeFeedService.list_changes(conn, since, limit + 1, settings.changes_settle_ms)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return RowJSONResponse({
+        "changes": rows,
+        "nextCursor": rows[-1].changelogId if rows else since,
+        "hasMore": has_more,
+    })
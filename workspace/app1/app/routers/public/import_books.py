@@ -4,9 +4,16 @@
 # - Uses the service layer to fetch book data and upsert it into the database.
 # - Handles errors for not found and database issues, returning appropriate HTTP status codes.
 #
+# 261019: 503 (with Retry-After) while the Open Library circuit breaker is open, 502 when Open Library fails.
+# 261019: Default deadline of 20s (Open Library call + retries + upsert); DeadlineExceeded -> 504 (see main.py)
 
 
-from fastapi import APIRouter, HTTPException
+import math
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException
+from app.core.deadline import DeadlineExceeded, route_deadline
+from app.services.external.circuit_breaker import CircuitOpenError
 from app.services.external.external_books import fetch_one_book
 from app.services.db.items_sql import upsert_item_from_book
 
@@ -14,14 +21,26 @@ from app.services.db.items_sql import upsert_item_from_book
 router = APIRouter(tags=["import"])
 
 
-@router.post("/import/book")
+@router.post("/import/book", dependencies=[Depends(route_deadline(20_000))])
 async def import_book(q: str):
-    book = await fetch_one_book(q)
+    try:
+        book = await fetch_one_book(q)
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Open Library is unavailable, try again later",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Open Library request failed: {e}")
+
     if not book:
         raise HTTPException(status_code=404, detail="No book found")
 
     try:
         row = upsert_item_from_book(book)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"DB insert failed: {e}")
 
@@ -3,11 +3,17 @@
 # These are used as `response_model` in the routers, and also for request bodies in POST/PUT/PATCH endpoints.
 #
 # 260215: Updates for also exporting the new schemas/classes (POST,PUT,PATCH) added to category.py and item.py 
+# 261019: Exporting the *ReadPartial schemas/classes (sparse fieldsets)
+# 261019: Exporting the change feed schemas/classes (change.py)
+# 261019: Exporting ItemFilter (filter + sort parameters of GET /items)
+# 261019: Exporting ItemSort (sort values of GET /items)
 
 
 from .category import (
     CategoryRead,
     CategoryReadWithItems,
+    CategoryReadPartial,
+    CategoryReadPartialWithItems,
     CategoryCreate,
     CategoryPut,
     CategoryPatch,
@@ -15,21 +21,37 @@ from .category import (
 from .item import (
     ItemRead,
     ItemReadWithCategories,
+    ItemReadPartial,
+    ItemReadPartialWithCategories,
+    ItemFilter,
+    ItemSort,
     ItemCreate,
     ItemPut,
     ItemPatch,
 )
+from .change import (
+    ChangeRead,
+    ChangeFeedRead,
+)
 
 __all__ = [
     "CategoryRead",
     "CategoryReadWithItems",
+    "CategoryReadPartial",
+    "CategoryReadPartialWithItems",
     "CategoryCreate",
     "CategoryPut",
     "CategoryPatch",
     "ItemRead",
     "ItemReadWithCategories",
+    "ItemReadPartial",
+    "ItemReadPartialWithCategories",
+    "ItemFilter",
+    "ItemSort",
     "ItemCreate",
     "ItemPut",
     "ItemPatch",
+    "ChangeRead",
+    "ChangeFeedRead",
 ]
 
@@ -8,6 +8,9 @@
 #    - CategoryCreate: for POST endpoints; all fields except auto-generated ones are required (client sends full state of mutable fields)
 #    - CategoryPut: for PUT endpoints; all fields are required (client sends full state of mutable fields)
 #    - CategoryPatch: for PATCH endpoints
+#
+# 261019: Classes Added:
+#    - CategoryReadPartial: for GET endpoints with sparse fieldsets (?fields=...); every field is optional
 
 
 
@@ -31,6 +34,20 @@ class CategoryRead(BaseModel):
     categoryClientUUID: str | None = None
 
 
+# Sparse fieldsets (?fields=...): same fields as CategoryRead, but all optional.
+# Routers use response_model_exclude_unset=True, so columns that were not selected are omitted from the response.
+class CategoryReadPartial(BaseModel):
+
+    model_config = ConfigDict(extra="ignore")
+
+    categoryId: int | None = Field(default=None, ge=1)
+    categoryName: str | None = None
+    categoryStatusId: int | None = Field(default=None, ge=0, le=65535)
+    categoryCrUUID: str | None = None
+    categoryCrTimestamp: datetime | None = None
+    categoryClientUUID: str | None = None
+
+
 # POST is for creating new resources, so all fields except auto-generated ones are required (client sends full state of mutable fields)
 class CategoryCreate(BaseModel):
     categoryName: str = Field(..., min_length=1, max_length=100)
@@ -58,5 +75,10 @@ class CategoryReadWithItems(CategoryRead):
     items: list["ItemRead"] = []
 
 
-from .item import ItemRead  # noqa: E402
+class CategoryReadPartialWithItems(CategoryReadPartial):
+    items: list["ItemReadPartial"] = []
+
+
+from .item import ItemRead, ItemReadPartial  # noqa: E402
 CategoryReadWithItems.model_rebuild()
+CategoryReadPartialWithItems.model_rebuild()
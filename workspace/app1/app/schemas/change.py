@@ -0,0 +1,33 @@
+# app/schemas/change.py 
+# (Pydantic v2)
+#
+# Defines output shapes (Pydantic models/classes) for the change feed (GET /changes)
+#
+# 261019: Initial version
+
+
+
+from datetime import datetime
+from typing import Literal
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# Mirrors the `changelog` table structure
+class ChangeRead(BaseModel):
+
+    model_config = ConfigDict(extra="ignore")
+
+    changelogId: int = Field(..., ge=1)
+    changelogEntity: Literal["category", "item", "categoryitem"]
+    changelogEntityId: int = Field(..., ge=1)
+    changelogOperation: Literal["insert", "update", "delete"]
+    changelogCategoryId: int | None = None
+    changelogItemId: int | None = None
+    changelogCrTimestamp: datetime
+
+
+# One page of the feed; pass nextCursor as ?since= to resume
+class ChangeFeedRead(BaseModel):
+    changes: list[ChangeRead] = []
+    nextCursor: int = Field(..., ge=0)
+    hasMore: bool
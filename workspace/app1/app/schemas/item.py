@@ -8,11 +8,19 @@
 #    - ItemCreate: for POST endpoints; all fields except auto-generated ones are required (client sends full state of mutable fields)
 #    - ItemPut: for PUT endpoints; all fields are required (client sends full state of mutable fields)
 #    - ItemPatch: for PATCH endpoints
+#
+# 261019: Classes Added:
+#    - ItemReadPartial: for GET endpoints with sparse fieldsets (?fields=...); every field is optional
+#    - ItemFilter: validated filter + sort parameters of GET /items (frozen, so it can be part of a cache/coalescing key)
+#    - ItemSort: the sort values of GET /items (single definition, used by ItemFilter and the router)
+# 261019: ItemFilter reports an inverted range on its lower bound (loc priceMin / yearMin)
 
 
 from datetime import datetime
 from decimal import Decimal
-from pydantic import BaseModel, ConfigDict, Field
+from typing import Literal
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, model_validator
+from pydantic_core import InitErrorDetails, PydanticCustomError
 
 
 class ItemRead(BaseModel):
@@ -29,6 +37,55 @@ class ItemRead(BaseModel):
     itemCrTimestamp: datetime
     itemClientUUID: str | None = None
 
+
+# Sparse fieldsets (?fields=...): same fields as ItemRead, but all optional.
+# Routers use response_model_exclude_unset=True, so columns that were not selected are omitted from the response.
+class ItemReadPartial(BaseModel):
+
+    model_config = ConfigDict(extra="ignore")
+
+    itemId: int | None = Field(default=None, ge=1)
+    itemName: str | None = None
+    itemListPrice: Decimal | None = None
+    itemModelYear: int | None = Field(default=None, ge=0, le=65535)
+    itemStatusId: int | None = Field(default=None, ge=0, le=65535)
+    itemCrUUID: str | None = None
+    itemCrTimestamp: datetime | None = None
+    itemClientUUID: str | None = None
+
+# Sort order of GET /items; "-" prefix = descending
+ItemSort = Literal["name", "-name", "price", "-price", "year", "-year", "created", "-created"]
+
+
+# Filters (all optional, combined with AND) and sort order for GET /items
+class ItemFilter(BaseModel):
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    priceMin: Decimal | None = Field(default=None, ge=0)
+    priceMax: Decimal | None = Field(default=None, ge=0)
+    yearMin: int | None = Field(default=None, ge=0, le=65535)
+    yearMax: int | None = Field(default=None, ge=0, le=65535)
+    itemStatusId: int | None = Field(default=None, ge=0, le=65535)
+    categoryId: int | None = Field(default=None, ge=1)
+    sort: ItemSort = "name"
+
+    @model_validator(mode="after")
+    def check_ranges(self):
+        # reported on the lower bound (a ValueError here would have an empty loc)
+        for low, high in (("priceMin", "priceMax"), ("yearMin", "yearMax")):
+            low_value, high_value = getattr(self, low), getattr(self, high)
+            if low_value is not None and high_value is not None and low_value > high_value:
+                raise ValidationError.from_exception_data(
+                    type(self).__name__,
+                    [InitErrorDetails(
+                        type=PydanticCustomError("range", f"{low} must not be greater than {high}"),
+                        loc=(low,),
+                        input=low_value,
+                    )],
+                )
+        return self
+
 # POST is for creating new resources, so all fields except auto-generated ones are required (client sends full state of mutable fields)
 class ItemCreate(BaseModel):
     itemName: str = Field(..., min_length=1, max_length=100)
@@ -63,6 +120,11 @@ class ItemReadWithCategories(ItemRead):
     categories: list["CategoryRead"] = []
 
 
-from .category import CategoryRead  # noqa: E402
+class ItemReadPartialWithCategories(ItemReadPartial):
+    categories: list["CategoryReadPartial"] = []
+
+
+from .category import CategoryRead, CategoryReadPartial  # noqa: E402
 ItemReadWithCategories.model_rebuild()
+ItemReadPartialWithCategories.model_rebuild()
 
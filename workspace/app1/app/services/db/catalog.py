@@ -5,47 +5,150 @@
 # Each method:
 #   opens a cursor using a conn object passed from the router (no connection pooling or management here)
 #   executes SQL with safe parameter binding (%s)
-#   returns dict rows (DictCursor)
+#   returns Row objects (attribute access: row.itemName, see core/rows.py)
 #
 # 260215: Added write methods (POST-PUT-PATCH-DELETE) for both Categories and Items, with proper error handling and transaction management.
-
+# 261019: READ methods are coalesced (single-flight): concurrent identical reads share one query execution.
+#         WRITE methods re-read through the uncoalesced _select_* helpers, so they always see their own commit.
+# 261019: READ methods accept optional `fields` (sparse fieldsets), pushed down into the SELECT column list.
+#         Only whitelisted column names (CATEGORY_COLUMNS / ITEM_COLUMNS) ever reach the SQL text.
+# 261019: list_categories()/list_items() accept `ids` (batch GET with a single IN (...) query).
+#         embed_items()/embed_categories() load the relations of a whole page with ONE junction-table query
+#         (DataLoader-style) and stitch them in Python, so the query count per page is constant (no N+1).
+# 261019: list_items() accepts an ItemFilter: filters compile to parameterized WHERE conditions, the sort to a
+#         whitelisted ORDER BY (supporting indexes: db/init/004_item_filter_indexes.sql)
+#         Exception: with categoryId there is no index for "category + sort" (the category lives in categoryitems);
+#         MariaDB either sorts the category's rows (filesort) or scans items in sort order probing uq_categoryitems_pair.
+# 261019: Every public method runs inside a tracing span "CatalogService.<method>" (@instrument_class)
+# 261019: Rows are compact, read-only Row objects instead of dicts: coalesced callers share them without copies,
+#         and embed_*() return new rows carrying the relation (with_fields)
+
+from collections.abc import Collection
+from functools import wraps
 from typing import Any
 import pymysql
 from pymysql.err import IntegrityError
 
-
-
+from app.core.config import settings
+from app.core.rows import Row, split_first_field, with_fields
+from app.core.singleflight import SingleFlight
+from app.core.tracing import instrument_class
+from app.schemas import ItemFilter
+
+
+# Selectable columns (whitelist); the first one is the primary key and is always selected
+CATEGORY_COLUMNS = (
+    "categoryId",
+    "categoryName",
+    "categoryStatusId",
+    "categoryCrUUID",
+    "categoryCrTimestamp",
+    "categoryClientUUID",
+)
+ITEM_COLUMNS = (
+    "itemId",
+    "itemName",
+    "itemListPrice",
+    "itemModelYear",
+    "itemStatusId",
+    "itemCrUUID",
+    "itemCrTimestamp",
+    "itemClientUUID",
+)
+
+
+def _columns(all_columns: tuple[str, ...], fields: Collection[str] | None, alias: str = "") -> str:
+    """
+    Builds the SELECT column list: all columns, or the primary key + the requested ones.
+    """
+    if fields is None:
+        cols = all_columns
+    else:
+        cols = tuple(c for c in all_columns if c == all_columns[0] or c in fields)
+    prefix = f"{alias}." if alias else ""
+    return ",\n              ".join(prefix + c for c in cols)
+
+
+# ItemFilter.sort -> ORDER BY column (itemId breaks ties: stable order, and still index order)
+ITEM_SORT_COLUMNS = {
+    "name": "itemName",
+    "price": "itemListPrice",
+    "year": "itemModelYear",
+    "created": "itemCrTimestamp",
+}
+
+
+def _in_list(values: Collection[Any]) -> str:
+    # "%s, %s, %s" placeholders for an IN (...) clause
+    return ", ".join(["%s"] * len(values))
+
+
+_reads = SingleFlight("catalog")
+
+
+def _copy_rows(result: Any) -> Any:
+    # Every caller gets its own list / dict (rows themselves are read-only and shared)
+    if isinstance(result, dict):
+        return dict(result)
+    if isinstance(result, list):
+        return list(result)
+    return result
+
+
+def _coalesced(fn):
+    """
+    Coalesces concurrent calls with identical arguments (the connection excluded).
+    Only the leader's connection executes the SQL, under a deadline of its own (not the leader's request
+    deadline, see core/singleflight.py); every caller gives up at its own deadline.
+    Arguments must be hashable (e.g. fields as a frozenset).
+    """
+    @wraps(fn)
+    def wrapper(conn: pymysql.Connection, *args, **kwargs):
+        if not settings.singleflight_enabled:
+            return fn(conn, *args, **kwargs)
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+        return _copy_rows(_reads.do(key, lambda: fn(conn, *args, **kwargs)))
+    return wrapper
+
+
+
+@instrument_class
 class CatalogService:
     # -------------------------
     # READ Categories (GET) 
     # -------------------------
     @staticmethod
-    def list_categories(conn: pymysql.Connection) -> list[dict[str, Any]]:
-        sql = """
+    @_coalesced
+    def list_categories(
+        conn: pymysql.Connection,
+        fields: frozenset[str] | None = None,
+        ids: tuple[int, ...] | None = None,
+    ) -> list[Row]:
+        if ids is not None and not ids:
+            return []
+
+        where = f"WHERE categoryId IN ({_in_list(ids)})" if ids else ""
+        sql = f"""
             SELECT
-              categoryId,
-              categoryName,
-              categoryStatusId,
-              categoryCrUUID,
-              categoryCrTimestamp,
-              categoryClientUUID
+              {_columns(CATEGORY_COLUMNS, fields)}
             FROM categories
+            {where}
             ORDER BY categoryName
         """
         with conn.cursor() as cur:
-            cur.execute(sql)
-            return list(cur.fetchall())
+            cur.execute(sql, ids or None)
+            return cur.fetchall()
 
     @staticmethod
-    def get_category(conn: pymysql.Connection, category_id: int) -> dict[str, Any] | None:
-        sql = """
+    @_coalesced
+    def get_category(conn: pymysql.Connection, category_id: int, fields: frozenset[str] | None = None) -> Row | None:
+        return CatalogService._select_category(conn, category_id, fields)
+
+    @staticmethod
+    def _select_category(conn: pymysql.Connection, category_id: int, fields: frozenset[str] | None = None) -> Row | None:
+        sql = f"""
             SELECT
-              categoryId,
-              categoryName,
-              categoryStatusId,
-              categoryCrUUID,
-              categoryCrTimestamp,
-              categoryClientUUID
+              {_columns(CATEGORY_COLUMNS, fields)}
             FROM categories
             WHERE categoryId = %s
         """
@@ -57,36 +160,70 @@ class CatalogService:
     # READ Items (GET) 
     # -------------------------
     @staticmethod
-    def list_items(conn: pymysql.Connection) -> list[dict[str, Any]]:
-        sql = """
+    @_coalesced
+    def list_items(
+        conn: pymysql.Connection,
+        fields: frozenset[str] | None = None,
+        ids: tuple[int, ...] | None = None,
+        filters: ItemFilter | None = None,
+    ) -> list[Row]:
+        if ids is not None and not ids:
+            return []
+        filters = filters or ItemFilter()
+
+        joins = ""
+        conditions: list[str] = []
+        params: list[Any] = []
+
+        if filters.categoryId is not None:
+            # not index-ordered: see the categoryId note in db/init/004_item_filter_indexes.sql
+            joins = "JOIN categoryitems ci ON ci.categoryitemItemId = i.itemId AND ci.categoryitemCategoryId = %s"
+            params.append(filters.categoryId)
+        if ids:
+            conditions.append(f"i.itemId IN ({_in_list(ids)})")
+            params.extend(ids)
+        if filters.itemStatusId is not None:
+            conditions.append("i.itemStatusId = %s")
+            params.append(filters.itemStatusId)
+        if filters.priceMin is not None:
+            conditions.append("i.itemListPrice >= %s")
+            params.append(filters.priceMin)
+        if filters.priceMax is not None:
+            conditions.append("i.itemListPrice <= %s")
+            params.append(filters.priceMax)
+        if filters.yearMin is not None:
+            conditions.append("i.itemModelYear >= %s")
+            params.append(filters.yearMin)
+        if filters.yearMax is not None:
+            conditions.append("i.itemModelYear <= %s")
+            params.append(filters.yearMax)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if filters.sort.startswith("-") else "ASC"
+        order_by = f"i.{ITEM_SORT_COLUMNS[filters.sort.lstrip('-')]} {direction}, i.itemId {direction}"
+
+        sql = f"""
             SELECT
-              itemId,
-              itemName,
-              itemListPrice,
-              itemModelYear,
-              itemStatusId,
-              itemCrUUID,
-              itemCrTimestamp,
-              itemClientUUID
-            FROM items
-            ORDER BY itemName
+              {_columns(ITEM_COLUMNS, fields, "i")}
+            FROM items i
+            {joins}
+            {where}
+            ORDER BY {order_by}
         """
         with conn.cursor() as cur:
-            cur.execute(sql)
-            return list(cur.fetchall())
+            cur.execute(sql, params or None)
+            return cur.fetchall()
 
     @staticmethod
-    def get_item(conn: pymysql.Connection, item_id: int) -> dict[str, Any] | None:
-        sql = """
+    @_coalesced
+    def get_item(conn: pymysql.Connection, item_id: int, fields: frozenset[str] | None = None) -> Row | None:
+        return CatalogService._select_item(conn, item_id, fields)
+
+    @staticmethod
+    def _select_item(conn: pymysql.Connection, item_id: int, fields: frozenset[str] | None = None) -> Row | None:
+        sql = f"""
             SELECT
-              itemId,
-              itemName,
-              itemListPrice,
-              itemModelYear,
-              itemStatusId,
-              itemCrUUID,
-              itemCrTimestamp,
-              itemClientUUID
+              {_columns(ITEM_COLUMNS, fields)}
             FROM items
             WHERE itemId = %s
         """
@@ -99,21 +236,15 @@ class CatalogService:
     # READ category-items Relations (GET)  
     # -----------------------------------------
     @staticmethod
-    def list_items_for_category(conn: pymysql.Connection, category_id: int) -> list[dict[str, Any]] | None:
-        # Verify category exists
-        if not CatalogService.get_category(conn, category_id):
+    @_coalesced
+    def list_items_for_category(conn: pymysql.Connection, category_id: int, fields: frozenset[str] | None = None) -> list[Row] | None:
+        # Verify category exists (primary key only)
+        if not CatalogService.get_category(conn, category_id, frozenset()):
             return None
 
-        sql = """
+        sql = f"""
             SELECT
-              i.itemId,
-              i.itemName,
-              i.itemListPrice,
-              i.itemModelYear,
-              i.itemStatusId,
-              i.itemCrUUID,
-              i.itemCrTimestamp,
-              i.itemClientUUID
+              {_columns(ITEM_COLUMNS, fields, "i")}
             FROM items i
             JOIN categoryitems ci
               ON ci.categoryitemItemId = i.itemId
@@ -122,22 +253,18 @@ class CatalogService:
         """
         with conn.cursor() as cur:
             cur.execute(sql, (category_id,))
-            return list(cur.fetchall())
+            return cur.fetchall()
 
     @staticmethod
-    def list_categories_for_item(conn: pymysql.Connection, item_id: int) -> list[dict[str, Any]] | None:
-        # Verify item exists
-        if not CatalogService.get_item(conn, item_id):
+    @_coalesced
+    def list_categories_for_item(conn: pymysql.Connection, item_id: int, fields: frozenset[str] | None = None) -> list[Row] | None:
+        # Verify item exists (primary key only)
+        if not CatalogService.get_item(conn, item_id, frozenset()):
             return None
 
-        sql = """
+        sql = f"""
             SELECT
-              c.categoryId,
-              c.categoryName,
-              c.categoryStatusId,
-              c.categoryCrUUID,
-              c.categoryCrTimestamp,
-              c.categoryClientUUID
+              {_columns(CATEGORY_COLUMNS, fields, "c")}
             FROM categories c
             JOIN categoryitems ci
               ON ci.categoryitemCategoryId = c.categoryId
@@ -146,15 +273,90 @@ class CatalogService:
         """
         with conn.cursor() as cur:
             cur.execute(sql, (item_id,))
-            return list(cur.fetchall())
-        
+            return cur.fetchall()
+
+    # -----------------------------------------
+    # Batched relation loading (embed=...)
+    # -----------------------------------------
+    @staticmethod
+    @_coalesced
+    def items_by_category(
+        conn: pymysql.Connection,
+        category_ids: tuple[int, ...],
+        fields: frozenset[str] | None = None,
+    ) -> dict[int, list[Row]]:
+        """
+        Items of many categories with one query: {categoryId: [item, ...]}
+        """
+        grouped: dict[int, list[Row]] = {cid: [] for cid in category_ids}
+        if not category_ids:
+            return grouped
+
+        sql = f"""
+            SELECT
+              ci.categoryitemCategoryId,
+              {_columns(ITEM_COLUMNS, fields, "i")}
+            FROM items i
+            JOIN categoryitems ci
+              ON ci.categoryitemItemId = i.itemId
+            WHERE ci.categoryitemCategoryId IN ({_in_list(category_ids)})
+            ORDER BY i.itemName
+        """
+        with conn.cursor() as cur:
+            cur.execute(sql, category_ids)
+            for category_id, item in split_first_field(cur.fetchall()):
+                grouped[category_id].append(item)
+        return grouped
+
+    @staticmethod
+    @_coalesced
+    def categories_by_item(
+        conn: pymysql.Connection,
+        item_ids: tuple[int, ...],
+        fields: frozenset[str] | None = None,
+    ) -> dict[int, list[Row]]:
+        """
+        Categories of many items with one query: {itemId: [category, ...]}
+        """
+        grouped: dict[int, list[Row]] = {iid: [] for iid in item_ids}
+        if not item_ids:
+            return grouped
+
+        sql = f"""
+            SELECT
+              ci.categoryitemItemId,
+              {_columns(CATEGORY_COLUMNS, fields, "c")}
+            FROM categories c
+            JOIN categoryitems ci
+              ON ci.categoryitemCategoryId = c.categoryId
+            WHERE ci.categoryitemItemId IN ({_in_list(item_ids)})
+            ORDER BY c.categoryName
+        """
+        with conn.cursor() as cur:
+            cur.execute(sql, item_ids)
+            for item_id, category in split_first_field(cur.fetchall()):
+                grouped[item_id].append(category)
+        return grouped
+
+    @staticmethod
+    def embed_items(conn: pymysql.Connection, categories: list[Row], fields: frozenset[str] | None = None) -> list[Row]:
+        # Categories of the page with their "items" (one query for the whole page)
+        by_category = CatalogService.items_by_category(conn, tuple(c.categoryId for c in categories), fields)
+        return [with_fields(cat, items=by_category[cat.categoryId]) for cat in categories]
+
+    @staticmethod
+    def embed_categories(conn: pymysql.Connection, items: list[Row], fields: frozenset[str] | None = None) -> list[Row]:
+        # Items of the page with their "categories" (one query for the whole page)
+        by_item = CatalogService.categories_by_item(conn, tuple(i.itemId for i in items), fields)
+        return [with_fields(item, categories=by_item[item.itemId]) for item in items]
+
 
 
     # ------------------------------------------
     # WRITE Categories (POST-PUT-PATCH-DELETE) 
     # ------------------------------------------
     @staticmethod
-    def create_category(conn: pymysql.Connection, data: dict[str, Any]) -> dict[str, Any]:
+    def create_category(conn: pymysql.Connection, data: dict[str, Any]) -> Row:
         sql = """
             INSERT INTO categories (categoryName, categoryStatusId, categoryClientUUID)
             VALUES (%s, %s, %s)
@@ -164,14 +366,14 @@ class CatalogService:
                 cur.execute(sql, (data["categoryName"], data["categoryStatusId"], data.get("categoryClientUUID")))
                 new_id = cur.lastrowid
             conn.commit()
-            return CatalogService.get_category(conn, int(new_id))  # type: ignore[arg-type]
+            return CatalogService._select_category(conn, int(new_id))  # type: ignore[arg-type]
         except IntegrityError:
             conn.rollback()
             raise
 
     @staticmethod
-    def put_category(conn: pymysql.Connection, category_id: int, data: dict[str, Any]) -> dict[str, Any] | None:
-        if not CatalogService.get_category(conn, category_id):
+    def put_category(conn: pymysql.Connection, category_id: int, data: dict[str, Any]) -> Row | None:
+        if not CatalogService._select_category(conn, category_id):
             return None
 
         sql = """
@@ -193,14 +395,14 @@ class CatalogService:
                     ),
                 )
             conn.commit()
-            return CatalogService.get_category(conn, category_id)
+            return CatalogService._select_category(conn, category_id)
         except IntegrityError:
             conn.rollback()
             raise
 
     @staticmethod
-    def patch_category(conn: pymysql.Connection, category_id: int, data: dict[str, Any]) -> dict[str, Any] | None:
-        existing = CatalogService.get_category(conn, category_id)
+    def patch_category(conn: pymysql.Connection, category_id: int, data: dict[str, Any]) -> Row | None:
+        existing = CatalogService._select_category(conn, category_id)
         if not existing:
             return None
 
@@ -223,7 +425,7 @@ class CatalogService:
             with conn.cursor() as cur:
                 cur.execute(sql, tuple(params))
             conn.commit()
-            return CatalogService.get_category(conn, category_id)
+            return CatalogService._select_category(conn, category_id)
         except IntegrityError:
             conn.rollback()
             raise
@@ -242,7 +444,7 @@ class CatalogService:
     # WRITE Items (POST-PUT-PATCH-DELETE) 
     # --------------------------------------
     @staticmethod
-    def create_item(conn: pymysql.Connection, data: dict[str, Any]) -> dict[str, Any]:
+    def create_item(conn: pymysql.Connection, data: dict[str, Any]) -> Row:
         sql = """
             INSERT INTO items (itemName, itemListPrice, itemModelYear, itemStatusId, itemClientUUID)
             VALUES (%s, %s, %s, %s, %s)
@@ -261,14 +463,14 @@ class CatalogService:
                 )
                 new_id = cur.lastrowid
             conn.commit()
-            return CatalogService.get_item(conn, int(new_id))  # type: ignore[arg-type]
+            return CatalogService._select_item(conn, int(new_id))  # type: ignore[arg-type]
         except IntegrityError:
             conn.rollback()
             raise
 
     @staticmethod
-    def put_item(conn: pymysql.Connection, item_id: int, data: dict[str, Any]) -> dict[str, Any] | None:
-        if not CatalogService.get_item(conn, item_id):
+    def put_item(conn: pymysql.Connection, item_id: int, data: dict[str, Any]) -> Row | None:
+        if not CatalogService._select_item(conn, item_id):
             return None
 
         sql = """
@@ -294,14 +496,14 @@ class CatalogService:
                     ),
                 )
             conn.commit()
-            return CatalogService.get_item(conn, item_id)
+            return CatalogService._select_item(conn, item_id)
         except IntegrityError:
             conn.rollback()
             raise
 
     @staticmethod
-    def patch_item(conn: pymysql.Connection, item_id: int, data: dict[str, Any]) -> dict[str, Any] | None:
-        existing = CatalogService.get_item(conn, item_id)
+    def patch_item(conn: pymysql.Connection, item_id: int, data: dict[str, Any]) -> Row | None:
+        existing = CatalogService._select_item(conn, item_id)
         if not existing:
             return None
 
@@ -323,7 +525,7 @@ class CatalogService:
             with conn.cursor() as cur:
                 cur.execute(sql, tuple(params))
             conn.commit()
-            return CatalogService.get_item(conn, item_id)
+            return CatalogService._select_item(conn, item_id)
         except IntegrityError:
             conn.rollback()
             raise
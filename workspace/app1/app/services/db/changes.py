@@ -0,0 +1,57 @@
+# app/services/db/changes.py
+# Using pure SQL queries
+#
+# Reads the `changelog` table (populated by triggers, see db/init/003_changelog.sql)
+# Each method:
+#   opens a cursor using a conn object passed from the router (no connection pooling or management here)
+#   executes SQL with safe parameter binding (%s)
+#   returns Row objects (see core/rows.py)
+#
+# 261019: Initial version (incremental change feed for catalog sync)
+# 261019: The feed is also held back behind the oldest open transaction that has written rows
+#         (information_schema.innodb_trx, needs PROCESS: db/init/007_grant_process.sh), not only by CHANGES_SETTLE_MS
+
+import pymysql
+
+from app.core.rows import Row
+
+
+class ChangeFeedService:
+    @staticmethod
+    def list_changes(conn: pymysql.Connection, since: int, limit: int, settle_ms: int) -> list[Row]:
+        """
+        Changes with changelogId > since, oldest first (at most `limit` rows).
+
+        AUTO_INCREMENT ids are assigned at INSERT time, but become visible at COMMIT time: a transaction
+        still open can commit a LOWER id than rows already returned, and a consumer whose cursor has moved
+        past it would never see it. So only rows older than the horizon are returned:
+          - the start of the oldest open transaction that has written rows (its rows, and the ids it holds,
+            are all younger than that; later transactions get higher ids than anything committed now)
+          - minus `settle_ms`: changelogCrTimestamp is the start of the writing statement, not of the insert
+        """
+        sql = """
+            SELECT
+              changelogId,
+              changelogEntity,
+              changelogEntityId,
+              changelogOperation,
+              changelogCategoryId,
+              changelogItemId,
+              changelogCrTimestamp
+            FROM changelog
+            WHERE changelogId > %s
+              AND changelogCrTimestamp < LEAST(
+                    NOW(6),
+                    COALESCE(
+                      (SELECT MIN(trx_started)
+                       FROM information_schema.innodb_trx
+                       WHERE trx_rows_modified > 0 AND trx_mysql_thread_id <> CONNECTION_ID()),
+                      NOW(6)
+                    )
+                  ) - INTERVAL %s MICROSECOND
+            ORDER BY changelogId
+            LIMIT %s
+        """
+        with conn.cursor() as cur:
+            cur.execute(sql, (since, settle_ms * 1000, limit))
+            return cur.fetchall()
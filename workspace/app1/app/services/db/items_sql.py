@@ -4,12 +4,21 @@
 # It actually, stores in the db the book data fetched from the external API, but it is not aware of the external API at all.
 # This module provides a function to upsert an item into the `items` table based on book data.
 # - Uses pure SQL with PyMySQL connection.
+#
+# 261019: upsert_item_from_book() runs inside a tracing span (its SQL statements are child spans)
+# 261019: Added upsert_items_from_books() - batched variant used by the offline dump ingestion (app/cli/ingest_dump.py)
+# 261019: Rows are Row objects (core/rows.py); upsert_item_from_book() still returns a dict (plain JSON response)
+# 261019: upsert_items_from_books() lets MariaDB decide which titles exist (the itemName collation is not casefold())
 
 
 from typing import Any
 from app.core.database import get_conn
+from app.core.tracing import traced
+
+ITEM_NAME_MAX_LENGTH = 100  # items.itemName is VARCHAR(100)
 
 
+@traced("items_sql.upsert_item_from_book")
 def upsert_item_from_book(book: dict[str, Any]) -> dict[str, Any]:
     """
     Inserts a book into `items` using pure SQL.
@@ -36,7 +45,7 @@ def upsert_item_from_book(book: dict[str, Any]) -> dict[str, Any]:
             )
             existing = cur.fetchone()
             if existing:
-                return existing
+                return existing._asdict()
 
             # 2) insert
             cur.execute(
@@ -54,4 +63,43 @@ def upsert_item_from_book(book: dict[str, Any]) -> dict[str, Any]:
                 "FROM items WHERE itemId = %s",
                 (item_id,),
             )
-            return cur.fetchone()
+            return cur.fetchone()._asdict()
+
+
+def upsert_items_from_books(books: list[dict[str, Any]]) -> tuple[int, int]:
+    """
+    Batched variant of upsert_item_from_book() (same mapping, same dedupe by itemName),
+    committed as one transaction.
+    Whether a title already exists is decided by MariaDB (INSERT ... WHERE NOT EXISTS), i.e. by the
+    itemName collation (utf8mb4_unicode_ci: case- and accent-insensitive, trailing spaces ignored),
+    also between the titles of the batch.
+    Titles longer than itemName allows are truncated.
+    Returns (inserted, already_existing).
+    """
+
+    by_title: dict[str, Any] = {}   # title -> year (identical titles: one statement)
+    for book in books:
+        title = (book.get("title") or "").strip()[:ITEM_NAME_MAX_LENGTH]
+        if title and title not in by_title:
+            by_title[title] = book.get("first_publish_year")
+    if not by_title:
+        return 0, 0
+
+    # price placeholder 0.00, as in upsert_item_from_book()
+    rows = [
+        (title, 0.00, year if isinstance(year, int) and 0 <= year <= 65535 else None, title)
+        for title, year in by_title.items()
+    ]
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            # one statement per title (pymysql cannot batch INSERT ... SELECT): each one sees the rows
+            # inserted by the previous ones, so "Dune" and "dune " of the same batch are one item
+            cur.executemany(
+                "INSERT INTO items (itemName, itemListPrice, itemModelYear, itemStatusId) "
+                "SELECT %s, %s, %s, 1 FROM DUAL "
+                "WHERE NOT EXISTS (SELECT 1 FROM items WHERE itemName = %s)",
+                rows,
+            )
+            inserted = cur.rowcount
+
+    return inserted, len(rows) - inserted
@@ -0,0 +1,117 @@
+# /services/db/openlibrary_cache.py
+#
+# Open Library search cache, stored in the `openlibrarycache` table (db/init/006_openlibrary_cache.sql),
+# so it is shared by all workers and survives restarts.
+# Used by fetch_one_book() (services/external/external_books.py); it only knows queries and book dicts.
+# - Uses pure SQL with PyMySQL connection; all times come from the DB clock.
+# - The cache is an optimization: when the table can't be read or written, the search just goes to Open Library.
+#
+# 261019: Initial version (positive / negative entries, stale-while-revalidate)
+# 261019: A cache statement cut short by the request deadline (DeadlineExceeded, not a MySQLError) is a cache miss
+#         / a skipped write too, like any other cache failure
+
+
+import hashlib
+import json
+import time
+from typing import Any
+
+import pymysql
+
+from app.core.config import settings
+from app.core.database import get_conn
+from app.core.deadline import DeadlineExceeded
+from app.core.rows import Row
+
+CLEANUP_INTERVAL = 300.0  # seconds between deletions of expired entries (per worker)
+CLEANUP_BATCH = 1000
+
+_next_cleanup = 0.0
+
+
+def _key(query: str) -> str:
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def get_cached_search(query: str) -> Row | None:
+    """
+    The usable (fresh or stale) entry for a normalized query, or None.
+    Row: openlibrarycacheBook (JSON text, None = no book found), isFresh (0/1)
+    """
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT openlibrarycacheBook, openlibrarycacheFreshUntil > NOW(6) AS isFresh
+                    FROM openlibrarycache
+                    WHERE openlibrarycacheKey = %s AND openlibrarycacheStaleUntil > NOW(6)
+                    """,
+                    (_key(query),),
+                )
+                return cur.fetchone()
+    except (pymysql.err.MySQLError, DeadlineExceeded):
+        return None
+
+
+def store_search(query: str, book: dict[str, Any] | None) -> None:
+    """
+    Stores (or replaces) the result of a search; None = no book found (negative entry, shorter TTL).
+    """
+    global _next_cleanup
+    ttl = settings.openlibrary_cache_ttl_seconds if book is not None else settings.openlibrary_cache_negative_ttl_seconds
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO openlibrarycache (
+                      openlibrarycacheKey, openlibrarycacheQuery, openlibrarycacheBook,
+                      openlibrarycacheFreshUntil, openlibrarycacheStaleUntil
+                    )
+                    VALUES (%s, %s, %s, NOW(6) + INTERVAL %s SECOND, NOW(6) + INTERVAL %s SECOND)
+                    ON DUPLICATE KEY UPDATE
+                      openlibrarycacheBook = VALUES(openlibrarycacheBook),
+                      openlibrarycacheFetchedAt = NOW(6),
+                      openlibrarycacheFreshUntil = VALUES(openlibrarycacheFreshUntil),
+                      openlibrarycacheStaleUntil = VALUES(openlibrarycacheStaleUntil),
+                      openlibrarycacheRefreshUntil = NULL
+                    """,
+                    (
+                        _key(query),
+                        query[:1000],
+                        json.dumps(book) if book is not None else None,
+                        ttl,
+                        ttl + settings.openlibrary_cache_stale_seconds,
+                    ),
+                )
+                if time.monotonic() >= _next_cleanup:
+                    _next_cleanup = time.monotonic() + CLEANUP_INTERVAL
+                    cur.execute(
+                        "DELETE FROM openlibrarycache WHERE openlibrarycacheStaleUntil < NOW(6) LIMIT %s",
+                        (CLEANUP_BATCH,),
+                    )
+    except (pymysql.err.MySQLError, DeadlineExceeded):
+        pass
+
+
+def claim_refresh(query: str, lease_seconds: float) -> bool:
+    """
+    True when the caller may refresh a stale entry: one refresh per entry at a time, across all workers.
+    A failed refresh is retried (by the next stale hit) once its lease has run out.
+    """
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE openlibrarycache
+                    SET openlibrarycacheRefreshUntil = NOW(6) + INTERVAL %s MICROSECOND
+                    WHERE openlibrarycacheKey = %s
+                      AND (openlibrarycacheRefreshUntil IS NULL OR openlibrarycacheRefreshUntil < NOW(6))
+                    """,
+                    (int(lease_seconds * 1_000_000), _key(query)),
+                )
+                return cur.rowcount == 1
+    except (pymysql.err.MySQLError, DeadlineExceeded):
+        return False
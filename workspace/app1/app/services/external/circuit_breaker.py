@@ -0,0 +1,149 @@
+# /services/external/circuit_breaker.py
+#
+# - Circuit breaker and retry budget for calls to ***EXTERNAL*** APIs (used by external_books.py)
+# - CircuitBreaker: stops calling a degraded service once the failure rate of the recent calls
+#   crosses a threshold (OPEN), then lets a few probe calls through after a cool-down (HALF_OPEN)
+#   and closes again when they succeed.
+# - RetryBudget: caps retries to a fraction of the calls of this worker, so a degraded service
+#   does not receive (attempts x requests) calls.
+#
+# Both are per worker process and meant for code running on the event loop (no locking).
+#
+# 261019: Initial version
+
+
+import time
+from collections import deque
+from collections.abc import Callable
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling the external service while the circuit is open.
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,   # open when >= 50% of the recent calls failed ...
+        minimum_calls: int = 10,               # ... and at least this many calls were recorded
+        window_size: int = 20,                 # number of recent calls considered
+        open_seconds: float = 30.0,            # cool-down before probing again
+        half_open_max_calls: int = 1,          # concurrent probe calls while half-open
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+
+        self._state = self.CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=window_size)   # True = failure
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def before_call(self) -> None:
+        """
+        Raises CircuitOpenError if the call must not be made.
+        """
+        state = self.state
+        if state == self.OPEN:
+            raise CircuitOpenError(self.name, self.open_seconds - (self._clock() - self._opened_at))
+        if state == self.HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                raise CircuitOpenError(self.name, self.open_seconds)
+            self._probes += 1
+
+    def record_success(self) -> None:
+        if self._state == self.HALF_OPEN:
+            # probe succeeded: start over with a clean window
+            self._state = self.CLOSED
+            self._outcomes.clear()
+            return
+        self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        if self._state == self.HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(True)
+        if len(self._outcomes) >= self.minimum_calls and self.failure_rate() >= self.failure_rate_threshold:
+            self._open()
+
+    def record_ignored(self) -> None:
+        # the call ended for a reason unrelated to the service (e.g. the request deadline): free its probe slot
+        if self._state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "state": self.state,
+            "failureRate": round(self.failure_rate(), 3),
+            "recordedCalls": len(self._outcomes),
+        }
+
+
+class RetryBudget:
+    """
+    Token bucket: every call deposits `ratio` tokens (up to `max_tokens`), every retry withdraws one.
+    `min_per_second` keeps a small trickle of retries available when traffic is low.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        max_tokens: float = 10.0,
+        min_per_second: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.min_per_second = min_per_second
+        self._clock = clock
+        self._tokens = max_tokens
+        self._last = clock()
+
+    def deposit(self) -> None:
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        now = self._clock()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last) * self.min_per_second)
+        self._last = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def stats(self) -> dict[str, float]:
+        return {"tokens": round(self._tokens, 2)}
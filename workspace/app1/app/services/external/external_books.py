@@ -4,37 +4,238 @@
 # - Provides a function to fetch book data from the ***EXTERNAL*** Open Library API 
 # - Implements retry logic with tenacity to handle transient errors.
 # 
+# 261019: Concurrent identical queries are coalesced (single-flight) into one Open Library call.
+# 261019: Calls go through a circuit breaker (fail fast with CircuitOpenError while Open Library is degraded)
+#         Retries only on retryable errors (network errors, 429, 5xx), honor Retry-After,
+#         and are limited by a per-worker retry budget.
+#         The base URL is configurable (OPENLIBRARY_URL), e.g. to point at a local fake server.
+# 261019: Tracing: a span for the whole search (incl. tenacity backoff waits, recorded as "retry" events)
+#         and a client span per HTTP attempt, which carries the W3C traceparent header to Open Library.
+# 261019: Mapping of an Open Library search doc moved to book_from_search_doc() (shared with the offline dump ingestion)
+# 261019: Request deadline: the remaining time bounds the httpx timeout, and no retry is attempted past it
+#         (DeadlineExceeded). Timeouts caused by the deadline do not count as Open Library failures.
+# 261019: Searches are cached in MariaDB (services/db/openlibrary_cache.py), keyed by the normalized query:
+#         repeat imports skip the network; "no book found" is cached too (shorter TTL). An expired entry is
+#         still served for a while (stale-while-revalidate) while a background task refreshes it.
+# 261019: A cancelled call (e.g. client gone) frees its circuit breaker probe slot; a 200 with a body that is not
+#         JSON counts as an Open Library failure (retried, like a 5xx).
+# 261019: A coalesced search runs under its own deadline (see core/singleflight.py), not the first caller's;
+#         each caller waits for it no longer than its own deadline.
+# 261019: A coalesced search runs under the latest deadline of its callers and is cancelled once they have all
+#         given up (SharedDeadline, see core/singleflight.py)
+# 261019: A timeout is blamed on the request deadline (ignored by the circuit breaker, DeadlineExceeded) only when the
+#         deadline has actually expired; otherwise Open Library hung and it counts as a failure
+# 261019: The result of a search is stored under a deadline of its own (shared_context): it has been paid for,
+#         so the request's remaining time must not decide whether it is cached.
 
 
+import asyncio
+import contextvars
+import json
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import Any
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from starlette.concurrency import run_in_threadpool
+from tenacity import RetryCallState, retry, retry_if_exception, stop_after_attempt, wait_exponential
+from tenacity.stop import stop_base
 
-BASE_URL = "https://openlibrary.org/search.json"
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, current_deadline, remaining_seconds, shared_context
+from app.core.singleflight import AsyncSingleFlight
+from app.core.tracing import current_span, inject, start_span, traced
+from app.services.db.openlibrary_cache import claim_refresh, get_cached_search, store_search
+from app.services.external.circuit_breaker import CircuitBreaker, RetryBudget
 
+BASE_URL = settings.openlibrary_url
+TIMEOUT = 10.0  # seconds per attempt (less when the request deadline is closer)
 
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_WAIT = 8.0  # seconds; a longer Retry-After means "don't retry now"
+REFRESH_LEASE = 30.0  # seconds; one background refresh per stale cache entry (all workers) within this time
+
+_searches = AsyncSingleFlight("openlibrary")
+
+breaker = CircuitBreaker(
+    "openlibrary",
+    failure_rate_threshold=settings.openlibrary_cb_failure_rate,
+    minimum_calls=settings.openlibrary_cb_minimum_calls,
+    window_size=settings.openlibrary_cb_window_size,
+    open_seconds=settings.openlibrary_cb_open_seconds,
+)
+retry_budget = RetryBudget(ratio=settings.openlibrary_retry_ratio)
+
+
+_refreshes: set[asyncio.Task] = set()  # background refreshes still running (strong references)
+
+
+def normalize_query(query: str) -> str:
+    # "Dune ", "dune" and "DUNE" are one search (and one cache entry)
+    return " ".join(query.split()).lower()
+
+
+async def fetch_one_book(query: str) -> dict[str, Any] | None:
+    if not settings.openlibrary_cache_enabled:
+        return await _fetch(query, _search)
+
+    query = normalize_query(query)
+    entry = await run_in_threadpool(get_cached_search, query)
+    if entry is None:
+        return await _fetch(query, _search_and_store)
+    if not entry.isFresh:
+        _refresh_in_background(query)
+    book = entry.openlibrarycacheBook
+    return json.loads(book) if book is not None else None
+
+
+async def _fetch(query: str, search) -> dict[str, Any] | None:
+    if not settings.singleflight_enabled:
+        return await search(query)
+
+    book = await _searches.do(query, lambda: search(query))
+    # each caller gets its own dict (callers may enrich/modify it)
+    return dict(book) if book else None
+
+
+async def _search_and_store(query: str) -> dict[str, Any] | None:
+    book = await _search(query)
+    # not bounded by the request deadline; a failed write just means the next search goes to Open Library
+    await run_in_threadpool(shared_context().run, store_search, query, book)
+    return book
+
+
+def _refresh_in_background(query: str) -> None:
+    # in an empty context: the request's deadline (and trace) must not bound the refresh
+    task = asyncio.create_task(_refresh(query), context=contextvars.Context())
+    _refreshes.add(task)
+    task.add_done_callback(_refreshes.discard)
+
+
+async def _refresh(query: str) -> None:
+    if not await run_in_threadpool(claim_refresh, query, REFRESH_LEASE):
+        return  # already being refreshed (maybe by another worker)
+    try:
+        await _fetch(query, _search_and_store)
+    except Exception:
+        pass  # e.g. circuit open: the stale entry is served until it expires, the next stale hit retries
+
+
+@traced("openlibrary.search")
+async def _search(query: str) -> dict[str, Any] | None:
+    retry_budget.deposit()
+    return await _fetch_one_book(query)
+
+
+def _is_failure(e: BaseException) -> bool:
+    # Failures that indicate Open Library is degraded (they count for the circuit breaker)
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in RETRYABLE_STATUSES
+    return isinstance(e, (httpx.RequestError, json.JSONDecodeError))   # JSONDecodeError: garbled/truncated body
+
+
+def _retry_after(e: BaseException | None) -> float | None:
+    # Retry-After header (delta-seconds or HTTP-date) of a failed response, in seconds
+    if not isinstance(e, httpx.HTTPStatusError):
+        return None
+    value = e.response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _should_retry(e: BaseException) -> bool:
+    if not _is_failure(e):
+        return False  # 4xx (other than 429), CircuitOpenError ...
+    retry_after = _retry_after(e)
+    if retry_after is not None and retry_after > MAX_RETRY_WAIT:
+        return False
+    return retry_budget.try_withdraw()
+
+
+_backoff = wait_exponential(multiplier=1, min=1, max=MAX_RETRY_WAIT)
+
+
+def _wait(retry_state: RetryCallState) -> float:
+    # exponential backoff, but never sooner than the server asked for
+    error = retry_state.outcome.exception() if retry_state.outcome else None
+    return max(_backoff(retry_state), _retry_after(error) or 0.0)
+
+
+class _PastDeadline(stop_base):
+    # stop retrying when the next attempt could not start before the request deadline
+    def __call__(self, retry_state: RetryCallState) -> bool:
+        deadline = current_deadline()
+        if deadline is None:
+            return False
+        # the wait is computed here: RetryCallState.upcoming_sleep is only set before stop from tenacity 8.3 on
+        return retry_state.retry_object.wait(retry_state) >= deadline.remaining()
+
+
+def _before_sleep(retry_state: RetryCallState) -> None:
+    error = retry_state.outcome.exception() if retry_state.outcome else None
+    current_span().add_event(
+        "retry",
+        attempt=retry_state.attempt_number,
+        sleep_s=retry_state.next_action.sleep if retry_state.next_action else None,
+        error=repr(error),
+    )
 
 
 @retry(
-    stop=stop_after_attempt(4),
-    wait=wait_exponential(multiplier=1, min=1, max=8),
-    retry=retry_if_exception_type((httpx.RequestError, httpx.HTTPStatusError)),
+    stop=stop_after_attempt(settings.openlibrary_max_attempts) | _PastDeadline(),
+    wait=_wait,
+    retry=retry_if_exception(_should_retry),
+    before_sleep=_before_sleep,
     reraise=True,
 )
-async def fetch_one_book(query: str) -> dict[str, Any] | None:
-    params = {"q": query, "limit": 1}
-    timeout = httpx.Timeout(10.0)
+async def _fetch_one_book(query: str) -> dict[str, Any] | None:
+    params: dict[str, str | int] = {"q": query, "limit": 1}
+    seconds = remaining_seconds(TIMEOUT)   # raises DeadlineExceeded when no time is left
+    timeout = httpx.Timeout(seconds)
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        r = await client.get(BASE_URL, params=params)
-        r.raise_for_status()
-        data = r.json()
+    breaker.before_call()
+    try:
+        with start_span("HTTP GET openlibrary", kind="client", **{"http.method": "GET", "http.url": BASE_URL}) as span:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                r = await client.get(BASE_URL, params=params, headers=inject({}))
+                span.set_attribute("http.status_code", r.status_code)
+                r.raise_for_status()
+                data = r.json()
+    except asyncio.CancelledError:
+        # not an outcome of Open Library (and not an Exception): without this a half-open probe slot would leak
+        breaker.record_ignored()
+        raise
+    except Exception as e:
+        deadline = current_deadline()
+        if isinstance(e, httpx.TimeoutException) and deadline is not None and deadline.remaining() <= 0:
+            # our own deadline cut the call short: says nothing about Open Library
+            breaker.record_ignored()
+            raise DeadlineExceeded("Request deadline exceeded") from e
+        if _is_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()   # e.g. 404: Open Library answered, it is not degraded
+        raise
+    breaker.record_success()
 
     docs = data.get("docs", [])
     if not docs:
         return None
 
-    doc = docs[0]
+    return book_from_search_doc(docs[0])
+
+
+def book_from_search_doc(doc: dict[str, Any]) -> dict[str, Any]:
+    """
+    Maps an Open Library search doc to our book dict (title, first_publish_year, author, isbn)
+    """
     return {
         "title": doc.get("title"),
         "first_publish_year": doc.get("first_publish_year"),
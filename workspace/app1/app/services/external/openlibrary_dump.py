@@ -0,0 +1,108 @@
+# /services/external/openlibrary_dump.py
+#
+# - Streams book records from a LOCAL Open Library dump file (no network access).
+# - Supported formats (optionally gzipped, detected from the file content):
+#     - the official dumps (https://openlibrary.org/developers/dumps): TSV lines
+#       type <TAB> key <TAB> revision <TAB> last_modified <TAB> JSON   (works / editions)
+#     - JSONL with one search doc per line (the same shape as search.json "docs")
+# - Everything is a generator: memory stays bounded no matter the size of the dump.
+# - Records are mapped to the same book dict as fetch_one_book() (title, first_publish_year, author, isbn).
+#
+# 261019: Initial version (offline bulk ingestion, see app/cli/ingest_dump.py)
+# 261019: Records whose title is not a string are skipped (like untitled ones)
+
+
+import gzip
+import json
+import re
+from collections.abc import Iterator
+from typing import IO, Any
+
+from app.services.external.external_books import book_from_search_doc
+
+# Record types of the official dumps that describe a book
+BOOK_TYPES = {"/type/work", "/type/edition"}
+
+_YEAR = re.compile(r"\b(\d{4})\b")
+
+
+def _open(path: str) -> IO[str]:
+    with open(path, "rb") as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    if gzipped:
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "rt", encoding="utf-8")
+
+
+def iter_dump_lines(path: str, start_line: int = 0) -> Iterator[tuple[int, str]]:
+    """
+    Yields (line_number, line) starting after `start_line` (1-based; 0 = from the beginning).
+    Skipped lines are not parsed, so resuming a large dump is cheap.
+    """
+    with _open(path) as f:
+        for line_no, line in enumerate(f, start=1):
+            if line_no <= start_line:
+                continue
+            yield line_no, line
+
+
+def parse_dump_line(line: str) -> dict[str, Any] | None:
+    """
+    Parses one dump line into a record dict; None for blank/unsupported lines.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        return json.loads(line)   # JSONL (search docs)
+
+    cols = line.split("\t")
+    if len(cols) < 5 or cols[0] not in BOOK_TYPES:
+        return None               # authors, redirects, deletes, ...
+    return json.loads(cols[4])
+
+
+def _year(value: Any) -> int | None:
+    if isinstance(value, int):
+        return value
+    m = _YEAR.search(value) if isinstance(value, str) else None
+    return int(m.group(1)) if m else None
+
+
+def book_from_dump_record(record: dict[str, Any]) -> dict[str, Any] | None:
+    """
+    Maps a dump record (work, edition or search doc) to our book dict; None when there is no (string) title.
+    """
+    if "first_publish_year" in record or "author_name" in record:
+        book = book_from_search_doc(record)
+    else:
+        isbns = record.get("isbn_13") or record.get("isbn_10") or []
+        book = {
+            "title": record.get("title"),
+            "first_publish_year": _year(record.get("first_publish_date") or record.get("publish_date")),
+            # works/editions reference authors by key only; by_statement is the best name we have offline
+            "author": record.get("by_statement"),
+            "isbn": isbns[0] if isbns else None,
+        }
+
+    title = book.get("title")
+    if not isinstance(title, str) or not title.strip():
+        return None   # no title, or a malformed one (e.g. a list)
+    return book
+
+
+def iter_dump_books(path: str, start_line: int = 0) -> Iterator[tuple[int, dict[str, Any]]]:
+    """
+    Yields (line_number, book) for every usable record of the dump.
+    Lines that cannot be parsed are skipped.
+    """
+    for line_no, line in iter_dump_lines(path, start_line):
+        try:
+            record = parse_dump_line(line)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(record, dict):
+            continue              # None (unsupported) or not a JSON object
+        book = book_from_dump_record(record)
+        if book is not None:
+            yield line_no, book
@@ -0,0 +1,94 @@
+# workspace/tests/conftest.py
+#
+# Shared test helpers: a fake PyMySQL connection for the catalog endpoints (no database needed).
+# Its cursor records every statement and answers with canned rows, projected on the columns
+# the SELECT asks for (so sparse fieldsets and JOIN key columns behave as with MariaDB).
+#
+#version 1 - 261019
+
+
+
+import re
+
+import pytest
+
+import app.main as main
+from app.core.database import get_db
+from app.core.rows import row_class
+
+_SELECT = re.compile(r"SELECT\s+(.*?)\s+FROM\s", re.S | re.I)
+
+
+def select_columns(sql: str) -> tuple[str, ...]:
+    # "SELECT i.itemId, i.itemName FROM ..." -> ("itemId", "itemName")
+    match = _SELECT.search(sql)
+    return tuple(c.strip().split(".")[-1] for c in match.group(1).split(",")) if match else ()
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((" ".join(sql.split()), params))
+        columns = select_columns(sql)
+        rows = self.conn.respond(sql, params) or []
+        cls = row_class(columns)
+        self.rows = [cls(*(row.get(c) for c in columns)) for row in rows]
+        self.rowcount = len(self.rows)
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        self.conn.executed.append((" ".join(sql.split()), seq_of_params))
+        affected = self.conn.respond(sql, seq_of_params)
+        self.rows = []
+        self.rowcount = affected if isinstance(affected, int) else len(seq_of_params)
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class FakeConnection:
+    """
+    `respond(sql, params)` returns the matching rows as dicts (all columns; the cursor selects from them);
+    for executemany() it may return the number of affected rows (default: one per parameter set).
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.executed: list[tuple[str, object]] = []
+
+    def cursor(self, *args):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def fake_db():
+    """
+    Returns install(respond) -> FakeConnection, used by the app's get_db for the rest of the test.
+    """
+    def install(respond):
+        conn = FakeConnection(respond)
+        main.app.dependency_overrides[get_db] = lambda: conn
+        return conn
+
+    yield install
+    main.app.dependency_overrides.pop(get_db, None)
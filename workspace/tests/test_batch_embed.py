@@ -0,0 +1,73 @@
+# workspace/tests/test_batch_embed.py
+#
+# Verifies batch GET (?ids=: max 100, duplicates collapsed, non-numeric rejected) and that embedding
+# a relation costs ONE extra query per page, whatever the number of rows (no N+1).
+# No database needed: see the fake_db fixture (conftest.py).
+#
+#version 1 - 261019
+
+
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+
+CATEGORIES = [{"categoryId": cid, "categoryName": f"Category {cid}"} for cid in (1, 2, 3)]
+ITEMS = [{"itemId": iid, "itemName": f"Item {iid}"} for iid in (10, 11)]
+LINKS = [(1, 10), (1, 11), (2, 10)]   # (categoryId, itemId)
+
+
+def _respond(sql, params):
+    if "categoryitemCategoryId IN" in sql:      # items_by_category
+        return [
+            {"categoryitemCategoryId": cid, **item}
+            for cid, iid in LINKS if cid in params for item in ITEMS if item["itemId"] == iid
+        ]
+    if "categoryitemItemId IN" in sql:          # categories_by_item
+        return [
+            {"categoryitemItemId": iid, **cat}
+            for cid, iid in LINKS if iid in params for cat in CATEGORIES if cat["categoryId"] == cid
+        ]
+    if "FROM categories" in sql:
+        return CATEGORIES
+    return ITEMS
+
+
+@pytest.fixture
+def client(fake_db):
+    conn = fake_db(_respond)
+    return TestClient(main.app), conn
+
+
+def test_ids_are_validated_and_deduplicated(client):
+    http, conn = client
+
+    assert http.get("/api/items?ids=" + ",".join(map(str, range(1, 102)))).status_code == 422
+    r = http.get("/api/items?ids=1,x")
+    assert r.status_code == 422 and r.json()["detail"][0]["loc"] == ["query", "ids"]
+    assert conn.executed == []
+
+    assert http.get("/api/items?ids=" + ",".join(map(str, range(1, 101)))).status_code == 200
+    assert http.get("/api/items?ids=11,10,11,,10").status_code == 200
+    sql, params = conn.executed[-1]
+    assert "i.itemId IN (%s, %s)" in sql and params == [10, 11]
+
+
+def test_embedding_is_one_query_per_relation(client):
+    http, conn = client
+
+    cats = http.get("/api/categories?embed=items&fields=categoryName,itemName").json()
+    assert len(conn.executed) == 2   # the page + one junction query (not one per category)
+    assert conn.executed[1][1] == (1, 2, 3)
+    assert cats == [
+        {"categoryId": 1, "categoryName": "Category 1", "items": [{"itemId": 10, "itemName": "Item 10"}, {"itemId": 11, "itemName": "Item 11"}]},
+        {"categoryId": 2, "categoryName": "Category 2", "items": [{"itemId": 10, "itemName": "Item 10"}]},
+        {"categoryId": 3, "categoryName": "Category 3", "items": []},
+    ]
+
+    conn.executed.clear()
+    items = http.get("/api/items?embed=categories&fields=itemName,categoryName").json()
+    assert len(conn.executed) == 2
+    assert [len(i["categories"]) for i in items] == [2, 1]
+    assert "categoryitemItemId" not in items[0]["categories"][0]   # the junction key is not returned
@@ -0,0 +1,65 @@
+# workspace/tests/test_changes.py
+#
+# Verifies the change feed: cursor paging (nextCursor / hasMore) and that only settled rows are asked for
+# (older than the oldest open writing transaction, minus CHANGES_SETTLE_MS).
+# No database needed: see the fake_db fixture (conftest.py).
+#
+#version 1 - 261019
+
+
+
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.core.config import settings
+
+CHANGES = [
+    {"changelogId": cid, "changelogEntity": "item", "changelogEntityId": cid, "changelogOperation": "U",
+     "changelogCategoryId": None, "changelogItemId": cid, "changelogCrTimestamp": datetime.datetime(2026, 1, 1)}
+    for cid in range(1, 8)
+]
+
+
+def _respond(sql, params):
+    since, _settle_us, limit = params
+    return [c for c in CHANGES if c["changelogId"] > since][:limit]
+
+
+@pytest.fixture
+def client(fake_db):
+    conn = fake_db(_respond)
+    return TestClient(main.app), conn
+
+
+def test_cursor_paging(client):
+    http, conn = client
+
+    page = http.get("/api/changes?since=0&limit=3").json()
+    assert [c["changelogId"] for c in page["changes"]] == [1, 2, 3]
+    assert page["nextCursor"] == 3 and page["hasMore"] is True
+    assert conn.executed[-1][1][2] == 4   # one extra row tells whether there is a next page
+
+    page = http.get(f"/api/changes?since={page['nextCursor']}&limit=4").json()
+    assert [c["changelogId"] for c in page["changes"]] == [4, 5, 6, 7]
+    assert page["nextCursor"] == 7 and page["hasMore"] is False
+
+    page = http.get("/api/changes?since=7").json()
+    assert page == {"changes": [], "nextCursor": 7, "hasMore": False}   # the cursor stays put
+
+    assert http.get("/api/changes?limit=0").status_code == 422
+    assert http.get("/api/changes?since=-1").status_code == 422
+
+
+def test_only_settled_changes_are_selected(client):
+    http, conn = client
+
+    http.get("/api/changes?since=5&limit=10")
+    sql, params = conn.executed[-1]
+    assert params == (5, settings.changes_settle_ms * 1000, 11)
+    assert "changelogId > %s" in sql and "ORDER BY changelogId" in sql
+    # held back behind the oldest open transaction that wrote rows (other than this session)
+    assert "FROM information_schema.innodb_trx WHERE trx_rows_modified > 0" in sql
+    assert "- INTERVAL %s MICROSECOND" in sql
@@ -0,0 +1,192 @@
+# workspace/tests/test_circuit_breaker.py
+#
+# Circuit breaker state machine (fake clock), and fetch_one_book against a local fake Open Library server:
+#   - non-retryable statuses (404) are not retried
+#   - repeated 503s open the circuit, after which calls fail fast without reaching the server
+#   - a 200 whose body is not JSON counts as a failure; a cancelled probe frees its half-open slot
+#   - a hang counts as a failure while the request deadline has time left, not once it has expired
+#   - no retry is started when its backoff would end past the request deadline
+#
+#version 1 - 261019
+
+
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from tenacity import wait_none
+
+from app.core import deadline as deadline_module
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.services.external import external_books
+from app.services.external.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_probes_and_closes():
+    clock = FakeClock()
+    cb = CircuitBreaker("test", failure_rate_threshold=0.5, minimum_calls=4, window_size=4, open_seconds=10, clock=clock)
+
+    for _ in range(2):
+        cb.before_call()
+        cb.record_success()
+    for _ in range(2):
+        cb.before_call()
+        cb.record_failure()
+    assert cb.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        cb.before_call()
+
+    clock.now = 10
+    assert cb.state == CircuitBreaker.HALF_OPEN
+    cb.before_call()                      # the single probe ...
+    with pytest.raises(CircuitOpenError):
+        cb.before_call()                  # ... no second one concurrently
+    cb.record_success()
+    assert cb.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens():
+    clock = FakeClock()
+    cb = CircuitBreaker("test", minimum_calls=1, window_size=1, open_seconds=5, clock=clock)
+    cb.record_failure()
+    clock.now = 5
+    cb.before_call()
+    cb.record_failure()
+    assert cb.state == CircuitBreaker.OPEN
+
+
+@pytest.fixture
+def fake_openlibrary(monkeypatch):
+    hits = []
+    status = {"code": 200, "body": None, "delay": 0.0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            time.sleep(status["delay"])
+            body = status["body"] or json.dumps({"docs": [{"title": "Dune", "first_publish_year": 1965}]}).encode()
+            self.send_response(status["code"])
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.setattr(external_books, "BASE_URL", f"http://127.0.0.1:{server.server_port}/search.json")
+    monkeypatch.setattr(external_books, "breaker", CircuitBreaker("test", minimum_calls=4, window_size=4))
+    monkeypatch.setattr(external_books._fetch_one_book.retry, "wait", wait_none())
+    monkeypatch.setattr(external_books.settings, "openlibrary_cache_enabled", False)   # every call reaches the server
+    yield hits, status
+    server.shutdown()
+
+
+def test_fetch_against_fake_server(fake_openlibrary):
+    hits, status = fake_openlibrary
+
+    assert asyncio.run(external_books.fetch_one_book("dune"))["title"] == "Dune"
+
+    status["code"] = 404
+    hits.clear()
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(external_books.fetch_one_book("dune"))
+    assert len(hits) == 1   # not retried
+
+    status["code"] = 503
+    hits.clear()
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(external_books.fetch_one_book("dune"))
+    assert len(hits) == 2   # 2 of the last 4 calls failed: the circuit opened before the 3rd attempt
+    assert external_books.breaker.state == CircuitBreaker.OPEN
+
+    hits.clear()
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(external_books.fetch_one_book("dune"))
+    assert hits == []       # failed fast
+
+
+def test_garbled_body_counts_as_failure(fake_openlibrary):
+    hits, status = fake_openlibrary
+    status["body"] = b"<html>Service Unavailable</html>"
+
+    with pytest.raises(json.JSONDecodeError):
+        asyncio.run(external_books.fetch_one_book("dune"))
+    assert len(hits) == 4   # retried like a 5xx, and counted as failures: the circuit opened
+    assert external_books.breaker.state == CircuitBreaker.OPEN
+
+
+def test_cancelled_probe_frees_its_slot(fake_openlibrary):
+    hits, status = fake_openlibrary
+    clock = FakeClock()
+    external_books.breaker = cb = CircuitBreaker("test", minimum_calls=1, window_size=1, open_seconds=5, clock=clock)
+    cb.record_failure()
+    clock.now = 5
+    status["delay"] = 0.5
+
+    async def cancelled_probe():
+        task = asyncio.ensure_future(external_books.fetch_one_book("dune"))
+        while not hits:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancelled_probe())
+    assert cb.state == CircuitBreaker.HALF_OPEN
+    cb.before_call()   # the probe slot is free again (CircuitOpenError otherwise)
+
+
+def _fetch_with_deadline(timeout_ms):
+    async def fetch():
+        deadline_module._current.set(Deadline(timeout_ms, "header"))
+        return await external_books.fetch_one_book("dune")
+    return asyncio.run(fetch())
+
+
+def test_hang_with_deadline_left_counts_as_failure(fake_openlibrary, monkeypatch):
+    hits, status = fake_openlibrary
+    monkeypatch.setattr(external_books, "TIMEOUT", 0.2)
+    status["delay"] = 1.0
+
+    with pytest.raises(httpx.TimeoutException):   # not DeadlineExceeded: the request still had time
+        _fetch_with_deadline(5000)
+    assert len(hits) == 4
+    assert external_books.breaker.state == CircuitBreaker.OPEN
+
+
+def test_timeout_at_the_deadline_is_not_a_failure(fake_openlibrary):
+    hits, status = fake_openlibrary
+    status["delay"] = 1.0
+
+    with pytest.raises(DeadlineExceeded):
+        _fetch_with_deadline(300)
+    assert len(hits) == 1
+    assert external_books.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_no_retry_past_the_deadline(fake_openlibrary, monkeypatch):
+    hits, status = fake_openlibrary
+    monkeypatch.setattr(external_books._fetch_one_book.retry, "wait", external_books._wait)   # backoff >= 1 s
+    status["code"] = 503
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _fetch_with_deadline(500)
+    assert len(hits) == 1
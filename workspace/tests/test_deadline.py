@@ -0,0 +1,133 @@
+# workspace/tests/test_deadline.py
+#
+# Verifies the request deadline: where it comes from (header / route default / setting), how it is
+# propagated to SQL statements (SET STATEMENT max_statement_time=... FOR), how MariaDB timeouts map to
+# DeadlineExceeded / 504, and that a client disconnect cancels the request (KILL QUERY actions).
+# No database needed: the cursor talks to a stub of Cursor.execute.
+#
+#version 1 - 261019
+
+
+
+import asyncio
+import time
+
+import pymysql
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pymysql.cursors import Cursor
+
+import app.main as main
+from app.core import database
+from app.core.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    DeadlineMiddleware,
+    RequestCancelled,
+    _current,
+    current_deadline,
+    route_deadline,
+)
+
+
+class FakeConnection:
+    def thread_id(self):
+        return 42
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    statements = []
+
+    def fake_execute(self, query, args=None):
+        statements.append(query)
+        if "SLEEP" in query:
+            raise pymysql.err.OperationalError(database.ER_STATEMENT_TIMEOUT, "max_statement_time exceeded")
+        return 0
+
+    monkeypatch.setattr(Cursor, "execute", fake_execute)
+    return statements
+
+
+def _run_in_request(deadline, fn):
+    token = _current.set(deadline)
+    try:
+        return fn()
+    finally:
+        _current.reset(token)
+
+
+def test_statements_get_the_remaining_time(executed):
+    cur = database.TracingCursor(FakeConnection())
+    cur.execute("SELECT 1")   # outside of a request: unchanged
+    _run_in_request(Deadline(2000, "default"), lambda: (cur.execute("SELECT 2"), cur.execute("COMMIT")))
+
+    assert executed[0] == "SELECT 1"
+    prefix, _, rest = executed[1].partition(" FOR ")
+    assert rest == "SELECT 2" and prefix.startswith("SET STATEMENT max_statement_time=")
+    assert 1.9 < float(prefix.split("=")[1]) <= 2.0
+    assert executed[2] == "COMMIT"
+
+
+def test_statement_timeout_and_expired_deadline(executed):
+    cur = database.TracingCursor(FakeConnection())
+    with pytest.raises(DeadlineExceeded):
+        _run_in_request(Deadline(2000, "default"), lambda: cur.execute("SELECT SLEEP(5)"))
+
+    expired = Deadline(1, "default")
+    time.sleep(0.01)
+    with pytest.raises(DeadlineExceeded):
+        _run_in_request(expired, lambda: cur.execute("SELECT 3"))
+    assert not any("SELECT 3" in q for q in executed)   # never sent to the database
+
+
+def test_route_default_header_and_504():
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware)
+    app.add_exception_handler(DeadlineExceeded, main.deadline_exceeded_handler)
+
+    @app.get("/slow", dependencies=[Depends(route_deadline(50))])
+    def slow():
+        deadline = current_deadline()
+        time.sleep(0.1)
+        deadline.check()
+
+    @app.get("/source", dependencies=[Depends(route_deadline(50))])
+    def source():
+        return {"source": current_deadline().source}
+
+    client = TestClient(app)
+    assert client.get("/slow").status_code == 504
+    assert client.get("/source").json() == {"source": "route"}
+    assert client.get("/source", headers={"X-Request-Timeout-Ms": "5000"}).json() == {"source": "header"}
+    assert client.get("/slow", headers={"X-Request-Timeout-Ms": "5000"}).status_code == 200
+
+
+def test_client_disconnect_cancels_the_request():
+    killed = []
+    seen = {}
+
+    async def app(scope, receive, send):
+        deadline = current_deadline()
+        with deadline.cancellable(lambda: killed.append("KILL QUERY 42")):
+            for _ in range(100):
+                if deadline.cancelled:
+                    break
+                await asyncio.sleep(0.01)
+        with pytest.raises(RequestCancelled):
+            deadline.check()
+        seen["cancelled"] = True
+
+    async def receive():
+        await asyncio.sleep(0.05)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+    asyncio.run(DeadlineMiddleware(app)(scope, receive, send))
+
+    assert killed == ["KILL QUERY 42"]
+    assert seen == {"cancelled": True}
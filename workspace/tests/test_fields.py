@@ -0,0 +1,78 @@
+# workspace/tests/test_fields.py
+#
+# Verifies sparse fieldsets (?fields=): unknown names are rejected (422), only the requested columns
+# (plus the primary key) are selected, and responses contain exactly those keys.
+# No database needed: see the fake_db fixture (conftest.py).
+#
+#version 1 - 261019
+
+
+
+import datetime
+import decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.services.db.catalog import ITEM_COLUMNS, _columns
+
+ITEM = {
+    "itemId": 1,
+    "itemName": "Book 1",
+    "itemListPrice": decimal.Decimal("9.90"),
+    "itemModelYear": 2020,
+    "itemStatusId": 1,
+    "itemCrUUID": "u" * 36,
+    "itemCrTimestamp": datetime.datetime(2024, 1, 1),
+    "itemClientUUID": None,
+}
+CATEGORY = {"categoryId": 3, "categoryName": "Fiction", "categoryStatusId": 1,
+            "categoryCrUUID": "c" * 36, "categoryCrTimestamp": datetime.datetime(2024, 1, 1), "categoryClientUUID": None}
+
+
+def _respond(sql, params):
+    if "FROM categories" in sql:
+        return [CATEGORY]
+    return [ITEM]
+
+
+@pytest.fixture
+def client(fake_db):
+    conn = fake_db(_respond)
+    return TestClient(main.app), conn
+
+
+def test_columns_always_include_the_primary_key():
+    assert _columns(ITEM_COLUMNS, None) == ",\n              ".join(ITEM_COLUMNS)
+    assert _columns(ITEM_COLUMNS, frozenset({"itemName"}), "i") == "i.itemId,\n              i.itemName"
+    assert _columns(ITEM_COLUMNS, frozenset()) == "itemId"
+
+
+@pytest.mark.parametrize("url", [
+    "/api/items?fields=itemName,bogus",
+    "/api/items/1?fields=password",
+    "/api/categories?fields=itemName",           # relation field without embed=items
+])
+def test_unknown_or_misplaced_fields_are_rejected(client, url):
+    http, conn = client
+    r = http.get(url)
+    assert r.status_code == 422
+    (error,) = r.json()["detail"]    # FastAPI's validation error format, like any other bad parameter
+    assert error["loc"] == ["query", "fields"] and error["type"] == "value_error" and error["msg"]
+    assert conn.executed == []   # rejected before any SQL
+
+
+def test_partial_responses_contain_exactly_the_requested_keys(client):
+    http, conn = client
+
+    items = http.get("/api/items?fields=itemName,itemListPrice").json()
+    assert items == [{"itemId": 1, "itemName": "Book 1", "itemListPrice": "9.90"}]
+    sql = conn.executed[-1][0]
+    assert "i.itemId, i.itemName, i.itemListPrice FROM" in sql and "itemCrUUID" not in sql
+
+    item = http.get("/api/items/1?fields=itemModelYear,categoryName").json()
+    assert item == {"itemId": 1, "itemModelYear": 2020, "categories": [{"categoryId": 3, "categoryName": "Fiction"}]}
+
+    assert set(http.get("/api/items?fields=itemId").json()[0]) == {"itemId"}
+    assert set(http.get("/api/items").json()[0]) == set(ITEM)
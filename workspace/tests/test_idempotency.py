@@ -0,0 +1,192 @@
+# workspace/tests/test_idempotency.py
+#
+# Verifies the Idempotency-Key middleware: a retry gets the stored response without running the
+# handler again, concurrent duplicates wait for the first request, a key reused for another request
+# is rejected, responses a retry could change (5xx) are not stored, and a duplicate waits no longer than its
+# own deadline (409 + Retry-After) and stops waiting when its client disconnects. A database error while
+# claiming the key is a 503 + Retry-After, without running the handler.
+# No database needed: the middleware uses an in-memory IdempotencyStore.
+#
+#version 1 - 261019
+
+
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pymysql
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.idempotency import IdempotencyMiddleware, IdempotencyStore
+from app.core.rows import row_class
+
+Record = row_class((
+    "idempotencykeyRequestHash",
+    "idempotencykeyResponseStatus",
+    "idempotencykeyResponseType",
+    "idempotencykeyResponseBody",
+))
+
+
+class MemoryStore(IdempotencyStore):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows: dict[str, tuple[str, str | None, tuple | None]] = {}   # key -> (hash, token, response)
+
+    def claim(self, key, request_hash, token):
+        with self.lock:
+            if key not in self.rows:
+                self.rows[key] = (request_hash, token, None)
+                return True, None
+            stored_hash, _, response = self.rows[key]
+            return False, Record(stored_hash, *(response or (None, None, None)))
+
+    def complete(self, key, token, status, content_type, body):
+        with self.lock:
+            if self.rows.get(key, (None, None))[1] == token:
+                self.rows[key] = (self.rows[key][0], None, (status, content_type, body))
+
+    def release(self, key, token):
+        with self.lock:
+            if self.rows.get(key, (None, None))[1] == token:
+                del self.rows[key]
+
+    def delete_expired(self, limit=1000):
+        return 0
+
+
+def _app(store):
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware, paths=["/items", "/flaky"], store=store)
+    app.state.calls = 0
+
+    @app.post("/items", status_code=201)
+    async def create(payload: dict):
+        app.state.calls += 1
+        await asyncio.sleep(0.05)
+        return {"itemId": app.state.calls, **payload}
+
+    @app.post("/flaky")
+    def flaky():
+        app.state.calls += 1
+        raise HTTPException(status_code=503, detail="try again")
+
+    return app
+
+
+def test_retry_gets_the_stored_response():
+    app = _app(MemoryStore())
+    client = TestClient(app)
+
+    first = client.post("/items", json={"itemName": "Book"}, headers={"Idempotency-Key": "k1"})
+    retry = client.post("/items", json={"itemName": "Book"}, headers={"Idempotency-Key": "k1"})
+    other = client.post("/items", json={"itemName": "Book"}, headers={"Idempotency-Key": "k2"})
+    no_key = client.post("/items", json={"itemName": "Book"})
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json() == {"itemId": 1, "itemName": "Book"}
+    assert retry.headers["idempotent-replayed"] == "true" and "idempotent-replayed" not in first.headers
+    assert retry.headers["content-type"] == "application/json"
+    assert other.json()["itemId"] == 2 and no_key.json()["itemId"] == 3
+    assert app.state.calls == 3
+
+
+def test_key_reused_for_another_request_and_invalid_key():
+    client = TestClient(_app(MemoryStore()))
+    client.post("/items", json={"itemName": "Book"}, headers={"Idempotency-Key": "k1"})
+
+    assert client.post("/items", json={"itemName": "Other"}, headers={"Idempotency-Key": "k1"}).status_code == 422
+    assert client.post("/items", json={}, headers={"Idempotency-Key": "x" * 256}).status_code == 400
+
+
+def test_concurrent_duplicates_wait_for_the_first():
+    app = _app(MemoryStore())
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/items", json={"itemName": "Book"}, headers={"Idempotency-Key": "k1"})
+                for _ in range(5)
+            ])
+
+    responses = asyncio.run(run())
+
+    assert app.state.calls == 1
+    assert {r.json()["itemId"] for r in responses} == {1}
+    assert sum(r.headers.get("idempotent-replayed") == "true" for r in responses) == 4
+
+
+def test_server_errors_are_not_stored():
+    store = MemoryStore()
+    app = _app(store)
+    client = TestClient(app)
+
+    for _ in range(2):
+        assert client.post("/flaky", headers={"Idempotency-Key": "k1"}).status_code == 503
+    assert app.state.calls == 2 and store.rows == {}
+
+
+class UnavailableStore(MemoryStore):
+    def claim(self, key, request_hash, token):
+        raise pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+
+
+def test_claim_failure_is_a_503_without_running_the_request():
+    app = _app(UnavailableStore())
+    client = TestClient(app)
+
+    r = client.post("/items", json={"itemName": "Book"}, headers={"Idempotency-Key": "k1"})
+    assert r.status_code == 503 and r.headers["retry-after"] == "1"
+    assert app.state.calls == 0
+
+
+class BusyStore(MemoryStore):
+    """
+    Every key is already claimed by a request still running elsewhere (same request).
+    """
+
+    def claim(self, key, request_hash, token):
+        with self.lock:
+            self.rows.setdefault(key, (request_hash, "other-worker", None))
+        return super().claim(key, request_hash, token)
+
+
+def test_duplicate_waits_no_longer_than_its_deadline():
+    app = _app(BusyStore())
+    client = TestClient(app)
+
+    started = time.monotonic()
+    r = client.post("/items", json={}, headers={"Idempotency-Key": "k1", "X-Request-Timeout-Ms": "200"})
+    assert r.status_code == 409 and r.headers["retry-after"] == "1"
+    assert 0.2 <= time.monotonic() - started < 1.0
+    assert app.state.calls == 0
+
+
+def test_duplicate_stops_waiting_when_its_client_disconnects():
+    calls, sent = [], []
+
+    async def inner(scope, receive, send):
+        calls.append(scope["path"])
+
+    middleware = IdempotencyMiddleware(inner, paths=["/items"], store=BusyStore())
+    scope = {"type": "http", "method": "POST", "path": "/items", "query_string": b"",
+             "headers": [(b"idempotency-key", b"k1")]}
+    messages = [{"type": "http.request", "body": b"{}", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.sleep(0.1)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    started = time.monotonic()
+    asyncio.run(middleware(scope, receive, send))
+    assert time.monotonic() - started < 1.0   # not the 30s default deadline
+    assert sent == [] and calls == []
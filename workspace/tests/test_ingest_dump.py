@@ -0,0 +1,136 @@
+# workspace/tests/test_ingest_dump.py
+#
+# Verifies the offline dump ingestion without a database:
+#   - parsing of the official TSV dumps and of JSONL search docs, plain or gzipped (detected from the content)
+#   - malformed / unsupported / untitled lines are skipped, line numbers are kept
+#   - upsert_items_from_books(): one INSERT ... WHERE NOT EXISTS per distinct title (MariaDB decides what exists)
+#   - ingest(): checkpoint after every batch, a second run resumes after the saved line
+#
+#version 1 - 261019
+
+
+
+import contextlib
+import gzip
+import json
+import unicodedata
+
+import pytest
+
+from app.cli import ingest_dump
+from app.services.db import items_sql
+from app.services.external.openlibrary_dump import book_from_dump_record, iter_dump_books, parse_dump_line
+
+
+def _tsv(type_, record):
+    return f"{type_}\t/books/OL1M\t3\t2024-01-01T00:00:00\t{json.dumps(record)}"
+
+
+LINES = [
+    _tsv("/type/edition", {"title": "Dune", "publish_date": "June 1965", "by_statement": "Frank Herbert", "isbn_13": ["9780441013593"]}),
+    _tsv("/type/author", {"name": "Frank Herbert"}),                         # not a book
+    "",                                                                      # blank
+    _tsv("/type/work", {"title": "Broken", "first_publish_date": "19"})[:-5],  # truncated JSON
+    json.dumps({"title": "Emma", "first_publish_year": 1815, "author_name": ["Jane Austen"], "isbn": ["0141439580"]}),
+    "{not json",
+    _tsv("/type/work", {"title": "   "}),                                    # no title
+    _tsv("/type/work", {"title": "dune", "first_publish_date": 1965}),
+    _tsv("/type/work", {"title": ["Dune"], "first_publish_date": 1965}),      # malformed title
+    _tsv("/type/work", ["not", "a", "record"]),                             # not a JSON object
+]
+
+
+@pytest.fixture(params=["plain", "gzip"])
+def dump(request, tmp_path):
+    text = "\n".join(LINES) + "\n"
+    path = tmp_path / "dump.txt"
+    if request.param == "gzip":
+        path = tmp_path / "dump.txt.gz"
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_records_are_mapped_like_search_results():
+    assert parse_dump_line("  \n") is None
+    assert parse_dump_line(_tsv("/type/redirect", {"location": "/works/OL2W"})) is None
+    assert book_from_dump_record(parse_dump_line(LINES[0])) == {
+        "title": "Dune", "first_publish_year": 1965, "author": "Frank Herbert", "isbn": "9780441013593",
+    }
+    assert book_from_dump_record(parse_dump_line(LINES[4])) == {
+        "title": "Emma", "first_publish_year": 1815, "author": "Jane Austen", "isbn": "0141439580",
+    }
+
+
+def test_malformed_lines_are_skipped(dump):
+    books = list(iter_dump_books(dump))
+    assert [(line, book["title"]) for line, book in books] == [(1, "Dune"), (5, "Emma"), (8, "dune")]
+    assert [line for line, _ in iter_dump_books(dump, start_line=5)] == [8]
+    assert book_from_dump_record({"title": {"en": "Dune"}}) is None
+
+
+@pytest.fixture
+def db(monkeypatch, fake_db):
+    titles = set()   # itemName of the rows "in the table", compared like utf8mb4_unicode_ci would (roughly)
+
+    def key(title):
+        # case- and accent-insensitive, trailing spaces ignored
+        return "".join(c for c in unicodedata.normalize("NFD", title) if not unicodedata.combining(c)).casefold().rstrip()
+
+    def respond(sql, params):
+        assert "WHERE NOT EXISTS (SELECT 1 FROM items WHERE itemName = %s)" in sql
+        inserted = 0
+        for title, _, _, name in params:
+            assert name == title
+            if key(title) not in titles:
+                titles.add(key(title))
+                inserted += 1
+        return inserted
+
+    conn = fake_db(respond)
+    monkeypatch.setattr(items_sql, "get_conn", lambda: contextlib.nullcontext(conn))
+    return conn, titles
+
+
+def test_batched_upsert(db):
+    conn, titles = db
+    titles.add("emma")
+
+    inserted, existing = items_sql.upsert_items_from_books([
+        {"title": "Dune", "first_publish_year": 1965},
+        {"title": " Dune ", "first_publish_year": 1966},    # identical once stripped: one statement
+        {"title": "DÜNE", "first_publish_year": 1967},      # same item for the collation: not inserted
+        {"title": "Émma", "first_publish_year": 1815},      # already there
+        {"title": "x" * 150, "first_publish_year": -5},     # truncated, invalid year
+        {"title": None},
+    ])
+
+    assert (inserted, existing) == (2, 2)
+    assert len(conn.executed) == 1
+    assert conn.executed[0][1] == [
+        ("Dune", 0.00, 1965, "Dune"), ("DÜNE", 0.00, 1967, "DÜNE"), ("Émma", 0.00, 1815, "Émma"), ("x" * 100, 0.00, None, "x" * 100),
+    ]
+    assert items_sql.upsert_items_from_books([{"title": ""}]) == (0, 0)
+
+
+def test_checkpoint_resume(db, dump, tmp_path):
+    conn, titles = db
+    checkpoint_path = str(tmp_path / "dump.checkpoint.json")
+
+    first = ingest_dump.ingest(dump, checkpoint_path, batch_size=1, limit=1, progress_every=60, restart=False)
+    assert (first["line"], first["records"], first["inserted"]) == (1, 1, 1)
+    with open(checkpoint_path, encoding="utf-8") as f:
+        assert json.load(f)["line"] == 1
+
+    second = ingest_dump.ingest(dump, checkpoint_path, batch_size=10, limit=None, progress_every=60, restart=False)
+    assert (second["line"], second["records"], second["inserted"], second["existing"]) == (8, 3, 2, 1)
+    assert titles == {"dune", "emma"}
+
+    conn.executed.clear()
+    again = ingest_dump.ingest(dump, checkpoint_path, batch_size=10, limit=None, progress_every=60, restart=False)
+    assert conn.executed == [] and again["records"] == 3   # nothing left after line 8
+
+    with pytest.raises(SystemExit):
+        ingest_dump.ingest(str(tmp_path / "other.txt"), checkpoint_path, 10, None, 60, restart=False)
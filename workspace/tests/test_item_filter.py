@@ -0,0 +1,81 @@
+# workspace/tests/test_item_filter.py
+#
+# Verifies how GET /api/items filters and sorts compile to SQL: parameterized WHERE conditions (values are
+# never part of the SQL text), a whitelisted ORDER BY with itemId as tie breaker, and 422 for invalid
+# combinations (rejected before any SQL).
+# No database needed: see the fake_db fixture (conftest.py).
+#
+#version 1 - 261019
+
+
+
+from decimal import Decimal
+from typing import get_args
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.schemas import ItemSort
+from app.services.db.catalog import ITEM_SORT_COLUMNS
+
+
+@pytest.fixture
+def client(fake_db):
+    conn = fake_db(lambda sql, params: [])
+    return TestClient(main.app), conn
+
+
+def _sql(http, conn, url):
+    assert http.get(url).status_code == 200
+    return conn.executed[-1]
+
+
+def test_every_sort_value_maps_to_a_column():
+    assert {s.lstrip("-") for s in get_args(ItemSort)} == set(ITEM_SORT_COLUMNS)
+
+
+def test_default_is_unfiltered_by_name(client):
+    sql, params = _sql(*client, "/api/items")
+    assert "WHERE" not in sql and "JOIN" not in sql and params is None
+    assert sql.endswith("ORDER BY i.itemName ASC, i.itemId ASC")
+
+
+def test_filters_compile_to_parameterized_conditions(client):
+    sql, params = _sql(*client, "/api/items?priceMin=20&priceMax=40&yearMin=2020&itemStatusId=1&categoryId=3&sort=-price")
+    assert "JOIN categoryitems ci ON ci.categoryitemItemId = i.itemId AND ci.categoryitemCategoryId = %s" in sql
+    assert ("WHERE i.itemStatusId = %s AND i.itemListPrice >= %s AND i.itemListPrice <= %s "
+            "AND i.itemModelYear >= %s ORDER BY i.itemListPrice DESC, i.itemId DESC") in sql
+    assert params == [3, 1, Decimal("20"), Decimal("40"), 2020]
+
+    sql, params = _sql(*client, "/api/items?ids=5,4&yearMax=1999&sort=created")
+    assert "WHERE i.itemId IN (%s, %s) AND i.itemModelYear <= %s ORDER BY i.itemCrTimestamp ASC, i.itemId ASC" in sql
+    assert params == [4, 5, 1999]
+
+
+@pytest.mark.parametrize("query, loc", [
+    ("priceMin=50&priceMax=10", ["query", "priceMin"]),
+    ("yearMin=2021&yearMax=2020", ["query", "yearMin"]),
+    ("sort=bogus", ["query", "sort"]),
+])
+def test_errors_point_at_the_parameter(client, query, loc):
+    http, _ = client
+    (error,) = http.get(f"/api/items?{query}").json()["detail"]
+    assert error["loc"] == loc
+
+
+@pytest.mark.parametrize("query", [
+    "priceMin=50&priceMax=10",
+    "yearMin=2021&yearMax=2020",
+    "priceMin=-1",
+    "yearMax=70000",
+    "categoryId=0",
+    "sort=itemName",
+    "sort=-password",
+    "priceMin=abc",
+])
+def test_invalid_combinations_are_rejected(client, query):
+    http, conn = client
+    r = http.get(f"/api/items?{query}")
+    assert r.status_code == 422
+    assert conn.executed == []
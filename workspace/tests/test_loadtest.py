@@ -0,0 +1,100 @@
+# workspace/tests/test_loadtest.py
+#
+# Verifies the load-test harness (app/cli/loadtest.py) without gunicorn / MariaDB: mix parsing, percentiles,
+# an open-loop run against an in-process app (arrival rate kept, per-route report, created items tracked),
+# per-run import queries, and failed requests counted in the latencies (and flagged).
+#
+#version 1 - 261019
+
+
+
+import argparse
+import asyncio
+import random
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.cli.loadtest import Recorder, build_report, make_workload, parse_mix, percentile, run_load
+
+
+def test_parse_mix_and_percentile():
+    assert parse_mix("read=80, write=20") == {"read": 80.0, "write": 20.0, "import": 0.0}
+    for bad in ("read=80,delete=20", "read", "read=0"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_mix(bad)
+
+    values = [i / 1000 for i in range(1, 101)]   # 1..100 ms
+    assert (percentile(values, 50), percentile(values, 99), percentile(values, 100)) == (0.05, 0.099, 0.1)
+    assert percentile([], 50) is None
+
+
+def test_import_queries_are_unique_per_run():
+    def queries(run_id):
+        next_request = make_workload(parse_mix("import=1"), [1], [1], 3, random.Random(1), run_id)
+        return {next_request()[2] for _ in range(50)}
+
+    first, second = queries("a1b2c3d4-"), queries("e5f6a7b8-")
+    assert len(first) == 3 and first.isdisjoint(second)   # repeated within a run, never across runs
+    assert all(url.startswith("/api/import/book?q=a1b2c3d4-query") for url in first)
+
+
+def test_open_loop_run_and_report():
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def item(item_id: int):
+        await asyncio.sleep(0.01)
+        return {"itemId": item_id}
+
+    @app.get("/api/items")
+    def items():
+        return []
+
+    @app.get("/api/categories")
+    def categories():
+        return []
+
+    @app.post("/api/items", status_code=201)
+    def create(payload: dict):
+        return {"itemId": 1000, **payload}
+
+    @app.post("/api/import/book")
+    def import_book(q: str):
+        return {"stored_item": {"itemId": 2000}}
+
+    rng = random.Random(1)
+    next_request = make_workload(parse_mix("read=60,write=20,import=20"), [1, 2, 3], [1], 5, rng)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await run_load(client, next_request, rate=200, duration=0.5, warmup=0.1, rng=rng)
+
+    recorder = asyncio.run(run())
+    report = build_report(recorder, {"rate": 200})
+
+    total = report["total"]
+    assert 90 <= total["requests"] <= 110 and total["errors"] == 0   # ~200/s for 0.5s measured (warmup excluded)
+    assert "POST /api/items" in report["routes"] and "POST /api/import/book" in report["routes"]
+    reads = report["routes"]["GET /api/items/{item_id}"]
+    assert reads["p50_ms"] >= 10 and reads["p50_ms"] <= reads["p95_ms"] <= reads["p99_ms"] <= reads["max_ms"]
+    assert recorder.created_item_ids == {1000, 2000}
+    assert report["has_errors"] is False and total["error_p99_ms"] is None
+
+
+def test_errors_count_in_the_latencies_and_flag_the_run():
+    recorder = Recorder()
+    for i in range(8):
+        recorder.record("GET /api/items", "200", 0.100, done=1.0)
+    recorder.record("GET /api/items", "503", 0.001, done=1.0)
+    recorder.record("GET /api/items", "ReadTimeout", 60.0, done=1.0)
+    recorder.first_send = 0.0
+
+    report = build_report(recorder, {"rate": 10})
+    stats = report["routes"]["GET /api/items"]
+    assert (stats["requests"], stats["ok"], stats["errors"], stats["error_rate"]) == (10, 8, 2, 0.2)
+    assert stats["p99_ms"] == stats["max_ms"] == 60000.0     # the timeout is not dropped from the percentiles
+    assert stats["error_p99_ms"] == 60000.0 and stats["throughput"] == 8.0
+    assert report["has_errors"] is True
@@ -0,0 +1,89 @@
+# workspace/tests/test_openlibrary_cache.py
+#
+# Verifies the Open Library search cache in front of fetch_one_book: normalized keys, negative entries,
+# stale-while-revalidate (the stale entry is returned at once, one background refresh updates it), and that
+# a cache that can't be written (e.g. DeadlineExceeded) does not fail the search.
+# No database needed: the openlibrarycache functions are replaced by an in-memory dict.
+#
+#version 1 - 261019
+
+
+
+import asyncio
+import json
+
+import pytest
+
+from app.core import deadline as deadline_module
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.core.rows import row_class
+from app.services.db import openlibrary_cache
+from app.services.external import external_books
+
+Entry = row_class(("openlibrarycacheBook", "isFresh"))
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    entries = {}   # normalized query -> Entry
+    searches = []
+
+    async def fake_search(query):
+        searches.append(query)
+        return {"title": f"Book for {query}"} if query != "nothing" else None
+
+    def store(query, book):
+        entries[query] = Entry(json.dumps(book) if book is not None else None, 1)
+
+    monkeypatch.setattr(external_books.settings, "openlibrary_cache_enabled", True)
+    monkeypatch.setattr(external_books, "_search", fake_search)
+    monkeypatch.setattr(external_books, "get_cached_search", entries.get)
+    monkeypatch.setattr(external_books, "store_search", store)
+    monkeypatch.setattr(external_books, "claim_refresh", lambda query, lease: True)
+    return entries, searches
+
+
+def test_repeat_searches_skip_the_network(cache):
+    entries, searches = cache
+
+    async def run():
+        return [await external_books.fetch_one_book(q) for q in ("Dune", "  dune ", "DUNE", "nothing", "nothing")]
+
+    books = asyncio.run(run())
+
+    assert books[:3] == [{"title": "Book for dune"}] * 3 and books[3:] == [None, None]
+    assert searches == ["dune", "nothing"]
+    assert entries["nothing"].openlibrarycacheBook is None   # negative entry
+
+
+def test_stale_entry_is_served_while_refreshed(cache):
+    entries, searches = cache
+    entries["dune"] = Entry(json.dumps({"title": "Old"}), 0)
+
+    async def run():
+        book = await external_books.fetch_one_book("dune")
+        await asyncio.gather(*external_books._refreshes)
+        return book
+
+    assert asyncio.run(run()) == {"title": "Old"}
+    assert searches == ["dune"]
+    assert json.loads(entries["dune"].openlibrarycacheBook) == {"title": "Book for dune"}
+
+
+def test_failed_store_does_not_lose_the_book(cache, monkeypatch):
+    entries, searches = cache
+
+    def no_connection():
+        raise DeadlineExceeded("Request deadline exceeded")   # e.g. the search used up the request's time
+
+    monkeypatch.setattr(openlibrary_cache, "get_conn", no_connection)
+    monkeypatch.setattr(external_books, "store_search", openlibrary_cache.store_search)
+
+    async def run():
+        deadline_module._current.set(Deadline(5_000, "header"))
+        return await asyncio.gather(*(external_books.fetch_one_book("dune") for _ in range(3)))
+
+    assert asyncio.run(run()) == [{"title": "Book for dune"}] * 3   # leader and followers
+    assert searches == ["dune"] and entries == {}
+    assert openlibrary_cache.get_cached_search("dune") is None      # a failed read is a miss
+    assert openlibrary_cache.claim_refresh("dune", 30) is False
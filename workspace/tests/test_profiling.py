@@ -0,0 +1,103 @@
+# workspace/tests/test_profiling.py
+#
+# Verifies the internal endpoints gating (404 without INTERNAL_TOKEN, 403 with a wrong token),
+# the profiling middleware end to end, the speedscope / collapsed exports, the pruning of old profiles
+# and which frames count as request handling code.
+#
+#version 1 - 261019
+
+
+
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.core import profiling
+from app.core.config import settings
+
+TOKEN = "s3cret"
+
+PROFILE = {
+    "id": "abc",
+    "method": "GET",
+    "path": "/api/items",
+    "startedAt": 1.0,
+    "intervalMs": 5,
+    "samples": {"MainThread;run (x.py:1);get_items (catalog.py:10)": 3, "MainThread;run (x.py:1)": 1},
+}
+
+
+@pytest.fixture
+def profile_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.parametrize("url", ["/api/internal/metrics/coalescing", "/api/internal/metrics/openlibrary", "/api/internal/profiles"])
+def test_internal_endpoints_are_gated(monkeypatch, profile_dir, url):
+    http = TestClient(main.app)
+
+    monkeypatch.setattr(settings, "internal_token", "")
+    assert http.get(url).status_code == 404
+    assert http.get(url, headers={"X-Internal-Token": ""}).status_code == 404
+
+    monkeypatch.setattr(settings, "internal_token", TOKEN)
+    assert http.get(url).status_code == 403
+    assert http.get(url, headers={"X-Internal-Token": "wrong"}).status_code == 403
+    assert http.get(url, headers={"X-Internal-Token": TOKEN}).status_code == 200
+
+
+def test_request_is_profiled_and_downloadable(monkeypatch, profile_dir):
+    monkeypatch.setattr(settings, "internal_token", TOKEN)
+    http = TestClient(profiling.ProfilingMiddleware(main.app))
+    headers = {"X-Internal-Token": TOKEN}
+
+    assert "x-profile-id" not in http.get("/api/internal/profiles", headers=headers).headers
+    r = http.get("/api/internal/profiles", headers={**headers, "X-Profile-Request": "1"})
+    profile_id = r.headers["x-profile-id"]
+
+    listed = http.get("/api/internal/profiles", headers=headers).json()
+    assert [p["id"] for p in listed] == [profile_id]
+    assert listed[0]["status"] == 200 and "samples" not in listed[0]
+
+    r = http.get(f"/api/internal/profiles/{profile_id}?format=collapsed", headers=headers)
+    assert r.status_code == 200 and f"{profile_id}.collapsed.txt" in r.headers["content-disposition"]
+    assert http.get("/api/internal/profiles/nothere", headers=headers).status_code == 404
+    assert http.get("/api/internal/profiles/..%2Fetc", headers=headers).status_code == 404
+
+
+def test_exports():
+    assert profiling.to_collapsed(PROFILE) == (
+        "MainThread;run (x.py:1);get_items (catalog.py:10) 3\n"
+        "MainThread;run (x.py:1) 1\n"
+    )
+
+    doc = profiling.to_speedscope(PROFILE)
+    assert doc["shared"]["frames"] == [{"name": "MainThread"}, {"name": "run (x.py:1)"}, {"name": "get_items (catalog.py:10)"}]
+    (sampled,) = doc["profiles"]
+    assert sampled["samples"] == [[0, 1, 2], [0, 1]]
+    assert sampled["weights"] == [15, 5] and sampled["endValue"] == 20
+    assert sampled["name"] == doc["name"] == "GET /api/items"
+
+
+def test_old_profiles_are_pruned(monkeypatch, profile_dir):
+    monkeypatch.setattr(settings, "profile_keep", 2)
+
+    for i in range(4):
+        profiling.save_profile({**PROFILE, "id": f"p{i}", "startedAt": float(i)})
+        os.utime(profile_dir / f"p{i}.json", (i, i))   # distinct mtimes, oldest first
+
+    assert sorted(os.listdir(profile_dir)) == ["p2.json", "p3.json"]
+    assert [p["id"] for p in profiling.list_profiles()] == ["p3", "p2"]
+    assert profiling.load_profile("p0") is None
+
+
+def test_app_frames_are_recognized_by_the_package_directory():
+    def relevant(filename):
+        return any(p in filename for p in profiling._PROFILED_PATHS)
+
+    assert relevant(profiling.__file__)
+    assert relevant(os.path.join("usr", "lib", "site-packages", "fastapi", "routing.py"))
+    assert not relevant(os.path.join(os.sep, "app", "gunicorn_conf.py"))   # the container root, not the package
@@ -0,0 +1,89 @@
+# workspace/tests/test_rows.py
+#
+# Verifies the compact rows (RowCursor) and that RowJSONResponse produces the same JSON as the
+# response models (response_model_exclude_unset=True) the GET endpoints used before.
+# No database needed: the cursor reads a stub of a PyMySQL result.
+#
+#version 1 - 261019
+
+
+
+import datetime
+import decimal
+import json
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from app.core.rows import RowCursor, RowJSONResponse, row_class, split_first_field, with_fields
+from app.schemas import CategoryReadPartialWithItems, ItemReadPartialWithCategories
+
+ITEM = (1, "Book 1", decimal.Decimal("9.90"), 2020, 1, "u" * 36, datetime.datetime(2024, 1, 1, 12, 0, 0, 123456), None)
+ITEM_COLUMNS = ("itemId", "itemName", "itemListPrice", "itemModelYear", "itemStatusId", "itemCrUUID", "itemCrTimestamp", "itemClientUUID")
+
+
+def _cursor(columns, rows, table="items"):
+    fields = [SimpleNamespace(name=c, table_name=table) for c in columns]
+    result = SimpleNamespace(
+        fields=fields, rows=rows, affected_rows=len(rows), warning_count=0,
+        description=[(c,) for c in columns], insert_id=0,
+    )
+    cur = RowCursor(SimpleNamespace(_result=result))
+    cur._do_get_result()
+    cur._executed = "SELECT ..."
+    return cur
+
+
+def test_cursor_builds_rows_of_one_shared_class():
+    cur = _cursor(ITEM_COLUMNS, (ITEM, ITEM[:1] + ("Book 2",) + ITEM[2:]))
+    rows = cur.fetchall()
+
+    assert isinstance(rows, list) and len(rows) == 2
+    assert type(rows[0]) is type(rows[1]) is row_class(ITEM_COLUMNS)
+    assert rows[1].itemName == "Book 2" and rows[0].itemListPrice == decimal.Decimal("9.90")
+    assert not hasattr(rows[0], "__dict__")   # slots only
+    assert _cursor(ITEM_COLUMNS, ()).fetchall() == []
+
+    # duplicate names and expressions still get usable attribute names
+    row = _cursor(("itemId", "itemId", "COUNT(*)"), ((1, 2, 3),)).fetchone()
+    assert row._asdict() == {"itemId": 1, "items_itemId": 2, "col2": 3}
+
+
+def test_with_fields_and_split_first_field():
+    item = row_class(("itemId", "itemName"))(1, "Book 1")
+    embedded = with_fields(item, categories=[])
+    assert embedded._fields == ("itemId", "itemName", "categories") and item._fields == ("itemId", "itemName")
+
+    joined = row_class(("categoryitemCategoryId", "itemId", "itemName"))
+    assert split_first_field([joined(7, 1, "Book 1"), joined(8, 1, "Book 1")]) == [(7, item), (8, item)]
+
+
+def test_json_matches_the_response_models():
+    item = row_class(ITEM_COLUMNS)(*ITEM)
+    category = row_class(("categoryId", "categoryName"))(3, "Fiction")
+    sparse = row_class(("itemId", "itemName"))(1, "Book 1")
+
+    cases = [
+        ([item], list[ItemReadPartialWithCategories]),
+        ([sparse], list[ItemReadPartialWithCategories]),
+        ([with_fields(item, categories=[category])], list[ItemReadPartialWithCategories]),
+        (with_fields(category, items=[sparse, item]), CategoryReadPartialWithItems),
+    ]
+    for rows, model in cases:
+        adapter = TypeAdapter(model)
+        expected = adapter.dump_json(adapter.validate_python(rows, from_attributes=True), exclude_unset=True)
+        assert RowJSONResponse(rows).body == expected
+
+
+def test_row_json_response_in_an_endpoint():
+    app = FastAPI()
+
+    @app.get("/items", response_model=list[ItemReadPartialWithCategories])
+    def items():
+        return RowJSONResponse([row_class(ITEM_COLUMNS)(*ITEM)])
+
+    r = TestClient(app).get("/items")
+    assert r.headers["content-type"] == "application/json"
+    assert json.loads(r.text)[0]["itemCrTimestamp"] == "2024-01-01T12:00:00.123456"
@@ -0,0 +1,243 @@
+# workspace/tests/test_singleflight.py
+#
+# Verifies that concurrent identical calls share one execution (sync + async groups),
+# that nothing is cached once the in-flight execution has finished, and that the shared work runs under
+# the latest deadline of its callers (a single caller's own deadline reaches max_statement_time),
+# every caller being bounded by its own deadline only; once all callers have left, the work is cancelled.
+#
+#version 1 - 261019
+
+
+
+import asyncio
+import threading
+import time
+
+import pytest
+from pymysql.cursors import Cursor
+
+from app.core import database
+from app.core import deadline as deadline_module
+from app.core.deadline import Deadline, DeadlineExceeded, current_deadline
+from app.core.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_sync_calls_are_coalesced():
+    group = SingleFlight("test-sync")
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"itemId": 1}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(group.do(("get_item", 1), work))) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"itemId": 1}] * 10
+    stats = group.stats()
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == 9
+    assert stats["inFlight"] == 0
+
+    # finished calls are not cached
+    group.do(("get_item", 1), work)
+    assert len(calls) == 2
+
+
+def test_async_calls_are_coalesced():
+    group = AsyncSingleFlight("test-async")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"title": "Dune"}
+
+    async def main():
+        return await asyncio.gather(*(group.do("dune", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"title": "Dune"}] * 5
+    assert len(calls) == 1
+    assert group.stats()["coalesced"] == 4
+
+
+def test_sync_shared_work_is_not_bound_to_the_leaders_deadline():
+    group = SingleFlight("test-sync-deadline")
+    seen = []
+
+    def work():
+        time.sleep(0.1)   # the follower has joined by now
+        seen.append((current_deadline().source, current_deadline().remaining() > 4))
+        time.sleep(0.2)
+        return "rows"
+
+    def call(timeout_ms, outcomes):
+        deadline_module._current.set(Deadline(timeout_ms, "header"))
+        try:
+            outcomes.append(group.do("list_items", work))
+        except DeadlineExceeded:
+            outcomes.append("504")
+
+    leader, follower = [], []
+    threads = [threading.Thread(target=call, args=(100, leader))]   # short deadline, arrives first
+    threads[0].start()
+    time.sleep(0.05)
+    threads.append(threading.Thread(target=call, args=(5_000, follower)))
+    threads[1].start()
+    for t in threads:
+        t.join()
+
+    assert seen == [("shared", True)]   # extended to the follower's deadline, past the leader's 100 ms
+    assert leader == ["504"] and follower == ["rows"]
+
+    # a follower gives up at its own deadline, the leader still gets the result
+    leader.clear()
+    follower.clear()
+    started = time.monotonic()
+    threads = [threading.Thread(target=call, args=(5_000, leader))]
+    threads[0].start()
+    time.sleep(0.05)
+    threads.append(threading.Thread(target=call, args=(100, follower)))
+    threads[1].start()
+    threads[1].join()
+    assert follower == ["504"] and time.monotonic() - started < 0.25
+    threads[0].join()
+    assert leader == ["rows"]
+
+
+def test_single_callers_deadline_reaches_the_statement(monkeypatch):
+    group = SingleFlight("test-sync-statement")
+    statements = []
+    monkeypatch.setattr(Cursor, "execute", lambda self, query, args=None: statements.append(query))
+
+    class FakeConnection:
+        def thread_id(self):
+            return 42
+
+    deadline_module._current.set(Deadline(2000, "header"))
+    try:
+        group.do("get_item", lambda: database.TracingCursor(FakeConnection()).execute("SELECT 1"))
+    finally:
+        deadline_module._current.set(None)
+
+    prefix, _, rest = statements[0].partition(" FOR ")
+    assert rest == "SELECT 1" and 1.9 < float(prefix.split("=")[1]) <= 2.0   # not REQUEST_TIMEOUT_MAX_MS
+
+
+def test_sync_work_is_cancelled_once_every_caller_has_left():
+    group = SingleFlight("test-sync-cancel")
+    killed = threading.Event()
+    leader_deadline = Deadline(5_000, "header")
+
+    def work():
+        with current_deadline().cancellable(killed.set):   # as TracingCursor registers KILL QUERY
+            killed.wait(2)
+        return "rows"
+
+    def call(deadline, outcomes):
+        deadline_module._current.set(deadline)
+        try:
+            outcomes.append(group.do("list_items", work))
+        except DeadlineExceeded:
+            outcomes.append("504")
+
+    leader, follower = [], []
+    threads = [threading.Thread(target=call, args=(leader_deadline, leader))]
+    threads[0].start()
+    time.sleep(0.05)
+    threads.append(threading.Thread(target=call, args=(Deadline(300, "header"), follower)))
+    threads[1].start()
+
+    time.sleep(0.05)
+    leader_deadline.cancel()           # the leader's client disconnects: the follower still waits
+    time.sleep(0.1)
+    assert not killed.is_set()
+    threads[1].join()                  # the follower gives up at its deadline: nobody is left
+    assert killed.wait(1)
+    threads[0].join()
+    assert leader == ["504"] and follower == ["504"]
+
+
+def test_async_work_is_cancelled_once_every_caller_has_left():
+    group = AsyncSingleFlight("test-async-left")
+    outcome = []
+
+    async def work():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            outcome.append("cancelled")
+            raise
+        return "ok"
+
+    async def call(timeout_ms):
+        deadline_module._current.set(Deadline(timeout_ms, "header"))
+        try:
+            return await group.do("k", work)
+        except DeadlineExceeded:
+            return "504"
+
+    async def main():
+        results = await asyncio.gather(call(100), call(150))
+        await asyncio.sleep(0.01)
+        return results
+
+    assert asyncio.run(main()) == ["504", "504"]
+    assert outcome == ["cancelled"]
+
+
+def test_async_shared_work_is_not_bound_to_the_leaders_deadline():
+    group = AsyncSingleFlight("test-async-deadline")
+    seen = []
+
+    async def work():
+        seen.append(current_deadline().source)
+        await asyncio.sleep(0.3)
+        return {"title": "Dune"}
+
+    async def call(timeout_ms, delay=0.0):
+        await asyncio.sleep(delay)
+        deadline_module._current.set(Deadline(timeout_ms, "header"))
+        try:
+            return await group.do("dune", work)
+        except DeadlineExceeded:
+            return "504"
+
+    async def main():
+        return await asyncio.gather(call(100), call(5_000, delay=0.05), call(150, delay=0.05))
+
+    started = time.monotonic()
+    assert asyncio.run(main()) == ["504", {"title": "Dune"}, "504"]
+    assert seen == ["shared"]
+    assert group.stats()["executions"] == 1 and time.monotonic() - started < 0.5
+
+
+def test_disconnected_async_caller_stops_waiting():
+    group = AsyncSingleFlight("test-async-cancel")
+
+    async def work():
+        await asyncio.sleep(0.3)
+        return "ok"
+
+    async def main():
+        deadline = Deadline(5_000, "header")
+
+        async def gone():
+            deadline_module._current.set(deadline)
+            return await group.do("k", work)
+
+        caller = asyncio.ensure_future(gone())
+        other = asyncio.ensure_future(group.do("k", work))
+        await asyncio.sleep(0.05)
+        await asyncio.to_thread(deadline.cancel)   # as DeadlineMiddleware does on http.disconnect
+        with pytest.raises(deadline_module.RequestCancelled):
+            await caller
+        return await other   # the shared work was not cancelled
+
+    assert asyncio.run(main()) == "ok"
@@ -0,0 +1,86 @@
+# workspace/tests/test_tracing.py
+#
+# Verifies W3C traceparent parsing, parent/child spans, continuation of an incoming trace
+# (with its sampling decision), the server span named after the full route template, and that SQL statements
+# of unrecorded traces get no span (nor statement text).
+#
+#version 1 - 261019
+
+
+
+import pytest
+from fastapi.testclient import TestClient
+from pymysql.cursors import Cursor
+
+from app.core import database, tracing
+from app.main import app
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+@pytest.fixture
+def exporter():
+    exporter = ListExporter()
+    tracing.set_exporter(exporter)
+    yield exporter
+    tracing.set_exporter(None)
+
+
+def test_parse_traceparent():
+    tp = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    assert tracing.parse_traceparent(tp) == ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True)
+    assert tracing.parse_traceparent(tp[:-1] + "0") == ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", False)
+    assert tracing.parse_traceparent("00-" + "0" * 32 + "-b7ad6b7169203331-01") is None
+    assert tracing.parse_traceparent("garbage") is None
+
+
+def test_child_spans_and_inject(exporter, monkeypatch):
+    monkeypatch.setattr(tracing.settings, "tracing_sample_ratio", 1.0)
+    with tracing.start_span("parent") as parent:
+        with tracing.start_span("child") as child:
+            headers = tracing.inject({})
+
+    assert [s.name for s in exporter.spans] == ["child", "parent"]
+    assert child.trace_id == parent.trace_id and child.parent_id == parent.span_id
+    assert headers["traceparent"] == f"00-{parent.trace_id}-{child.span_id}-01"
+
+
+def test_incoming_traceparent_is_continued(exporter):
+    trace_id = "0af7651916cd43dd8448eb211c80319c"
+    client = TestClient(app)
+
+    client.get("/api/health", headers={"traceparent": f"00-{trace_id}-b7ad6b7169203331-01"})
+    client.get("/api/health", headers={"traceparent": f"00-{trace_id}-b7ad6b7169203331-00"})   # not sampled
+
+    assert len(exporter.spans) == 1
+    span = exporter.spans[0]
+    assert span.trace_id == trace_id and span.parent_id == "b7ad6b7169203331"
+    assert span.name == "GET /api/health"
+    assert span.attributes["http.status_code"] == 200
+
+
+def test_sql_spans_only_when_recorded(exporter, monkeypatch):
+    monkeypatch.setattr(Cursor, "execute", lambda self, query, args=None: 0)
+    cur = database.TracingCursor(connection=None)
+    trace = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-0"
+
+    with tracing.start_span("request", traceparent=trace + "0"):   # not sampled
+        assert not tracing.will_record()
+        with monkeypatch.context() as m:
+            m.setattr(database, "_text", lambda query: pytest.fail("statement text built for an unrecorded span"))
+            cur.execute("SELECT itemId FROM items WHERE itemId = %s", (1,))
+
+    with tracing.start_span("request", traceparent=trace + "1"):   # sampled
+        cur.execute("SELECT itemId FROM items WHERE itemId = %s", (1,))
+
+    assert [s.name for s in exporter.spans] == ["SQL SELECT", "request"]
+    assert exporter.spans[0].attributes["db.statement"] == "SELECT itemId FROM items WHERE itemId = %s"
+
+    tracing.set_exporter(None)
+    assert not tracing.will_record()